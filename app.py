@@ -1,15 +1,86 @@
+import time
+rerun_started = time.perf_counter()
+
 import streamlit as st
-from templates import load_template, get_template_names, suggest_templates_by_route, adjust_terms_by_vessel_class
-from document_generator import generate_document
-import base64
-import json
+from templates import get_adjusted_template, get_template_names, get_template_warnings, get_vessel_class_names, refresh_templates, suggest_templates_by_route
+from document_generator import changed_sections, generate_docx_bytes, render_sections
+from validation import PORT_PLACEHOLDER, validate_terms
+from compliance import check_terms
+import charter_store
+from ports import PORTS
+from job_queue import DONE, FAILED, GenerationQueue, QueueFull, request_key
+from artifact_cache import ArtifactCache, charter_key
+import instrumentation
+from clause_library import ClauseLibrary
+import gc
 import os
-from docx import Document
-from io import BytesIO
+import tempfile
+from functools import wraps
 
-# Ensure absolute path for charters.json on Streamlit Cloud
+# Ensure absolute path for charters.json on Streamlit Cloud; CHARTER_STORE_PATH moves the
+# store, and a legacy charters.json is looked for next to it
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-CHARTERS_FILE = os.path.join(BASE_DIR, "charters.json")
+CHARTERS_DB = os.environ.get("CHARTER_STORE_PATH") or os.path.join(BASE_DIR, "charters.db")
+CHARTERS_FILE = os.path.join(os.path.dirname(CHARTERS_DB), "charters.json")
+
+@st.cache_resource
+def open_charter_store():
+    # Runs once per server process: imports any legacy charters.json into the store
+    charter_store.migrate_json(CHARTERS_DB, CHARTERS_FILE)
+    return CHARTERS_DB
+
+charters_db = open_charter_store()
+
+GENERATION_POLL_SECONDS = 0.5
+LIVE_PREVIEW_SECONDS = 1.0
+
+@st.cache_resource
+def get_generation_queue():
+    # Shared by every session on this server; size it with CHARTER_GENERATION_WORKERS
+    return GenerationQueue(workers=int(os.environ.get("CHARTER_GENERATION_WORKERS", "2")))
+
+generation_queue = get_generation_queue()
+
+@st.cache_resource
+def get_artifact_cache():
+    # CHARTER_ARTIFACT_CACHE_MB bounds memory; CHARTER_ARTIFACT_CACHE_DIR adds a disk tier
+    return ArtifactCache(
+        max_bytes=int(os.environ.get("CHARTER_ARTIFACT_CACHE_MB", "64")) * 1024 * 1024,
+        disk_dir=os.environ.get("CHARTER_ARTIFACT_CACHE_DIR") or None,
+    )
+
+artifact_cache = get_artifact_cache()
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+@st.cache_resource
+def freeze_startup_heap():
+    # Streamlit runs a full gc.collect() after every rerun, fragment reruns included (the
+    # runner.postScriptGC option). Moving everything alive after the first run's imports and
+    # static resources into the permanent generation keeps that pass to per-rerun garbage.
+    gc.freeze()
+    return gc.get_freeze_count()
+
+def generate_charter(report, template_name, vessel_class, custom_terms, save):
+    # Runs on a generation worker, never in the script thread
+    if save:
+        report("saving", 0.1)
+        charter_store.save_charter(charters_db, template_name, vessel_class, custom_terms)
+    report("cache lookup", 0.2)
+    key = charter_key(template_name, vessel_class, custom_terms)
+    artifacts = artifact_cache.get(key)
+    report("rendering", 0.3)
+    sections = render_sections(template_name, custom_terms)
+    if artifacts is None:
+        doc_text = "".join(text for _, _, text in sections)
+        report("building docx", 0.5)
+        artifacts = {"charter.md": doc_text.encode("utf-8"), "charter.docx": generate_docx_bytes(doc_text)}
+        artifact_cache.put(key, artifacts)
+    return {
+        "sections": sections,
+        "docx": artifacts["charter.docx"],
+        "filename": f"{template_name}_Charter_{vessel_class}.docx",
+    }
 
 # Custom CSS for improved oil/gas-themed UI
 st.markdown("""
@@ -121,6 +192,18 @@ st.markdown("""
     <p class="subheader">Create a customized TANKERVOY 87 charter party with clear, user-friendly inputs.</p>
 """, unsafe_allow_html=True)
 
+# Fields that other sections depend on trigger a full rerun; everything else only reruns
+# the fragment it belongs to
+st.session_state.pop("rerun_app", None)
+
+def request_app_rerun():
+    # on_change callback; st.rerun() is a no-op inside callbacks, so the fragment checks the flag
+    st.session_state.rerun_app = True
+
+def rerun_app_if_requested():
+    if st.session_state.pop("rerun_app", False):
+        st.rerun()
+
 # Theme toggle
 theme = st.session_state.get('theme', 'light')
 if st.button("Switch to Dark/Light Theme"):
@@ -128,63 +211,103 @@ if st.button("Switch to Dark/Light Theme"):
     st.session_state.theme = theme
 st.markdown(f'<div class="{theme}-theme">', unsafe_allow_html=True)
 
-# Mock port data
-ports = [
-    "Rotterdam, Netherlands (Major crude oil hub)",
-    "Houston, USA (Key US oil export port)",
-    "Singapore, Singapore (Asian bunkering hub)",
-    "Fujairah, UAE (Middle East bunkering)",
-    "Shanghai, China (Major import port)",
-    "Ras Tanura, Saudi Arabia (Crude export)",
-    "Antwerp, Belgium (European refining)",
-    "Port Said, Egypt (Suez Canal access)"
-]
+# Clause packs are read on first search and re-read when their files change
+@st.cache_resource
+def clause_library():
+    return ClauseLibrary()
 
-# Clause library with descriptions
-clauses = [
-    {
-        "id": "demurrage",
-        "title": "Demurrage",
-        "content": "Demurrage shall be payable at the rate of USD [amount] per day or pro-rata for any part of a day.",
-        "description": "Covers compensation for delays beyond agreed laytime at port."
-    },
-    {
-        "id": "forceMajeure",
-        "title": "Force Majeure",
-        "content": "Neither party shall be liable for delays due to events beyond their reasonable control, including acts of God, war, or strikes.",
-        "description": "Protects against liability for unavoidable delays (e.g., natural disasters, strikes)."
-    },
-    {
-        "id": "cargoInspection",
-        "title": "Cargo Inspection",
-        "content": "Charterers shall have the right to appoint an independent inspector to verify cargo quantity and quality at loading and discharging ports.",
-        "description": "Allows charterers to ensure cargo meets specifications via third-party inspection."
-    }
+@st.cache_resource
+def port_options():
+    return [PORT_PLACEHOLDER] + PORTS
+
+@st.cache_resource
+def vessel_class_names():
+    return get_vessel_class_names()
+
+CLAUSE_FIELDS = ["Standard Clauses", "Modern Clauses", "Additional Clauses"]
+# Terms read by the clause defaults and the laytime calculator
+APP_RERUN_TERMS = ["Laytime", "Demurrage", "Additional Clauses"]
+# (term, widget key, default before the widget first renders)
+FORM_FIELDS = [
+    ("Loading Port", "loading_port", PORT_PLACEHOLDER),
+    ("Discharging Port", "discharging_port", PORT_PLACEHOLDER),
+    ("Laydays", "laydays", None),
+    ("Cancelling", "cancelling", None),
+    ("Freight Rate", "freight_rate", ""),
+    ("Use Worldscale", "use_worldscale", True),
 ]
+TERMS_ERROR_FIELDS = ["Owners", "Charterers", "Vessel Name"]
+
+def collect_terms(template):
+    # The whole form from session state, so a fragment can read fields it does not render
+    state = st.session_state
+    custom_terms = {key: state.get(f"term_{key}", default_value) for key, default_value in template.items()}
+    for field, key, default_value in FORM_FIELDS:
+        custom_terms[field] = state.get(key, default_value)
+    custom_terms["Additional Clauses"] = state.get("additional_clauses", custom_terms.get("Additional Clauses", ""))
+    return custom_terms
+
+def show_sections(sections, digests_key):
+    # One element per section: Streamlit sends a byte-identical element of 10 KB or more as a
+    # reference to the copy the browser already has, so long unchanged clauses are not shipped
+    # again, and the browser only repaints sections whose content changed
+    changed = changed_sections(st.session_state.get(digests_key, {}), sections)
+    for _, _, text in sections:
+        st.markdown(text, unsafe_allow_html=True)
+    st.session_state[digests_key] = {section_id: digest for section_id, digest, _ in sections}
+    st.caption(f"{len(changed)} of {len(sections)} sections changed since the last preview")
+
+def show_errors(errors, fields):
+    for field in fields:
+        if field in errors:
+            st.markdown(f'<p class="error">{errors[field]}</p>', unsafe_allow_html=True)
+
+def timed_fragment(name):
+    # st.fragment, timed as app.fragment.<name> when instrumentation is on; a fragment-only
+    # rerun never reaches the end of the script, so the metrics file is flushed here too
+    def decorate(fn):
+        if not instrumentation.ENABLED:
+            return st.fragment(fn)
+
+        @wraps(fn)
+        def run(*args, **kwargs):
+            with instrumentation.span(f"app.fragment.{name}"):
+                fn(*args, **kwargs)
+            instrumentation.flush()
+        return st.fragment(run)
+    return decorate
 
 # Route selection
-with st.expander("Route Information", expanded=True):
-    st.markdown('<p class="section-title">Select Route</p>', unsafe_allow_html=True)
-    route = st.text_input(
-        "Enter Route",
-        placeholder="e.g., Houston to Rotterdam",
-        help="Enter a route to get template suggestions tailored to common oil trade paths.",
-        key="route"
-    )
-    if route:
-        suggested_templates = suggest_templates_by_route(route)
-        st.markdown("**Suggested Templates:**")
-        st.write(", ".join(suggested_templates) or "None")
+@timed_fragment("route")
+def route_section():
+    with st.expander("Route Information", expanded=True):
+        st.markdown('<p class="section-title">Select Route</p>', unsafe_allow_html=True)
+        route = st.text_input(
+            "Enter Route",
+            placeholder="e.g., Houston to Rotterdam",
+            help="Enter a route to get template suggestions tailored to common oil trade paths.",
+            key="route"
+        )
+        if route:
+            suggested_templates = suggest_templates_by_route(route)
+            st.markdown("**Suggested Templates:**")
+            st.write(", ".join(suggested_templates) or "None")
+
+route_section()
 
-# Vessel and template selection
+# Vessel and template selection; every other section depends on these, so they stay in the
+# full script run rather than a fragment
 with st.expander("Vessel and Template", expanded=True):
     st.markdown('<p class="section-title">Vessel Details</p>', unsafe_allow_html=True)
     vessel_class = st.selectbox(
         "Vessel Class",
-        ["Panamax", "Aframax", "Suezmax", "VLCC", "ULCC"],
+        vessel_class_names(),
         help="Select the vessel class to adjust cargo capacity and rates (e.g., Panamax for 60,000 tons).",
         key="vessel_class"
     )
+    refresh_templates()
+    for warning in get_template_warnings():
+        st.warning(warning)
     template_names = get_template_names()
     template_name = st.selectbox(
         "Charter Template",
@@ -192,202 +315,455 @@ with st.expander("Vessel and Template", expanded=True):
         help="Choose a template (e.g., TANKERVOY 87 for voyage charters, Shell Time 4 for time charters).",
         key="template_name"
     )
-    template = load_template(template_name)
-    template = adjust_terms_by_vessel_class(template, vessel_class)
+    template = get_adjusted_template(template_name, vessel_class)
 
 # Custom terms
-with st.expander("Charter Terms", expanded=True):
-    st.markdown('<p class="section-title">Enter Charter Details</p>', unsafe_allow_html=True)
-    st.markdown("Provide details for the charter agreement, such as company names and vessel specifications.", unsafe_allow_html=True)
-    custom_terms = {}
-    errors = {}
-    for key, default_value in template.items():
-        if key not in ["Standard Clauses", "Modern Clauses", "Additional Clauses"]:
-            label = key.replace("_", " ").title()
-            custom_terms[key] = st.text_input(
-                label,
-                value=default_value,
-                key=f"term_{key}",
-                help=f"Enter the {key.lower()} (e.g., company name for Owners, cargo type for Cargo). Required for Owners, Charterers, and Vessel Name."
-            )
-            if not custom_terms[key] and key in ["Owners", "Charterers", "Vessel Name"]:
-                errors[key] = f"{key.replace('_', ' ')} is required"
-        else:
-            label = key
-            custom_terms[key] = st.text_area(
-                label,
-                value=default_value,
-                key=f"term_{key}",
-                help=f"Edit {key.lower()} or leave as default. These are pre-filled from the template."
-            )
+@timed_fragment("terms")
+def terms_section(template):
+    rerun_app_if_requested()
+    with st.expander("Charter Terms", expanded=True):
+        st.markdown('<p class="section-title">Enter Charter Details</p>', unsafe_allow_html=True)
+        st.markdown("Provide details for the charter agreement, such as company names and vessel specifications.", unsafe_allow_html=True)
+        custom_terms = {}
+        for key, default_value in template.items():
+            on_change = request_app_rerun if key in APP_RERUN_TERMS else None
+            if key not in CLAUSE_FIELDS:
+                label = key.replace("_", " ").title()
+                custom_terms[key] = st.text_input(
+                    label,
+                    value=default_value,
+                    key=f"term_{key}",
+                    on_change=on_change,
+                    help=f"Enter the {key.lower()} (e.g., company name for Owners, cargo type for Cargo). Required for Owners, Charterers, and Vessel Name."
+                )
+            else:
+                label = key
+                custom_terms[key] = st.text_area(
+                    label,
+                    value=default_value,
+                    key=f"term_{key}",
+                    on_change=on_change,
+                    help=f"Edit {key.lower()} or leave as default. These are pre-filled from the template."
+                )
+        show_errors(validate_terms(custom_terms), TERMS_ERROR_FIELDS)
+
+terms_section(template)
 
 # Additional fields
-with st.expander("Ports and Dates", expanded=True):
-    st.markdown('<p class="section-title">Specify Ports and Dates</p>', unsafe_allow_html=True)
-    st.markdown("Select ports for loading and discharging cargo, and set dates for operations.", unsafe_allow_html=True)
-    custom_terms["Loading Port"] = st.selectbox(
-        "Loading Port",
-        ["Select a port"] + ports,
-        help="Choose the port where cargo will be loaded (e.g., Houston for oil exports). Required.",
-        key="loading_port"
-    )
-    custom_terms["Discharging Port"] = st.selectbox(
-        "Discharging Port",
-        ["Select a port"] + ports,
-        help="Choose the port where cargo will be discharged (e.g., Rotterdam for imports). Required.",
-        key="discharging_port"
-    )
-    custom_terms["Laydays"] = st.date_input(
-        "Laydays Commencement",
-        help="Select the date when cargo operations can begin. Required.",
-        key="laydays"
-    )
-    custom_terms["Cancelling"] = st.date_input(
-        "Cancelling Date",
-        help="Select the date after which the charter can be cancelled if not started. Must be after laydays.",
-        key="cancelling"
-    )
-    custom_terms["Freight Rate"] = st.text_input(
-        "Freight Rate",
-        placeholder="e.g., WS100 or 50.00",
-        help="Enter the freight rate (Worldscale points or USD per ton). Must be a number.",
-        key="freight_rate"
-    )
-    custom_terms["Use Worldscale"] = st.checkbox(
-        "Use Worldscale Terms",
-        value=True,
-        help="Check to apply Worldscale freight rates; uncheck for custom rates.",
-        key="use_worldscale"
-    )
+@timed_fragment("ports_dates")
+def ports_dates_section(template):
+    rerun_app_if_requested()
+    with st.expander("Ports and Dates", expanded=True):
+        st.markdown('<p class="section-title">Specify Ports and Dates</p>', unsafe_allow_html=True)
+        st.markdown("Select ports for loading and discharging cargo, and set dates for operations.", unsafe_allow_html=True)
+        # The Worldscale calculator and the compliance review follow the ports
+        st.selectbox(
+            "Loading Port",
+            port_options(),
+            help="Choose the port where cargo will be loaded (e.g., Houston for oil exports). Required.",
+            key="loading_port",
+            on_change=request_app_rerun
+        )
+        st.selectbox(
+            "Discharging Port",
+            port_options(),
+            help="Choose the port where cargo will be discharged (e.g., Rotterdam for imports). Required.",
+            key="discharging_port",
+            on_change=request_app_rerun
+        )
+        st.date_input(
+            "Laydays Commencement",
+            help="Select the date when cargo operations can begin. Required.",
+            key="laydays"
+        )
+        st.date_input(
+            "Cancelling Date",
+            help="Select the date after which the charter can be cancelled if not started. Must be after laydays.",
+            key="cancelling"
+        )
+        st.text_input(
+            "Freight Rate",
+            placeholder="e.g., WS100, WS100–WS150 or USD 50/t",
+            help="Worldscale points (a bare number counts as points under Worldscale terms) or a USD amount.",
+            key="freight_rate"
+        )
+        st.checkbox(
+            "Use Worldscale Terms",
+            value=True,
+            help="Check to apply Worldscale freight rates; uncheck for custom rates.",
+            key="use_worldscale"
+        )
 
-    # Validation
-    if custom_terms["Loading Port"] == "Select a port":
-        errors["Loading Port"] = "Please select a loading port"
-    if custom_terms["Discharging Port"] == "Select a port":
-        errors["Discharging Port"] = "Please select a discharging port"
-    if custom_terms["Laydays"] and custom_terms["Cancelling"] and custom_terms["Laydays"] >= custom_terms["Cancelling"]:
-        errors["Cancelling"] = "Cancelling date must be after laydays"
-    if custom_terms["Freight Rate"] and not custom_terms["Freight Rate"].replace('.', '', 1).isdigit():
-        errors["Freight Rate"] = "Freight rate must be a number"
+        # Validation, next to the fields it concerns
+        errors = validate_terms(collect_terms(template))
+        show_errors(errors, [field for field in errors if field not in TERMS_ERROR_FIELDS])
 
-    # Display errors next to fields
-    for field, error in errors.items():
-        st.markdown(f'<p class="error">{error}</p>', unsafe_allow_html=True)
+ports_dates_section(template)
 
 # Clause selection
-with st.expander("Additional Clauses", expanded=True):
-    st.markdown('<p class="section-title">Add Optional Clauses</p>', unsafe_allow_html=True)
-    st.markdown("Select or add clauses to include in the charter agreement.", unsafe_allow_html=True)
-    selected_clauses = st.multiselect(
-        "Select Clauses",
-        [clause["title"] for clause in clauses],
-        help="Choose additional clauses to include in the charter. View their descriptions below.",
-        key="clauses"
-    )
-    for clause in clauses:
-        if clause["title"] in selected_clauses:
+CLAUSE_RESULTS = 50
+
+def keep_clause_selection():
+    st.session_state.selected_clauses = st.session_state.clauses
+
+@timed_fragment("clauses")
+def clauses_section(template_name, template):
+    with st.expander("Additional Clauses", expanded=True):
+        st.markdown('<p class="section-title">Add Optional Clauses</p>', unsafe_allow_html=True)
+        st.markdown("Search the clause library and select clauses to include in the charter agreement.", unsafe_allow_html=True)
+        library = clause_library()
+        search_cols = st.columns([2, 1])
+        query = search_cols[0].text_input(
+            "Search Clauses",
+            placeholder="e.g., sanctions, demurrage, war risks",
+            help="Matches clause titles, descriptions and wording; partial words match too.",
+            key="clause_query"
+        )
+        tags = search_cols[1].multiselect("Tags", library.tags(), key="clause_tags")
+        for warning in library.warnings():
+            st.warning(warning)
+        only_template = st.checkbox(f"Only clauses suited to {template_name}", value=True, key="clause_template_only")
+        results = library.search(query, tags, template_name if only_template else None, limit=CLAUSE_RESULTS)
+
+        # The options follow the search, which makes Streamlit treat the multiselect as a new
+        # widget; the selection is kept in selected_clauses so it survives a new search
+        selected = [key for key in st.session_state.get("selected_clauses", []) if library.get(key)]
+        titles = {key: library.get(key)["title"] for key in selected}
+        titles.update((clause["key"], clause["title"]) for clause in results)
+        selected_clauses = st.multiselect(
+            "Select Clauses",
+            list(titles),
+            default=selected,
+            format_func=lambda key: f"{titles[key]} ({key.partition(':')[0]})",
+            help="Choose additional clauses to include in the charter. View their descriptions below.",
+            key="clauses",
+            on_change=keep_clause_selection
+        )
+        st.caption(f"{len(results)} matching clause{'' if len(results) == 1 else 's'}" + (f" (showing the best {CLAUSE_RESULTS})" if len(results) == CLAUSE_RESULTS else ""))
+        if results.truncated:
+            st.caption(f"Only the most common words starting with {', '.join(repr(word) for word in results.truncated)} were searched; type more of the word to narrow it down.")
+        contents = []
+        for key in selected_clauses:
+            clause = library.get(key)
             st.markdown(f"**{clause['title']}**: {clause['description']}")
             st.text_area(
                 f"{clause['title']} Content",
                 value=clause["content"],
                 disabled=True,
-                key=f"clause_{clause['id']}",
+                key=f"clause_{key}",
                 help="This clause is included in the document."
             )
-    selected_clause_content = "\n\n".join(
-        clause["content"] for clause in clauses if clause["title"] in selected_clauses
-    )
-    if selected_clause_content:
-        custom_terms["Additional Clauses"] = selected_clause_content
-
-    custom_terms["Additional Clauses"] = st.text_area(
-        "Custom Clauses",
-        value=custom_terms.get("Additional Clauses", ""),
-        placeholder="Enter any custom clauses here...",
-        help="Add custom clauses specific to your charter agreement.",
-        key="additional_clauses"
-    )
+            contents.append(clause["content"])
+        st.text_area(
+            "Custom Clauses",
+            value="\n\n".join(contents) or st.session_state.get("term_Additional Clauses", template.get("Additional Clauses", "")),
+            placeholder="Enter any custom clauses here...",
+            help="Add custom clauses specific to your charter agreement.",
+            key="additional_clauses"
+        )
+
+clauses_section(template_name, template)
 
 # Worldscale calculator
-with st.expander("Worldscale Calculator", expanded=False):
-    st.markdown('<p class="section-title">Estimate Freight Rate</p>', unsafe_allow_html=True)
-    if st.button("Calculate Worldscale Rate"):
-        distance = st.number_input(
-            "Distance (nautical miles)",
-            min_value=0.0,
-            value=1000.0,
-            help="Enter the voyage distance in nautical miles.",
-            key="distance"
+@timed_fragment("worldscale")
+def worldscale_section(vessel_class):
+    with st.expander("Worldscale Calculator", expanded=False):
+        st.markdown('<p class="section-title">Estimate Freight Rate</p>', unsafe_allow_html=True)
+        st.markdown("Freight at Worldscale points for the selected ports, priced for every vessel class.", unsafe_allow_html=True)
+        # Streamlit runs an expander's body even while it is collapsed, and the freight engine
+        # brings in numpy and pandas, so nothing is imported or priced until it is switched on
+        if not st.toggle("Show freight calculator", key="show_freight_calculator"):
+            return
+        import pandas as pd
+        from worldscale import WS_STEP, class_cargo_tons, class_ws_range, default_matrix as freight_matrix
+
+        loading_port = st.session_state.get("loading_port")
+        discharging_port = st.session_state.get("discharging_port")
+        calc_cols = st.columns(2)
+        calc_origin = calc_cols[0].selectbox(
+            "From",
+            PORTS,
+            index=PORTS.index(loading_port) if loading_port in PORTS else 0,
+            key="ws_origin"
         )
-        vessel_size = st.number_input(
-            "Vessel Size (DWT)",
+        calc_destination = calc_cols[1].selectbox(
+            "To",
+            PORTS,
+            index=PORTS.index(discharging_port) if discharging_port in PORTS else 1,
+            key="ws_destination"
+        )
+        ws_low, ws_high = class_ws_range(vessel_class)
+        ws_points = calc_cols[0].slider(
+            f"Worldscale Points ({vessel_class} range WS{ws_low:g}–WS{ws_high:g})",
+            min_value=5,
+            max_value=300,
+            value=int((ws_low + ws_high) / 2 // WS_STEP * WS_STEP) or 100,
+            step=WS_STEP,
+            key="ws_points"
+        )
+        cargo_tons = calc_cols[1].number_input(
+            "Cargo (tons)",
             min_value=0.0,
-            value=50000.0,
-            help="Enter the vessel's deadweight tonnage (DWT).",
-            key="vessel_size"
+            value=class_cargo_tons(vessel_class),
+            step=1000.0,
+            help="Defaults to the middle of the vessel class's cargo range.",
+            key="ws_cargo"
         )
-        rate = distance * vessel_size * 0.0001  # Mock calculation
-        st.markdown(f"**Estimated Worldscale Rate**: USD {rate:.2f}")
+        if calc_origin == calc_destination or not freight_matrix.knows(calc_origin, calc_destination):
+            st.write("No distance is known for this pair of ports.")
+        else:
+            quote = freight_matrix.quote(calc_origin, calc_destination, vessel_class, ws_points, cargo_tons)
+            st.markdown(
+                f"**Distance**: {quote['distance_nm']:,.0f} nm &nbsp; **Flat rate (WS100)**: USD {quote['flat_rate']:,.2f}/t  \n"
+                f"**Freight at WS{ws_points}**: USD {quote['usd_per_ton']:,.2f}/t &nbsp; **Lump sum**: USD {quote['lump_sum']:,.0f}",
+                unsafe_allow_html=True
+            )
+            # Every class across its WS grid for this route, from one vectorised pricing call
+            priced = freight_matrix.price([calc_origin], [calc_destination])
+            lump_sums = pd.DataFrame(
+                priced["lump_sum"][0].round(-3),
+                index=priced["vessel_classes"],
+                columns=[f"WS{ws:g}" for ws in priced["ws_points"]],
+            ).where(priced["in_range"])
+            st.caption("Lump sum (USD) by vessel class at the usual WS range for each class")
+            st.dataframe(lump_sums.dropna(axis=1, how="all"), use_container_width=True)
+
+worldscale_section(vessel_class)
+
+# Laytime and demurrage
+@timed_fragment("laytime")
+def laytime_section(template):
+    with st.expander("Laytime and Demurrage", expanded=False):
+        st.markdown('<p class="section-title">Calculate Demurrage</p>', unsafe_allow_html=True)
+        st.markdown(
+            "Upload a statement of facts CSV with columns Voyage, Port, Event, Start, End "
+            "(events such as NOR Tendered, All Fast, Hoses Off, Shifting, Weather).",
+            unsafe_allow_html=True
+        )
+        sof_file = st.file_uploader("Statement of Facts", type=["csv"], key="sof_file")
+        if sof_file is not None:
+            # Imported on first upload; laytime runs on pandas
+            from laytime import DEFAULT_LAYTIME, claims_for_terms
+            custom_terms = collect_terms(template)
+            try:
+                claims = claims_for_terms(sof_file, custom_terms)
+            except ValueError as exc:
+                st.error(str(exc))
+            else:
+                st.caption(
+                    f"Laytime {custom_terms.get('Laytime') or DEFAULT_LAYTIME}, demurrage {custom_terms.get('Demurrage') or 'not set'}: "
+                    f"{claims['Demurrage Hours'].sum():.1f} hours on demurrage across {len(claims)} voyages"
+                )
+                st.dataframe(claims, use_container_width=True)
+
+laytime_section(template)
 
 # Save and generate
-with st.expander("Generate and Save", expanded=True):
-    st.markdown('<p class="section-title">Generate Charter</p>', unsafe_allow_html=True)
-    save_charter = st.checkbox(
-        "Save Charter for Future Reference",
-        help="Check to save this charter to review later.",
-        key="save_charter"
-    )
-    if st.button("Generate Charter Document"):
-        if errors:
-            st.error("Please correct the following errors:")
-            for field, error in errors.items():
-                st.markdown(f"- {error}", unsafe_allow_html=True)
-        else:
-            # Save charter
-            if save_charter:
-                saved_charters = []
-                if os.path.exists(CHARTERS_FILE):
-                    with open(CHARTERS_FILE, "r") as f:
-                        saved_charters = json.load(f)
-                saved_charters.append({
-                    "template": template_name,
-                    "vessel_class": vessel_class,
-                    "terms": {k: str(v) for k, v in custom_terms.items()}
-                })
-                with open(CHARTERS_FILE, "w") as f:
-                    json.dump(saved_charters, f)
-
-            # Generate document
-            doc_text = generate_document(template_name, custom_terms)
+@timed_fragment("generate")
+def generate_section(template_name, vessel_class, template):
+    rerun_app_if_requested()
+    with st.expander("Generate and Save", expanded=True):
+        st.markdown('<p class="section-title">Generate Charter</p>', unsafe_allow_html=True)
+        save_charter = st.checkbox(
+            "Save Charter for Future Reference",
+            help="Check to save this charter to review later.",
+            key="save_charter"
+        )
+        custom_terms = collect_terms(template)
+        errors = validate_terms(custom_terms)
+        # Advisory only; the same warnings are printed at the end of the generated charter.
+        # Edits in other sections refresh it on the next full rerun or Generate click.
+        compliance_warnings = check_terms(custom_terms)
+        if compliance_warnings:
+            st.warning("Compliance review:\n" + "\n".join(f"- {warning.removeprefix('Warning: ')}" for warning in compliance_warnings))
+        if st.button("Generate Charter Document"):
+            if errors:
+                st.error("Please correct the following errors:")
+                for field, error in errors.items():
+                    st.markdown(f"- {error}", unsafe_allow_html=True)
+            else:
+                job_args = (template_name, vessel_class, custom_terms, save_charter)
+                try:
+                    st.session_state.generation_job = generation_queue.submit(request_key(*job_args), generate_charter, *job_args)
+                except QueueFull:
+                    st.error("The generator is busy right now. Please try again in a moment.")
+
+        job_id = st.session_state.get("generation_job")
+        job = generation_queue.status(job_id) if job_id else None
+        generation_pending = job is not None and job["status"] not in (DONE, FAILED)
+
+        # Polls the queue while a job is pending; once it finishes, a full rerun drops the timer
+        @st.fragment(run_every=GENERATION_POLL_SECONDS if generation_pending else None)
+        def generation_status():
+            job = generation_queue.status(job_id) if job_id else None
+            if job is None:
+                if job_id:
+                    st.warning("This generation job has expired. Please generate the charter again.")
+                return
+            if job["status"] not in (DONE, FAILED):
+                st.progress(job["progress"], text=f"Generating charter: {job['stage']}...")
+                return
+            if generation_pending:
+                st.rerun()
+            if job["status"] == FAILED:
+                st.error(f"Document generation failed: {job['error']}")
+                return
+            result = generation_queue.result(job_id)
             st.markdown("### Document Preview")
-            st.markdown(doc_text, unsafe_allow_html=True)
-
-            # Generate Word document
-            doc = Document()
-            for paragraph in doc_text.split('\n\n'):
-                doc.add_paragraph(paragraph.replace('\n', ' '))
-            
-            # Save to BytesIO
-            doc_buffer = BytesIO()
-            doc.save(doc_buffer)
-            doc_buffer.seek(0)
-            
-            # Provide download link
-            b64 = base64.b64encode(doc_buffer.getvalue()).decode()
-            href = f'<a href="data:application/vnd.openxmlformats-officedocument.wordprocessingml.document;base64,{b64}" download="{template_name}_Charter_{vessel_class}.docx">Download Charter Document (Word)</a>'
-            st.markdown(href, unsafe_allow_html=True)
+            show_sections(result["sections"], "preview_digests")
+
+            # Served as raw bytes rather than a base64 data: URI embedded in the page
+            st.download_button(
+                "Download Charter Document (Word)",
+                data=result["docx"],
+                file_name=result["filename"],
+                mime=DOCX_MIME,
+                key="download_docx"
+            )
             st.success("Document generated successfully!")
+            stats = generation_queue.stats()
+            cache_stats = artifact_cache.stats()
+            st.caption(
+                "Timings: " + ", ".join(f"{stage} {ms:.0f} ms" for stage, ms in job["timings"].items())
+                + f" | queue depth {stats['depth']}, {stats['workers']} workers, mean wait {stats['mean_wait_ms']:.0f} ms"
+                + f" | artifact cache {cache_stats['hits'] + cache_stats['disk_hits']} hits, {cache_stats['misses']} misses"
+                + f" ({cache_stats['hit_rate']:.0%}), {cache_stats['bytes'] / 1024:.0f} KiB"
+            )
+
+        generation_status()
+
+        # Renders from the current form every LIVE_PREVIEW_SECONDS; only sections whose terms
+        # changed are re-rendered. Switching it reruns the app to start or drop the timer.
+        live_preview = st.toggle(
+            "Live preview",
+            help="Preview the charter as you type, without generating the Word document.",
+            key="live_preview",
+            on_change=request_app_rerun
+        )
+
+        @st.fragment(run_every=LIVE_PREVIEW_SECONDS if live_preview else None)
+        def live_preview_panel():
+            if live_preview:
+                st.markdown("### Live Preview")
+                show_sections(render_sections(template_name, collect_terms(template)), "live_preview_digests")
+
+        live_preview_panel()
+
+generate_section(template_name, vessel_class, template)
 
 # Saved charters
-with st.expander("Saved Charters", expanded=False):
-    st.markdown('<p class="section-title">View Saved Charters</p>', unsafe_allow_html=True)
-    if os.path.exists(CHARTERS_FILE):
-        with open(CHARTERS_FILE, "r") as f:
-            saved_charters = json.load(f)
-        if saved_charters:
-            for i, charter in enumerate(saved_charters):
-                st.markdown(f"**Charter {i+1}**: {charter['template']} - {charter['vessel_class']} - {charter['terms'].get('Vessel Name', 'Unnamed')}")
-        else:
-            st.write("No saved charters yet.")
-    else:
-        st.write("No saved charters yet.")
+SAVED_CHARTERS_PAGE_SIZE = 20
+EXPORT_DIR = os.environ.get("CHARTER_EXPORT_DIR") or os.path.join(tempfile.gettempdir(), "charter_exports")
+EXPORT_MAX_AGE_SECONDS = 3600
+
+def export_saved_charters(report, filters):
+    # Runs on a generation worker and renders in that thread: forking a process pool from
+    # the server is unsafe, and export.py on the command line is the parallel path
+    from export import export_charters
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    for entry in os.scandir(EXPORT_DIR):
+        if entry.name.endswith(".zip") and time.time() - entry.stat().st_mtime > EXPORT_MAX_AGE_SECONDS:
+            os.remove(entry.path)
+    path = os.path.join(EXPORT_DIR, f"charters_{request_key(filters, time.time())[:16]}.zip")
+    summary = export_charters(
+        charters_db, path, filters, workers=1,
+        on_progress=lambda done, total: report(f"{done} of {total} charters", min(1.0, done / max(total, 1))),
+    )
+    return {"path": path, **summary}
+
+@timed_fragment("saved_charters")
+def saved_charters_section():
+    with st.expander("Saved Charters", expanded=False):
+        st.markdown('<p class="section-title">View Saved Charters</p>', unsafe_allow_html=True)
+        # Streamlit runs an expander's body even while it is collapsed, so nothing is
+        # queried until the user asks for it.
+        if st.toggle("Load saved charters", key="show_saved_charters"):
+            total = charter_store.count_charters(charters_db)
+            if not total:
+                st.write("No saved charters yet.")
+            else:
+                template_counts = charter_store.facet_counts(charters_db, "template")
+                class_counts = charter_store.facet_counts(charters_db, "vessel_class")
+                filter_cols = st.columns(2)
+                saved_template = filter_cols[0].selectbox(
+                    "Template",
+                    [""] + [value for value, _ in template_counts],
+                    format_func=lambda v: f"{v} ({dict(template_counts)[v]})" if v else f"All templates ({total})",
+                    key="saved_template"
+                )
+                saved_class = filter_cols[1].selectbox(
+                    "Vessel Class",
+                    [""] + [value for value, _ in class_counts],
+                    format_func=lambda v: f"{v} ({dict(class_counts)[v]})" if v else f"All classes ({total})",
+                    key="saved_vessel_class"
+                )
+                saved_vessel = filter_cols[0].text_input("Vessel Name starts with", key="saved_vessel_name")
+                laydays_range = filter_cols[1].date_input("Laydays between", value=[], key="saved_laydays")
+                filters = {
+                    "template": saved_template,
+                    "vessel_class": saved_class,
+                    "vessel_name": saved_vessel,
+                    "laydays_from": laydays_range[0] if len(laydays_range) > 0 else None,
+                    "laydays_to": laydays_range[1] if len(laydays_range) > 1 else None,
+                }
+                matches = charter_store.count_charters(charters_db, filters)
+                pages = max(1, -(-matches // SAVED_CHARTERS_PAGE_SIZE))
+                page = st.number_input("Page", min_value=1, max_value=pages, value=1, key="saved_page")
+                offset = (page - 1) * SAVED_CHARTERS_PAGE_SIZE
+                rows = charter_store.query_charters(charters_db, filters, SAVED_CHARTERS_PAGE_SIZE, offset)
+                if rows:
+                    st.caption(f"Showing {offset + 1}–{offset + len(rows)} of {matches} matching charters ({total} saved)")
+                    st.markdown("\n".join(
+                        f"- **Charter {row['id']}**: {row['template']} - {row['vessel_class']} - {row['vessel_name'] or 'Unnamed'}"
+                        + (f" - laydays {row['laydays']}" if row['laydays'] else "")
+                        for row in rows
+                    ))
+                else:
+                    st.write("No saved charters match these filters.")
+
+                if matches and st.button(f"Export {matches} matching charter{'' if matches == 1 else 's'} (.zip)", key="export_saved_charters"):
+                    try:
+                        st.session_state.export_job = generation_queue.submit(request_key("export", filters), export_saved_charters, filters)
+                    except QueueFull:
+                        st.error("The generator is busy right now. Please try again in a moment.")
+
+                export_id = st.session_state.get("export_job")
+                export = generation_queue.status(export_id) if export_id else None
+                export_pending = export is not None and export["status"] not in (DONE, FAILED)
+
+                @st.fragment(run_every=GENERATION_POLL_SECONDS if export_pending else None)
+                def export_status():
+                    export = generation_queue.status(export_id) if export_id else None
+                    if export is None:
+                        return
+                    if export["status"] not in (DONE, FAILED):
+                        st.progress(export["progress"], text=f"Exporting: {export['stage']}...")
+                        return
+                    if export_pending:
+                        st.rerun()
+                    if export["status"] == FAILED:
+                        st.error(f"Export failed: {export['error']}")
+                        return
+                    result = generation_queue.result(export_id)
+                    if not os.path.exists(result["path"]):
+                        st.warning("This export has expired. Please export the charters again.")
+                        return
+                    with open(result["path"], "rb") as f:
+                        st.download_button(
+                            f"Download {result['rendered']} charter{'' if result['rendered'] == 1 else 's'} (.zip)",
+                            data=f,
+                            file_name="saved_charters.zip",
+                            mime="application/zip",
+                            key="download_export"
+                        )
+
+                export_status()
+
+saved_charters_section()
+
+freeze_startup_heap()
+
+# Whole-script rerun time, imports included; nothing is recorded unless instrumentation is on
+if instrumentation.ENABLED:
+    instrumentation.record("app.rerun", time.perf_counter() - rerun_started)
+    instrumentation.flush()
@@ -0,0 +1,306 @@
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+# Load harness for the Streamlit app itself (load_test.py covers service.py). Each simulated
+# broker is an AppTest session driving app.py headlessly: it picks a vessel class and a
+# template, fills in the parties, ports, dates and rate, then generates and saves the charter,
+# round after round. Sessions share one process, as they would one Streamlit worker: the
+# cached resources (generation queue, artifact cache, store) are shared, and the latency of
+# each interaction includes waiting for the other sessions' reruns. AppTest swaps in a
+# process-wide runtime for every run, so script runs take turns on a lock, much as reruns
+# in a worker take turns on the GIL; generation jobs and saves still run concurrently.
+# --processes spreads the sessions over several such workers sharing one store.
+#
+# At the end the store is read back: every save whose generation finished must be there
+# exactly once, with the template, class and ports it was made with.
+#
+#   python app_load_test.py --sessions 1,4,8,16 --rounds 5
+#   python app_load_test.py --sessions 8 --processes 2 --max-p99-ms 2000
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+GENERATE_LABEL = "Generate Charter Document"
+GENERATED_MESSAGE = "Document generated successfully!"
+RUN_TIMEOUT = 120
+GENERATION_TIMEOUT = 120
+POLL_SECONDS = 0.05
+
+_run_lock = threading.Lock()
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class _RssSampler(threading.Thread):
+    def __init__(self, interval=0.1):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_mb = _rss_mb()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, _rss_mb())
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.peak_mb = max(self.peak_mb, _rss_mb())
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def _run(at):
+    with _run_lock:
+        at.run(timeout=RUN_TIMEOUT)
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+
+def _keys(elements):
+    return {element.key for element in elements}
+
+def _session(tag, number, rounds, think, samples, errors, saves):
+    from streamlit.testing.v1 import AppTest
+    rng = random.Random(f"{tag}-{number}")
+
+    def interaction(name, fn):
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception as exc:
+            errors.setdefault(name, []).append(f"{type(exc).__name__}: {exc}")
+            return False
+        samples.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+        if think:
+            time.sleep(rng.uniform(0, think))
+        return True
+
+    at = AppTest.from_file(APP_PATH, default_timeout=RUN_TIMEOUT)
+    if not interaction("load", lambda: _run(at)):
+        return
+    for round_number in range(rounds):
+        vessel_name = f"MT {tag} {number}-{round_number}"
+
+        def pick_vessel_class():
+            selectbox = at.selectbox(key="vessel_class")
+            selectbox.set_value(rng.choice(selectbox.options))
+            _run(at)
+
+        def pick_template():
+            selectbox = at.selectbox(key="template_name")
+            selectbox.set_value(rng.choice(selectbox.options))
+            _run(at)
+
+        def edit_terms():
+            keys = _keys(at.text_input)
+            for term, value in (("Owners", f"Owners {number}"), ("Charterers", f"Charterers {number}"), ("Vessel Name", vessel_name)):
+                if f"term_{term}" in keys:
+                    at.text_input(key=f"term_{term}").set_value(value)
+            _run(at)
+
+        def ports_and_dates():
+            ports = at.selectbox(key="loading_port").options[1:]
+            loading, discharging = rng.sample(ports, 2)
+            at.selectbox(key="loading_port").set_value(loading)
+            at.selectbox(key="discharging_port").set_value(discharging)
+            laydays = date(2026, 11, 1) + timedelta(days=rng.randrange(60))
+            at.date_input(key="laydays").set_value(laydays)
+            at.date_input(key="cancelling").set_value(laydays + timedelta(days=rng.randint(1, 10)))
+            at.text_input(key="freight_rate").set_value(f"WS{rng.randrange(50, 150)}")
+            at.checkbox(key="save_charter").check()
+            _run(at)
+
+        def generate():
+            next(button for button in at.button if button.label == GENERATE_LABEL).click()
+            _run(at)
+            if at.error:
+                raise RuntimeError(at.error[0].value)
+
+        def generated():
+            # Reruns stand in for the status fragment's polling until the preview is shown
+            deadline = time.perf_counter() + GENERATION_TIMEOUT
+            while not any(GENERATED_MESSAGE in element.value for element in at.success):
+                if at.error:
+                    raise RuntimeError(at.error[0].value)
+                if time.perf_counter() > deadline:
+                    raise TimeoutError("generation did not finish")
+                time.sleep(POLL_SECONDS)
+                _run(at)
+
+        if not all(interaction(name, fn) for name, fn in (
+            ("vessel_class", pick_vessel_class),
+            ("template", pick_template),
+            ("edit_terms", edit_terms),
+            ("ports_dates", ports_and_dates),
+        )):
+            continue
+        template_name = at.selectbox(key="template_name").value
+        vessel_class = at.selectbox(key="vessel_class").value
+        ports = (at.selectbox(key="loading_port").value, at.selectbox(key="discharging_port").value)
+        start = time.perf_counter()
+        if not interaction("generate", generate):
+            continue
+        if "term_Vessel Name" in _keys(at.text_input) and interaction("generated", generated):
+            samples.setdefault("generate_to_preview", []).append((time.perf_counter() - start) * 1000)
+            saves[vessel_name] = (template_name, vessel_class, *ports)
+
+def run_sessions(tag, sessions, rounds, think=0.0):
+    # One worker's share: sessions threads against one app process; returns the raw samples
+    import streamlit as st
+    st.cache_resource.clear()
+    samples, errors, saves = {}, {}, {}
+    sampler = _RssSampler()
+    sampler.start()
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    threads = [threading.Thread(target=_session, args=(tag, number, rounds, think, samples, errors, saves)) for number in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    sampler.stop()
+    return {
+        "samples": samples,
+        "errors": errors,
+        "saves": saves,
+        "seconds": seconds,
+        "cpu_seconds": (after.ru_utime - usage.ru_utime) + (after.ru_stime - usage.ru_stime),
+        "rss_peak_mb": sampler.peak_mb,
+    }
+
+def _run_worker(store_path, tag, sessions, rounds, think):
+    os.environ["CHARTER_STORE_PATH"] = store_path
+    return run_sessions(tag, sessions, rounds, think)
+
+def verify_saves(db_path, saves):
+    # Lost: finished saves missing from the store; duplicated: stored more than once;
+    # corrupted: stored with a different form, class or ports, or unreadable
+    import charter_store
+    found = {}
+    unreadable = 0
+    try:
+        for charter in charter_store.iter_charters(db_path):
+            vessel_name = charter["terms"].get("Vessel Name")
+            if vessel_name in saves:
+                found.setdefault(vessel_name, []).append(charter)
+    except Exception:
+        unreadable += 1
+    corrupted = sum(
+        1
+        for vessel_name, charters in found.items()
+        for charter in charters
+        if (charter["template"], charter["vessel_class"], charter["terms"].get("Loading Port"), charter["terms"].get("Discharging Port")) != saves[vessel_name]
+    )
+    integrity = charter_store.connect(db_path).execute("PRAGMA integrity_check").fetchone()[0]
+    return {
+        "saves": len(saves),
+        "lost_saves": sum(1 for vessel_name in saves if vessel_name not in found),
+        "duplicated_saves": sum(len(charters) - 1 for charters in found.values()),
+        "corrupted_saves": corrupted + unreadable,
+        "integrity": integrity,
+    }
+
+def run_level(store_path, sessions, rounds, processes=1, think=0.0):
+    tag = f"L{sessions}x{processes}-{int(time.time() * 1000) % 100000}"
+    shares = [sessions // processes + (1 if i < sessions % processes else 0) for i in range(processes)]
+    start = time.perf_counter()
+    if processes == 1:
+        os.environ["CHARTER_STORE_PATH"] = store_path
+        workers = [run_sessions(tag, sessions, rounds, think)]
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            workers = list(pool.map(_run_worker, [store_path] * processes, [f"{tag}-p{i}" for i in range(processes)], shares, [rounds] * processes, [think] * processes))
+    seconds = time.perf_counter() - start
+
+    samples, errors, saves = {}, {}, {}
+    for worker in workers:
+        for name, values in worker["samples"].items():
+            samples.setdefault(name, []).extend(values)
+        for name, messages in worker["errors"].items():
+            errors.setdefault(name, []).extend(messages)
+        saves.update(worker["saves"])
+    # Reruns only; generate_to_preview spans several
+    reruns = [value for name, values in samples.items() if name != "generate_to_preview" for value in values]
+    report = {
+        "sessions": sessions,
+        "processes": processes,
+        "interactions": len(reruns),
+        "errors": sum(len(messages) for messages in errors.values()),
+        "seconds": seconds,
+        "interactions_per_second": len(reruns) / seconds if seconds else 0.0,
+        "p50_ms": _percentile(reruns, 0.50) if reruns else None,
+        "p90_ms": _percentile(reruns, 0.90) if reruns else None,
+        "p99_ms": _percentile(reruns, 0.99) if reruns else None,
+        "cpu_percent": 100 * sum(worker["cpu_seconds"] for worker in workers) / seconds if seconds else 0.0,
+        "rss_peak_mb": sum(worker["rss_peak_mb"] for worker in workers),
+        "interactions_by_name": {},
+        "error_samples": {name: messages[:3] for name, messages in errors.items()},
+    }
+    for name, values in samples.items():
+        report["interactions_by_name"][name] = {
+            "count": len(values),
+            "errors": len(errors.get(name, [])),
+            "p50_ms": _percentile(values, 0.50),
+            "p90_ms": _percentile(values, 0.90),
+            "p99_ms": _percentile(values, 0.99),
+            "max_ms": max(values),
+        }
+    report.update(verify_saves(store_path, saves))
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive concurrent headless sessions of the Streamlit app.")
+    parser.add_argument("--sessions", default="1,4,8", help="Comma-separated numbers of concurrent sessions (default 1,4,8)")
+    parser.add_argument("--rounds", type=int, default=3, help="Form-fill, generate and save rounds per session (default 3)")
+    parser.add_argument("--processes", type=int, default=1, help="App processes (workers) to spread the sessions over (default 1)")
+    parser.add_argument("--think", type=float, default=0.0, help="Up to this many seconds of think time after each interaction")
+    parser.add_argument("--store", help="Charters database to save into (default: a fresh temporary one)")
+    parser.add_argument("--max-p99-ms", type=float, help="Exit 1 when any level's rerun p99 is over this")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        store_path = args.store or os.path.join(tmp, "charters.db")
+        for sessions in [int(n) for n in args.sessions.split(",")]:
+            report = run_level(store_path, sessions, args.rounds, args.processes, args.think)
+            results.append(report)
+            if not args.json:
+                print(
+                    f"sessions={sessions:<3} {report['interactions']:>5} reruns  {report['interactions_per_second']:6.1f}/s  "
+                    f"p50 {report['p50_ms'] or 0:7.1f} ms  p90 {report['p90_ms'] or 0:7.1f} ms  p99 {report['p99_ms'] or 0:7.1f} ms  "
+                    f"cpu {report['cpu_percent']:5.0f}%  rss {report['rss_peak_mb']:6.0f} MB  errors {report['errors']}"
+                )
+                for name, stats in report["interactions_by_name"].items():
+                    print(f"    {name:<20} p50 {stats['p50_ms']:7.1f} ms  p99 {stats['p99_ms']:7.1f} ms  max {stats['max_ms']:7.1f} ms  ({stats['count']}, {stats['errors']} errors)")
+                print(
+                    f"    saves {report['saves']}: {report['lost_saves']} lost, {report['duplicated_saves']} duplicated, "
+                    f"{report['corrupted_saves']} corrupted, integrity {report['integrity']}"
+                )
+                for name, messages in report["error_samples"].items():
+                    print(f"    {name} failed: {messages[0]}")
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    failed = any(report["lost_saves"] or report["duplicated_saves"] or report["corrupted_saves"] or report["integrity"] != "ok" for report in results)
+    if args.max_p99_ms is not None:
+        failed = failed or any((report["p99_ms"] or 0) > args.max_p99_ms for report in results)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Rendered charters keyed by a content hash of what produced them. Entries are dicts of
+# {artifact name: bytes}; memory is an LRU bounded by total bytes, and an optional disk
+# tier keeps artifacts across restarts and memory evictions. The disk tier keeps one
+# directory per RENDER_VERSION, drops the others when opened, and is bounded by
+# max_disk_bytes, evicting the entries least recently written or read (by mtime).
+
+# Part of every key: bump it whenever the rendered text (document_generator, templates) or
+# an output format (docx_stream) changes, so the disk tier stops serving older artifacts
+RENDER_VERSION = 2
+
+def charter_key(template_name, vessel_class, custom_terms):
+    # Stable across processes and dict ordering; dates hash as their ISO form
+    payload = json.dumps(
+        [RENDER_VERSION, template_name, vessel_class, custom_terms], sort_keys=True, default=str, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+_VERSION_DIR = re.compile(r"v\d+")
+# Entry directories of the layout before versioned directories
+_LEGACY_DIR = re.compile(r"[0-9a-f]{2}")
+
+def _remove_entry(path):
+    # Another process may be evicting the same entry
+    try:
+        for name in os.listdir(path):
+            os.remove(os.path.join(path, name))
+        os.rmdir(path)
+    except FileNotFoundError:
+        pass
+
+def _disk_entries(directory):
+    # [(mtime, bytes, path)] of the entries under a version directory
+    entries = []
+    for shard in os.scandir(directory):
+        if not shard.is_dir():
+            continue
+        for entry in os.scandir(shard.path):
+            try:
+                size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                entries.append((entry.stat().st_mtime, size, entry.path))
+            except FileNotFoundError:
+                continue
+    return entries
+
+class ArtifactCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk_dir=None, max_disk_bytes=1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_evictions": 0}
+        self._disk_bytes = 0
+        if disk_dir:
+            self._version_dir = os.path.join(disk_dir, f"v{RENDER_VERSION}")
+            os.makedirs(self._version_dir, exist_ok=True)
+            self._prune_versions()
+            self._disk_bytes = sum(size for _, size, _ in _disk_entries(self._version_dir))
+
+    def _prune_versions(self):
+        # Entries of other render versions can never be hit again
+        for entry in os.scandir(self.disk_dir):
+            if not entry.is_dir() or entry.path == self._version_dir:
+                continue
+            if _VERSION_DIR.fullmatch(entry.name) or _LEGACY_DIR.fullmatch(entry.name):
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def _evict_disk(self):
+        # Down to 90% of max_disk_bytes, oldest mtime first; the total is re-read from disk,
+        # since other processes may share the directory
+        entries = sorted(_disk_entries(self._version_dir))
+        total = sum(size for _, size, _ in entries)
+        target = self.max_disk_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            _remove_entry(path)
+            total -= size
+            with self._lock:
+                self._stats["disk_evictions"] += 1
+        with self._lock:
+            self._disk_bytes = total
+
+    def _disk_path(self, key):
+        return os.path.join(self._version_dir, key[:2], key)
+
+    def get(self, key):
+        with self._lock:
+            artifacts = self._entries.get(key)
+            if artifacts is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return artifacts
+        artifacts = self._read_disk(key)
+        with self._lock:
+            if artifacts is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+            self._insert(key, artifacts)
+        return artifacts
+
+    def put(self, key, artifacts):
+        with self._lock:
+            self._insert(key, artifacts)
+        self._write_disk(key, artifacts)
+
+    def _insert(self, key, artifacts):
+        size = sum(len(data) for data in artifacts.values())
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= sum(len(data) for data in previous.values())
+        self._entries[key] = artifacts
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= sum(len(data) for data in evicted.values())
+            self._stats["evictions"] += 1
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            artifacts = {}
+            for name in sorted(os.listdir(path)):
+                with open(os.path.join(path, name), "rb") as f:
+                    artifacts[name] = f.read()
+            # A read counts as a use for the disk LRU
+            os.utime(path)
+            return artifacts
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+
+    def _write_disk(self, key, artifacts):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        if os.path.isdir(path):
+            return
+        # Written to a scratch directory and renamed into place, so readers never see half an entry
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        scratch = tempfile.mkdtemp(dir=os.path.dirname(path))
+        for name, data in artifacts.items():
+            with open(os.path.join(scratch, name), "wb") as f:
+                f.write(data)
+        try:
+            os.rename(scratch, path)
+        except OSError:
+            # Another writer got there first; the content is identical by construction
+            _remove_entry(scratch)
+            return
+        with self._lock:
+            self._disk_bytes += sum(len(data) for data in artifacts.values())
+            over = self._disk_bytes > self.max_disk_bytes
+        if over:
+            self._evict_disk()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["disk_hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_bytes": self._disk_bytes,
+                "hit_rate": (self._stats["hits"] + self._stats["disk_hits"]) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,873 @@
+import argparse
+import base64
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+import charter_store
+
+from templates import CLAUSE_FRAGMENTS, adjust_terms_by_vessel_class, clause_fragments, get_adjusted_template, get_clause_fragments, get_template_names, get_vessel_class_names, load_template, register_clause_fragment, register_template, reload_templates, suggest_templates_by_route
+from ports import PORT_ALIASES
+from route_index import build_default_index
+from compliance import RuleEngine
+from worldscale import build_default_matrix
+from laytime import compute_claims
+from clause_library import ClauseLibrary
+from charter_model import parse_charter
+from batch import fixture_to_terms, validate_fixtures
+from startup_profile import best_of
+from app_load_test import run_level
+from document_generator import build_docx, changed_sections, compile_plan, generate_document, generate_docx_bytes, render_sections, write_docx
+
+def legacy_generate_document(template_name, custom_terms):
+    # The single TANKERVOY 87 f-string renderer that compiled plans replaced, kept as a baseline
+    # Extract custom terms with defaults
+    owners = custom_terms.get('Owners', 'Owners')
+    charterers = custom_terms.get('Charterers', 'Charterers')
+    vessel_name = custom_terms.get('Vessel Name', 'Vessel Name')
+    vessel_description = custom_terms.get('Vessel Description', 'Description of the vessel including class, tonnage, and specifications.')
+    loading_port = custom_terms.get('Loading Port', 'In Charterers\' option.')
+    discharging_port = custom_terms.get('Discharging Port', 'In Charterers\' option.')
+    laydays = custom_terms.get('Laydays', 'Date').strftime('%Y-%m-%d') if hasattr(custom_terms.get('Laydays'), 'strftime') else custom_terms.get('Laydays', 'Date')
+    cancelling = custom_terms.get('Cancelling', 'Date').strftime('%Y-%m-%d') if hasattr(custom_terms.get('Cancelling'), 'strftime') else custom_terms.get('Cancelling', 'Date')
+    freight_rate = custom_terms.get('Freight Rate', 'Rate')
+    use_worldscale = custom_terms.get('Use Worldscale', True)
+    standard_clauses = custom_terms.get('Standard Clauses', '')
+    modern_clauses = custom_terms.get('Modern Clauses', '')
+    additional_clauses = custom_terms.get('Additional Clauses', '')
+
+    # Compliance check for TOVALOP
+    compliance_warnings = []
+    if 'TOVALOP' not in (standard_clauses + modern_clauses + additional_clauses):
+        compliance_warnings.append("Warning: TOVALOP clause recommended for pollution liability compliance.")
+
+    # Generate document
+    document = f"""
+# TANKERVOY 87
+## Tanker Voyage Charter Party
+
+**IT IS THIS DAY AGREED** between {owners} (hereinafter referred to as "Owners") of the motor/tank vessel called {vessel_name} and {charterers} (hereinafter referred to as "Charterers") that the transportation herein provided for will be performed subject to the terms and conditions of this Charter, which includes Part I and Part II. If there is any conflict between the provisions of Part I and those of Part II, the provisions of Part I shall prevail.
+
+---
+
+### PART I
+
+**(A) Vessel's Description**  
+{vessel_description}
+
+**(D) Loading Port(s) or Range(s)**  
+{loading_port}
+
+**(E) Discharging Port(s) or Range(s)**  
+{discharging_port}
+
+**(F) Laydays**  
+Laydays shall not commence before noon (local time) on {laydays}, unless with Charterers' consent.
+
+**(G) Cancelling**  
+Noon (local time) on: {cancelling}.
+
+**(H) Worldscale Terms**  
+{'Except as otherwise stated or required by the context of this Charter, all terms and conditions of the current scale of nominal tanker freight rates published by the Worldscale Association (London) Ltd and the Worldscale Association (NYC) Inc. as in force on the date of commencement of loading ("Worldscale") shall apply.' if use_worldscale else 'Custom freight terms apply as specified.'}
+
+**(J) Freight Rate**  
+Freight shall be paid at the rate of {freight_rate} per ton on the intaken quantity of cargo.
+
+**(Q) Standard Clauses**  
+{standard_clauses or 'None.'}
+
+**(R) Modern Clauses**  
+{modern_clauses or 'None.'}
+
+**(S) Additional Clauses**  
+{additional_clauses or 'None.'}
+
+**IN WITNESS WHEREOF** Owners and Charterers have caused this Charter consisting of a preamble and Parts I and II to be executed the day and year first above written.
+
+For OWNERS: __________________________  
+For CHARTERERS: ______________________
+
+---
+
+### PART II
+
+**1. Condition of Vessel**  
+The vessel's class as specified in Part I shall be maintained during the currency of this Charter. The Owners shall:  
+(a) before and at the beginning of the loaded voyage exercise due diligence to make the vessel seaworthy and in every way fit for the voyage and for the carriage of the cargo.
+
+**6. Cancellation by Charterer**  
+If the vessel has not given a valid notice of readiness in accordance with Clause 8 before Cancelling specified in Part I (G), Charterers shall have the option of cancelling this Charter unless the vessel shall have been delayed due to Charterers' late nomination or revised orders.
+
+**12. Freight Payment**  
+(a) Subject to Clauses 4 and 35, freight shall be paid at the rate(s) specified in Part I (J), and calculated on the intaken quantity of cargo and on Collected Wastings. Payment of freight shall be made by Charterers in cash without deductions.
+
+**20. ETA**  
+(a) The master shall radio Charterers and agents at loading and discharging ports advising the vessel's ETA on sailing from the last port or when bound for such ports.
+
+**28. New Jason Clause**  
+General Average shall be payable according to the York/Antwerp Rules, 1974. If the adjustment is made in accordance with the law and practice of the United States of America, the following clause shall apply:  
+"In the event of accident, danger, damage or disaster before or after the commencement of the voyage, resulting from any cause whatsoever, whether due to negligence or not..."
+
+**31. Bills of Lading**  
+Subject to all the relevant provisions of this Charter, bills of lading are to be signed as presented, but without prejudice to the Charter. Charterers hereby indemnify Owners against all liabilities and expenses (including legal costs) that may arise from the signing of bills of lading as presented.
+
+**32. TOVALOP**  
+Owners warrant that the vessel is a tanker owned by a Participating Owner in TOVALOP and will so remain during the currency of this Charter. When an escape or discharge of Oil occurs from the vessel and causes or threatens to cause Pollution Damage, Charterers may undertake measures to prevent or minimize such Pollution Damage.
+
+---
+
+**Compliance Warnings**  
+{'; '.join(compliance_warnings) if compliance_warnings else 'None'}
+"""
+    return document
+
+def _time_per_call(fn, iterations, repeat=5):
+    # Best of several runs, which is the least noisy estimate on a shared machine
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best / iterations
+
+def _peak_kb(fn):
+    # Peak Python heap allocated by one call; measured separately so tracing never skews timings
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+def sample_terms(template_name="TANKERVOY 87", vessel_class="VLCC"):
+    terms = dict(get_adjusted_template(template_name, vessel_class))
+    terms.update({
+        "Owners": "Acme Tankers Ltd",
+        "Charterers": "Global Energy Trading SA",
+        "Vessel Name": "MT Example",
+        "Loading Port": "Ras Tanura, Saudi Arabia (Crude export)",
+        "Discharging Port": "Singapore, Singapore (Asian bunkering hub)",
+        "Laydays": date(2026, 11, 1),
+        "Cancelling": date(2026, 11, 5),
+        "Freight Rate": "WS65",
+        "Use Worldscale": True,
+        # Satisfies every compliance rule, so the warnings box matches the legacy renderer's
+        "Additional Clauses": "VOYWAR 2013 war risks, ISPS Code, Both-to-Blame Collision and Clause Paramount apply.",
+    })
+    return terms
+
+def bench_render(iterations=5000):
+    # Compiled render plans against the f-string renderer they replaced
+    results = {}
+    terms = sample_terms()
+    assert generate_document("TANKERVOY 87", terms) == legacy_generate_document("TANKERVOY 87", terms)
+    results["fstring_us"] = _time_per_call(lambda: legacy_generate_document("TANKERVOY 87", terms), iterations) * 1e6
+    results["plan_us"] = _time_per_call(lambda: generate_document("TANKERVOY 87", terms), iterations) * 1e6
+    results["speedup"] = results["fstring_us"] / results["plan_us"]
+    for template_name in get_template_names():
+        compile_plan(template_name)
+        template_terms = sample_terms(template_name)
+        results[f"plan_us[{template_name}]"] = _time_per_call(lambda: generate_document(template_name, template_terms), iterations) * 1e6
+    return results
+
+def rider_clauses(count):
+    # A rider of numbered clauses, roughly the length of real additional clauses
+    return "\n\n".join(
+        f"**{i}. Rider Clause {i}**  \nCharterers shall have the option to nominate additional ports within the ranges "
+        f"stated in Part I, and any extra time and expenses incurred shall be for Charterers' account ({i})."
+        for i in range(1, count + 1)
+    )
+
+def bench_templates(iterations=2000):
+    # Template registry reads and vessel-class adjustment over every template and class
+    results = {}
+    names = get_template_names()
+    classes = get_vessel_class_names()
+    pairs = [(name, vessel_class) for name in names for vessel_class in classes]
+
+    def load_all():
+        for name in names:
+            load_template(name)
+
+    def adjust_all():
+        for name, vessel_class in pairs:
+            adjust_terms_by_vessel_class(load_template(name), vessel_class)
+
+    def adjusted_all():
+        for name, vessel_class in pairs:
+            get_adjusted_template(name, vessel_class)
+
+    results["pairs"] = len(pairs)
+    results["load_template_us"] = _time_per_call(load_all, iterations) / len(names) * 1e6
+    results["adjust_terms_us"] = _time_per_call(adjust_all, iterations // 10) / len(pairs) * 1e6
+    get_adjusted_template.cache_clear()
+    start = time.perf_counter()
+    adjusted_all()
+    results["get_adjusted_template_cold_us"] = (time.perf_counter() - start) / len(pairs) * 1e6
+    results["get_adjusted_template_us"] = _time_per_call(adjusted_all, iterations) / len(pairs) * 1e6
+    results["adjust_all_peak_kb"] = _peak_kb(adjust_all)
+    return results
+
+def bench_riders(small=3, large=2000, iterations=500):
+    # generate_document as the rider grows from a few clauses to a very long one, and the
+    # section-wise preview after a one-term edit
+    results = {}
+    for label, count in (("small", small), ("large", large)):
+        terms = sample_terms()
+        terms["Additional Clauses"] = rider_clauses(count)
+        results[f"clauses[{label}]"] = count
+        results[f"rider_chars[{label}]"] = len(terms["Additional Clauses"])
+        results[f"generate_us[{label}]"] = _time_per_call(lambda: generate_document("TANKERVOY 87", terms), max(5, iterations // max(1, count // 100))) * 1e6
+        results[f"generate_peak_kb[{label}]"] = _peak_kb(lambda: generate_document("TANKERVOY 87", terms))
+
+        # Preview after editing one term: only the sections reading it are re-rendered and resent
+        sections = render_sections("TANKERVOY 87", terms)
+        assert "".join(text for _, _, text in sections) == generate_document("TANKERVOY 87", terms)
+        edits = iter(range(10**9))
+        results[f"sections_edit_us[{label}]"] = _time_per_call(lambda: render_sections("TANKERVOY 87", dict(terms, Owners=f"Owners {next(edits)}")), iterations) * 1e6
+        edited = render_sections("TANKERVOY 87", dict(terms, Owners="Edited Owners"))
+        changed = set(changed_sections({section_id: digest for section_id, digest, _ in sections}, edited))
+        results[f"preview_chars[{label}]"] = sum(len(text) for _, _, text in edited)
+        results[f"preview_changed_chars[{label}]"] = sum(len(text) for section_id, _, text in edited if section_id in changed)
+    return results
+
+def bench_compliance(pages=400, iterations=5000):
+    # Rule engine over a rider of several hundred pages (~3 KB a page): a cold scan, an edit
+    # that changes one clause field, and an unchanged rerun
+    terms = sample_terms()
+    plain = sample_terms()
+    engine = RuleEngine()
+    rider = rider_clauses(pages * 15)
+    start = time.perf_counter()
+    engine.scan(rider)
+    cold_ms = (time.perf_counter() - start) * 1000
+    terms["Additional Clauses"] = rider
+    engine.check(terms.get)
+    terms["Modern Clauses"] += " Charterers to bear EU ETS allowances."
+    start = time.perf_counter()
+    engine.check(terms.get)
+    edit_ms = (time.perf_counter() - start) * 1000
+    return {
+        "rider_chars": len(rider),
+        "rules": len(engine.clause_rules) + len(engine.field_rules),
+        "cold_scan_ms": cold_ms,
+        "edit_other_field_ms": edit_ms,
+        "unchanged_check_us": _time_per_call(lambda: engine.check(terms.get), iterations) * 1e6,
+        "evaluate_us": _time_per_call(lambda: engine._evaluate(plain.get), max(1, iterations // 10)) * 1e6,
+        "cold_scan_peak_kb": _peak_kb(lambda: RuleEngine().scan(rider)),
+    }
+
+def bench_fragments(forms=500):
+    # Extra forms composed from the built-in clause fragments, as a clause pack of house
+    # forms would be: the compliance scans they cost when scanned per fragment against
+    # whole blocks, and the cost of rewording one clause used by every form
+    import random
+    rng = random.Random(0)
+    names = list(get_clause_fragments())
+    results = {"fragments": len(names)}
+    try:
+        for i in range(forms):
+            register_template(f"House form {i}", {
+                "Standard Clauses": rng.sample(names, rng.randint(3, 6)),
+                "Modern Clauses": rng.sample(names, rng.randint(3, 6)),
+                "Additional Clauses": "",
+            })
+        blocks = {load_template(name)[term] for name in get_template_names() for term in ("Standard Clauses", "Modern Clauses")}
+        results["clause_blocks"] = len(blocks)
+        results["block_clause_chars"] = sum(len(block) for block in blocks)
+        results["fragment_chars"] = sum(len(text) for text in get_clause_fragments().values())
+        for label, split in (("block", False), ("fragment", True)):
+            engine = RuleEngine()
+            start = time.perf_counter()
+            for block in blocks:
+                for part in (clause_fragments(block) if split else (block,)):
+                    engine.scan(part)
+            results[f"{label}_scan_ms"] = (time.perf_counter() - start) * 1000
+            results[f"{label}_scans"] = engine.stats["scans"]
+            results[f"{label}_scan_hit_rate"] = engine.stats["cached"] / (engine.stats["cached"] + engine.stats["scans"])
+        start = time.perf_counter()
+        register_clause_fragment("sanctions", CLAUSE_FRAGMENTS["sanctions"].replace("EU,", "EU, UK"))
+        results["fragment_update_ms"] = (time.perf_counter() - start) * 1000
+    finally:
+        reload_templates()
+        register_clause_fragment("sanctions", CLAUSE_FRAGMENTS["sanctions"])
+    return results
+
+def bench_freight(extra_ports=40, iterations=200):
+    # Full route x vessel class x WS grid, for the built-in ports and for a larger CSV-sized matrix
+    import random
+    rng = random.Random(0)
+    results = {}
+    matrix = build_default_matrix("")
+    priced = matrix.price()
+    results["cells"] = priced["lump_sum"].size
+    results["price_all_ms"] = _time_per_call(matrix.price, iterations) * 1000
+    results["quote_us"] = _time_per_call(lambda: matrix.quote("SARTA", "SGSIN", "VLCC", 65), iterations * 10) * 1e6
+    codes = [f"ZZ{i:03d}" for i in range(extra_ports)]
+    for code in codes:
+        for other in matrix.codes[:]:
+            if other != code:
+                matrix.add_leg(code, other, rng.randrange(200, 12000))
+    priced = matrix.price()
+    results[f"cells[{len(matrix.codes)} ports]"] = priced["lump_sum"].size
+    results[f"price_all_ms[{len(matrix.codes)} ports]"] = _time_per_call(matrix.price, max(1, iterations // 10)) * 1000
+    results[f"price_all_peak_kb[{len(matrix.codes)} ports]"] = _peak_kb(matrix.price)
+    return results
+
+def synthetic_sof(voyages, seed=0):
+    # Statement-of-facts events for a month-end run: two calls a voyage, with shifting and
+    # weather exceptions that sometimes overlap
+    rng = np.random.default_rng(seed)
+    calls = voyages * 2
+    base = pd.Timestamp("2026-01-01") + pd.to_timedelta(rng.integers(0, 30 * 24, calls), unit="h")
+    nor = base
+    all_fast = nor + pd.to_timedelta(rng.integers(2, 20, calls), unit="h")
+    hoses_off = all_fast + pd.to_timedelta(rng.integers(20, 60, calls), unit="h")
+    shifting = nor + pd.to_timedelta(rng.integers(0, 4, calls), unit="h")
+    weather = all_fast + pd.to_timedelta(rng.integers(0, 10, calls), unit="h")
+    voyage = np.repeat([f"V{i:05d}" for i in range(voyages)], 2)
+    port = np.tile(["Load", "Discharge"], voyages)
+    frames = [
+        pd.DataFrame({"Voyage": voyage, "Port": port, "Event": "NOR Tendered", "Start": nor, "End": pd.NaT}),
+        pd.DataFrame({"Voyage": voyage, "Port": port, "Event": "All Fast", "Start": all_fast, "End": pd.NaT}),
+        pd.DataFrame({"Voyage": voyage, "Port": port, "Event": "Shifting", "Start": shifting, "End": shifting + pd.Timedelta(hours=3)}),
+        pd.DataFrame({"Voyage": voyage, "Port": port, "Event": "Weather", "Start": weather, "End": weather + pd.Timedelta(hours=8)}),
+        pd.DataFrame({"Voyage": voyage, "Port": port, "Event": "Strike", "Start": weather + pd.Timedelta(hours=4), "End": weather + pd.Timedelta(hours=12)}),
+        pd.DataFrame({"Voyage": voyage, "Port": port, "Event": "Hoses Off", "Start": hoses_off, "End": pd.NaT}),
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+def bench_laytime(sizes=(100, 5000), iterations=3):
+    # Month-end claim runs over SoF logs of growing size
+    results = {}
+    for size in sizes:
+        events = synthetic_sof(size)
+        results[f"events[{size}]"] = len(events)
+        results[f"claims_ms[{size}]"] = _time_per_call(lambda: compute_claims(events, demurrage="$30,000/day"), iterations, repeat=3) * 1000
+        results[f"claims_peak_kb[{size}]"] = _peak_kb(lambda: compute_claims(events, demurrage="$30,000/day"))
+    return results
+
+CLAUSE_WORDS = (
+    "owners charterers vessel cargo freight demurrage laytime berth port notice readiness shifting weather "
+    "strike sanctions war risks piracy insurance premium bunkers sulphur emissions allowance bill lading "
+    "arbitration london singapore new york law liability indemnity collision salvage general average "
+    "deviation ice quarantine pumping heating inspection quantity quality loss shortage agents dues "
+    "towage pilotage draft lightening transfer hire payment cancelling option nomination tolerance"
+).split()
+CLAUSE_TAGS = ["laytime", "sanctions", "security", "environment", "cargo", "payment", "liability", "disputes"]
+
+def synthetic_clause_packs(directory, packs, per_pack, seed=0):
+    # JSON clause packs of random rider wording, tags and templates
+    # Word frequencies fall off with rank, as in real wording: the common clause words above,
+    # then a long tail of rarer ones
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(CLAUSE_WORDS + [f"term{i:04d}" for i in range(5000)])
+    weights = 1.0 / np.arange(1, len(vocabulary) + 1)
+    weights /= weights.sum()
+    template_names = get_template_names()
+    for p in range(packs):
+        clauses = []
+        for c in range(per_pack):
+            words = rng.choice(vocabulary, 60, p=weights)
+            clauses.append({
+                "id": f"c{c}",
+                "title": " ".join(words[:3]).title(),
+                "description": " ".join(words[3:15]).capitalize() + ".",
+                "content": " ".join(words[15:]).capitalize() + ".",
+                "tags": list(rng.choice(CLAUSE_TAGS, 2, replace=False)),
+                "templates": list(rng.choice(template_names, int(rng.integers(0, 3)), replace=False)),
+            })
+        with open(os.path.join(directory, f"pack{p:03d}.json"), "w") as f:
+            json.dump({"clauses": clauses}, f)
+
+def bench_clauses(packs=20, per_pack=250, iterations=200):
+    # Indexed clause search against a linear substring scan of every clause, which is what
+    # filtering the hard-coded list did; the first search also reads and indexes every pack
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        synthetic_clause_packs(tmp, packs, per_pack)
+        library = ClauseLibrary(tmp)
+        start = time.perf_counter()
+        library.search("demurrage")
+        results["cold_load_ms"] = (time.perf_counter() - start) * 1000
+        every_clause = library.search("", limit=10**9)
+        results["clauses"] = len(every_clause)
+        results["search_us"] = _time_per_call(lambda: library.search("war risks premium"), iterations) * 1e6
+        results["prefix_search_us"] = _time_per_call(lambda: library.search("demur"), iterations) * 1e6
+        results["filtered_search_us"] = _time_per_call(lambda: library.search("freight payment", ["payment"], "TANKERVOY 87"), iterations) * 1e6
+
+        def linear_scan(query):
+            words = query.lower().split()
+            return [clause for clause in every_clause if all(word in (clause["title"] + " " + clause["description"] + " " + clause["content"]).lower() for word in words)]
+        results["linear_scan_us"] = _time_per_call(lambda: linear_scan("war risks premium"), max(1, iterations // 20)) * 1e6
+    return results
+
+def _docx_rss_kb(writer, riders):
+    # Growth of the peak RSS of a fresh process over writing one charter; python-docx keeps its
+    # tree in lxml, which tracemalloc does not see
+    import resource
+    import docx  # imported before the baseline, like the rest of the setup
+    terms = sample_terms()
+    terms["Additional Clauses"] = rider_clauses(riders)
+    doc_text = generate_document("TANKERVOY 87", terms)
+    with tempfile.TemporaryFile() as f:
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if writer == "python-docx":
+            build_docx(doc_text).save(f)
+        else:
+            write_docx(doc_text, f)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+
+def bench_docx(large=200, iterations=20):
+    # The download path: the python-docx build and save it used, with the base64 step the app
+    # used to embed links, against the streaming writer, into memory and into a file. The
+    # charter text is made before measuring; for the file the peak should not grow with it.
+    # xlarge is a few hundred pages of riders.
+    results = {}
+    for writer in ("python-docx", "stream"):
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            results[f"{writer.replace('-', '_')}_rss_growth_kb[xlarge]"] = pool.submit(_docx_rss_kb, writer, large * 30).result()
+    for label, count in (("small", 0), ("large", large), ("xlarge", large * 30)):
+        terms = sample_terms()
+        if count:
+            terms["Additional Clauses"] = rider_clauses(count)
+        doc_text = generate_document("TANKERVOY 87", terms)
+        sections = [text for _, _, text in render_sections("TANKERVOY 87", terms)]
+
+        def python_docx():
+            buffer = BytesIO()
+            build_docx(doc_text).save(buffer)
+            return buffer.getvalue()
+
+        def stream_to_file():
+            with tempfile.TemporaryFile() as f:
+                write_docx(sections, f)
+
+        results[f"doc_chars[{label}]"] = len(doc_text)
+        if label != "xlarge":
+            doc = build_docx(doc_text)
+            data = python_docx()
+
+            def save():
+                buffer = BytesIO()
+                doc.save(buffer)
+
+            results[f"build_ms[{label}]"] = _time_per_call(lambda: build_docx(doc_text), iterations, repeat=3) * 1000
+            results[f"save_ms[{label}]"] = _time_per_call(save, iterations, repeat=3) * 1000
+            results[f"base64_ms[{label}]"] = _time_per_call(lambda: base64.b64encode(data).decode(), iterations * 10, repeat=3) * 1000
+            results[f"docx_kb[{label}]"] = len(data) / 1024
+            results[f"build_save_peak_kb[{label}]"] = _peak_kb(python_docx)
+            results[f"stream_ms[{label}]"] = _time_per_call(lambda: generate_docx_bytes(doc_text), iterations, repeat=3) * 1000
+        results[f"stream_docx_kb[{label}]"] = len(generate_docx_bytes(doc_text)) / 1024
+        results[f"stream_bytes_peak_kb[{label}]"] = _peak_kb(lambda: generate_docx_bytes(doc_text))
+        results[f"stream_file_peak_kb[{label}]"] = _peak_kb(stream_to_file)
+    return results
+
+def _legacy_json_save(json_path, template, vessel_class, terms):
+    # The load-append-rewrite save that charter_store replaced
+    saved_charters = []
+    if os.path.exists(json_path):
+        with open(json_path, "r") as f:
+            saved_charters = json.load(f)
+    saved_charters.append({"template": template, "vessel_class": vessel_class, "terms": {k: str(v) for k, v in terms.items()}})
+    with open(json_path, "w") as f:
+        json.dump(saved_charters, f)
+
+def _latency_ms(fn, calls):
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+def _concurrent_saver(args):
+    db_path, writer, saves = args
+    terms = sample_terms()
+    for i in range(saves):
+        terms["Vessel Name"] = f"MT Writer {writer} #{i}"
+        charter_store.save_charter(db_path, "TANKERVOY 87", "VLCC", terms)
+    return saves
+
+def charter_history(size, seed=0):
+    # Saved charters as the form produces them: defaults for the chosen form and class, with
+    # the parties, vessel, ports, dates and rate filled in and now and then a few rider clauses
+    import random
+    from ports import PORTS
+    rng = random.Random(seed)
+    riders = [clause["content"] for clause in ClauseLibrary().search(limit=100)]
+    templates, classes = get_template_names(), get_vessel_class_names()
+    history = []
+    for i in range(size):
+        template_name, vessel_class = rng.choice(templates), rng.choice(classes)
+        terms = dict(get_adjusted_template(template_name, vessel_class))
+        laydays = date(2026, 1, 1) + timedelta(days=rng.randrange(365))
+        terms.update({
+            "Owners": rng.choice(["Acme Tankers Ltd", "Nordic Shipping AS", "Pacific Crude Carriers", "Hellenic Marine SA"]),
+            "Charterers": rng.choice(["Global Energy Trading SA", "Refiners United", "Asia Petro Pte"]),
+            "Vessel Name": f"MT Vessel {rng.randrange(300)}",
+            "Loading Port": rng.choice(PORTS),
+            "Discharging Port": rng.choice(PORTS),
+            "Laydays": laydays,
+            "Cancelling": laydays + timedelta(days=rng.randrange(3, 10)),
+            "Freight Rate": f"WS{rng.randrange(40, 160, 5)}",
+            "Use Worldscale": rng.random() < 0.8,
+            "Additional Clauses": "\n\n".join(rng.sample(riders, rng.choice([0, 0, 0, 1, 2, 3]))),
+        })
+        history.append((template_name, vessel_class, terms))
+    return history
+
+def bench_model(fixtures=100_000):
+    # Fixtures read from CSV, held as terms dicts (as batch jobs used to) and as parsed
+    # CharterTerms; each row is dropped once converted, so only what is kept is measured
+    import csv
+    import io
+    history = charter_history(min(fixtures, 20_000))
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, ["Template", "Vessel Class", *dict.fromkeys(k for _, _, terms in history for k in terms)])
+    writer.writeheader()
+    for i in range(fixtures):
+        template_name, vessel_class, terms = history[i % len(history)]
+        writer.writerow({"Template": template_name, "Vessel Class": vessel_class, **terms})
+    text = buffer.getvalue()
+
+    def rows():
+        for row in csv.DictReader(io.StringIO(text)):
+            template_name, vessel_class = row.pop("Template"), row.pop("Vessel Class")
+            terms = dict(get_adjusted_template(template_name, vessel_class))
+            terms.update(row)
+            yield template_name, vessel_class, terms
+
+    results = {}
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = [terms for _, _, terms in rows()]
+    results["dict_per_fixture_kb"] = (tracemalloc.get_traced_memory()[0] - before) / fixtures / 1024
+    del held
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    held = [parse_charter(terms, template_name, vessel_class)[0] for template_name, vessel_class, terms in rows()]
+    results["model_per_fixture_kb"] = (tracemalloc.get_traced_memory()[0] - before) / fixtures / 1024
+    tracemalloc.stop()
+    results["model_mb_per_100k"] = results["model_per_fixture_kb"] * 100_000 / 1024
+    del held
+    parsed = list(rows())[:5000]
+    results["parse_us"] = _time_per_call(lambda: [parse_charter(terms, t, v) for t, v, terms in parsed], 1) / len(parsed) * 1e6
+    return results
+
+def bench_validation(fixtures=50_000):
+    # A fixture list with one row in three broken, validated row by row through
+    # fixture_to_terms and column-wise by validate_fixtures; both must report the same errors
+    breakages = [
+        {},
+        {"Laydays": "2026-02-30"},
+        {"Cancelling": "next week"},
+        {"Owners": " "},
+        {"Loading Port": "Select a port"},
+        {"Freight Rate": "market"},
+        {"Laydays": "2026-05-10", "Cancelling": "2026-05-01"},
+        {"Template": "GENCON 1922"},
+        {"Vessel Class": "Canoe"},
+        {"Freight Rate": "[Rate]", "Laydays": "[Date]"},
+    ]
+    history = charter_history(min(fixtures, 5000))
+    rows = []
+    for i in range(fixtures):
+        template_name, vessel_class, terms = history[i % len(history)]
+        row = {"Template": template_name, "Vessel Class": vessel_class}
+        row.update({term: terms.get(term, "") for term in ("Owners", "Charterers", "Vessel Name", "Loading Port", "Discharging Port", "Laydays", "Cancelling", "Freight Rate")})
+        row.update(breakages[i % len(breakages)] if i % 3 == 0 else {})
+        rows.append({key: str(value) for key, value in row.items()})
+    frame = pd.DataFrame(rows, dtype=object)
+
+    records = frame.to_dict("records")
+    start = time.perf_counter()
+    scalar = {(index + 1, field): error for index, fixture in enumerate(records) for field, error in fixture_to_terms(fixture)[3].items()}
+    scalar_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    table = validate_fixtures(frame)
+    vector_seconds = time.perf_counter() - start
+    vector = {(row, field): error for row, field, error in table.itertuples(index=False)}
+    assert vector == scalar, f"{len(set(vector.items()) ^ set(scalar.items()))} errors differ between executors"
+    return {
+        "errors": len(table),
+        "scalar_us_per_row": scalar_seconds / fixtures * 1e6,
+        "vectorized_us_per_row": vector_seconds / fixtures * 1e6,
+        "speedup": scalar_seconds / vector_seconds,
+    }
+
+def _db_kb(db_path):
+    conn = charter_store.connect(db_path)
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(db_path) / 1024
+
+def bench_store(sizes=(100, 10_000, 1_000_000), saves=200, json_limit=10_000, writers=4, history=20_000):
+    # Save latency against history size, for the SQLite store and the legacy JSON rewrite
+    results = {}
+    terms = sample_terms()
+    seed = ("TANKERVOY 87", "VLCC", terms)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            db_path = os.path.join(tmp, f"charters_{size}.db")
+            for start in range(0, size, 10_000):
+                charter_store.save_charters(db_path, [seed] * min(10_000, size - start))
+            results[f"sqlite[{size}]"] = _latency_ms(lambda: charter_store.save_charter(db_path, *seed), saves)
+            results[f"sqlite_save_peak_kb[{size}]"] = _peak_kb(lambda: charter_store.save_charter(db_path, *seed))
+            charter_store.close(db_path)
+            os.remove(db_path)
+            if size <= json_limit:
+                json_path = os.path.join(tmp, f"charters_{size}.json")
+                with open(json_path, "w") as f:
+                    json.dump([{"template": seed[0], "vessel_class": seed[1], "terms": {k: str(v) for k, v in terms.items()}}] * size, f)
+                results[f"json[{size}]"] = _latency_ms(lambda: _legacy_json_save(json_path, *seed), max(5, saves // 10))
+
+        # On-disk size and full load of a realistic history, stored whole with every value a
+        # string (as before delta encoding) and as deltas against the form defaults
+        charters = charter_history(history)
+        legacy_path, delta_path = os.path.join(tmp, "legacy.db"), os.path.join(tmp, "delta.db")
+        legacy = charter_store.connect(legacy_path)
+        with legacy:
+            legacy.execute("BEGIN IMMEDIATE")
+            legacy.executemany(
+                "INSERT INTO charters (created_at, template, vessel_class, vessel_name, laydays, terms) VALUES (?, ?, ?, ?, ?, ?)",
+                [(0.0, t, v, str(terms["Vessel Name"]), str(terms["Laydays"]), json.dumps({k: str(x) for k, x in terms.items()})) for t, v, terms in charters],
+            )
+        charter_store.save_charters(delta_path, charters)
+        results["history_legacy_kb"] = _db_kb(legacy_path)
+        results["history_delta_kb"] = _db_kb(delta_path)
+        results["history_size_reduction"] = 1 - results["history_delta_kb"] / results["history_legacy_kb"]
+        results["history_load_legacy_ms"] = _time_per_call(lambda: sum(1 for _ in charter_store.iter_charters(legacy_path)), 1) * 1000
+        results["history_load_delta_ms"] = _time_per_call(lambda: sum(1 for _ in charter_store.iter_charters(delta_path)), 1) * 1000
+        loaded = [charter["terms"] for charter in charter_store.iter_charters(delta_path)]
+        assert loaded == [terms for _, _, terms in charters]
+        for path in (legacy_path, delta_path):
+            charter_store.close(path)
+
+        # Concurrent writers in separate processes must not lose any saves
+        db_path = os.path.join(tmp, "concurrent.db")
+        charter_store.connect(db_path)
+        with ProcessPoolExecutor(max_workers=writers) as pool:
+            expected = sum(pool.map(_concurrent_saver, [(db_path, w, saves) for w in range(writers)]))
+        results["concurrent_lost_saves"] = expected - charter_store.count_charters(db_path)
+        charter_store.close(db_path)
+    return results
+
+def bench_routes(known_routes=5000, queries=2000):
+    # Uncached route lookups against an index holding thousands of known trades
+    import random
+    rng = random.Random(0)
+    codes = list(PORT_ALIASES)
+    index = build_default_index()
+    for i in range(known_routes):
+        index.add_route(rng.choice(codes), rng.choice(codes), [f"Form {i}"])
+    ends = ["USG", "ARA", "Houston", "Sing", "Fujairah", "Ningboo", "Bony", "PG", "RT", "New York", "China"]
+    routes = [f"{rng.choice(ends)} to {rng.choice(ends)} #{i}" for i in range(queries)]
+    start = time.perf_counter()
+    for route in routes:
+        index.lookup(route)
+    lookup_ms = (time.perf_counter() - start) / queries * 1000
+    start = time.perf_counter()
+    index.lookup_many(routes * 10)
+    batch_ms = (time.perf_counter() - start) * 1000
+    # The public entry point on the default index, first call and cached repeat
+    samples = ["Houston to Rotterdam", "USG -> ARA", "RT – Singapore", "Bony - Ningboo", "Hamburg to Lagos"]
+    start = time.perf_counter()
+    for route in samples:
+        suggest_templates_by_route(f"{route} ")
+    suggest_ms = (time.perf_counter() - start) / len(samples) * 1000
+    suggest_cached_us = _time_per_call(lambda: [suggest_templates_by_route(route) for route in samples], 2000) / len(samples) * 1e6
+    return {
+        "known_routes": known_routes + 6,
+        "lookup_ms": lookup_ms,
+        "lookup_many_ms[20k rows]": batch_ms,
+        "suggest_ms": suggest_ms,
+        "suggest_cached_us": suggest_cached_us,
+        "index_peak_kb": _peak_kb(build_default_index),
+    }
+
+def bench_app(interactions=20):
+    # A full script rerun per widget change under AppTest: what every edit cost before the form
+    # sections became fragments, and still the cost of a vessel, template or port change. Also
+    # the full gc pass Streamlit runs after every rerun, with the startup heap frozen by the app
+    # and after unfreezing it.
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py"), default_timeout=60).run()
+    edits = iter(range(interactions))
+    results = {"full_rerun_ms": _latency_ms(lambda: at.text_input(key="term_Owners").set_value(f"Owners {next(edits)}").run(), interactions)}
+    results["post_run_gc_ms"] = _time_per_call(lambda: gc.collect(2), 1) * 1000
+    gc.unfreeze()
+    results["post_run_gc_unfrozen_ms"] = _time_per_call(lambda: gc.collect(2), 1) * 1000
+    return results
+
+def bench_sessions(sessions=8, rounds=2):
+    # Concurrent app sessions filling in, generating and saving charters (app_load_test.py),
+    # against a scratch store; the store setting is restored for the other benchmarks
+    import streamlit as st
+    previous = os.environ.get("CHARTER_STORE_PATH")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            report = run_level(os.path.join(tmp, "charters.db"), sessions, rounds)
+            charter_store.close(os.path.join(tmp, "charters.db"))
+    finally:
+        if previous is None:
+            os.environ.pop("CHARTER_STORE_PATH", None)
+        else:
+            os.environ["CHARTER_STORE_PATH"] = previous
+        st.cache_resource.clear()
+    generate = report["interactions_by_name"].get("generate_to_preview", {})
+    return {
+        "interactions": report["interactions"],
+        "errors": report["errors"],
+        "rerun_p50_ms": report["p50_ms"],
+        "rerun_p99_ms": report["p99_ms"],
+        "generate_to_preview_p50_ms": generate.get("p50_ms"),
+        "cpu_percent": report["cpu_percent"],
+        "rss_peak_kb": report["rss_peak_mb"] * 1024,
+        "lost_saves": report["lost_saves"],
+        "corrupted_saves": report["corrupted_saves"] + report["duplicated_saves"],
+    }
+
+def bench_startup(repeat=5):
+    # Cold import of everything app.py imports at the top, in fresh interpreters; heavy
+    # dependencies imported at startup are counted so the comparison flags them too
+    profile = best_of(repeat)
+    return {"app_import_ms": profile["import_ms"], "heavy_modules_at_startup": len(profile["heavy"])}
+
+BENCHMARKS = {
+    "templates": bench_templates,
+    "routes": bench_routes,
+    "render": bench_render,
+    "riders": bench_riders,
+    "compliance": bench_compliance,
+    "fragments": bench_fragments,
+    "freight": bench_freight,
+    "laytime": bench_laytime,
+    "clauses": bench_clauses,
+    "docx": bench_docx,
+    "store": bench_store,
+    "model": bench_model,
+    "validation": bench_validation,
+    "app": bench_app,
+    "sessions": bench_sessions,
+    "startup": bench_startup,
+}
+
+# Smaller sizes for a fast check before committing; numbers are only comparable within a mode
+QUICK = {
+    "templates": {"iterations": 200},
+    "routes": {"known_routes": 500, "queries": 200},
+    "render": {"iterations": 500},
+    "riders": {"large": 500, "iterations": 50},
+    "compliance": {"pages": 40, "iterations": 500},
+    "fragments": {"forms": 50},
+    "freight": {"extra_ports": 10, "iterations": 20},
+    "laytime": {"sizes": (100, 1000), "iterations": 1},
+    "clauses": {"packs": 4, "per_pack": 250, "iterations": 20},
+    "docx": {"large": 50, "iterations": 3},
+    "store": {"sizes": (100, 10_000), "saves": 50, "json_limit": 10_000, "writers": 2, "history": 2000},
+    "model": {"fixtures": 10_000},
+    "validation": {"fixtures": 5000},
+    "app": {"interactions": 5},
+    "sessions": {"sessions": 4, "rounds": 1},
+    "startup": {"repeat": 2},
+}
+
+# Metric suffixes where lower is better; anything else is context and is not compared
+LOWER_IS_BETTER = ("_us", "_ms", "_kb", "lost_saves", "corrupted_saves")
+
+def _metric_value(value):
+    # Latency entries from _latency_ms are compared on their median
+    return value.get("p50_ms") if isinstance(value, dict) else value
+
+def _metric_name(name):
+    return name.split("[", 1)[0]
+
+def compare(results, baseline, threshold=0.10):
+    # Rows for every metric present in both runs; regressed when worse than the baseline by more than threshold
+    rows = []
+    for bench, metrics in results["benchmarks"].items():
+        before = baseline.get("benchmarks", {}).get(bench, {})
+        for name, value in metrics.items():
+            current, previous = _metric_value(value), _metric_value(before.get(name))
+            if previous is None or not isinstance(current, (int, float)) or isinstance(current, bool):
+                continue
+            if not _metric_name(name).endswith(LOWER_IS_BETTER):
+                continue
+            change = (current - previous) / previous if previous else (0.0 if current == previous else float("inf"))
+            rows.append({"benchmark": bench, "metric": name, "baseline": previous, "current": current, "change": change, "regressed": change > threshold})
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the charter generator benchmarks.")
+    parser.add_argument("names", nargs="*", help=f"Benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--quick", action="store_true", help="Use smaller sizes and fewer iterations")
+    parser.add_argument("--output", help="Write results to this JSON file, e.g. to save a baseline")
+    parser.add_argument("--baseline", help="Compare against results saved earlier with --output")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown before a metric counts as regressed (default 0.10)")
+    args = parser.parse_args(argv)
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    results = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "quick": args.quick,
+        },
+        "benchmarks": {},
+    }
+    main_module = sys.modules["__main__"]
+    for name in args.names or BENCHMARKS:
+        print(f"running {name}...", file=sys.stderr)
+        results["benchmarks"][name] = BENCHMARKS[name](**(QUICK[name] if args.quick else {}))
+        # AppTest leaves app.py as __main__, where process pools look up this module's functions
+        sys.modules["__main__"] = main_module
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+    if not args.baseline:
+        if not args.output:
+            json.dump(results, sys.stdout, indent=2)
+            print()
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("meta", {}).get("quick") != args.quick:
+        print("warning: baseline was recorded in a different --quick mode", file=sys.stderr)
+    rows = compare(results, baseline, args.threshold)
+    for row in rows:
+        flag = "REGRESSED" if row["regressed"] else ""
+        print(f"{row['benchmark']:<10} {row['metric']:<36} {row['baseline']:>12.3f} -> {row['current']:>12.3f}  {row['change']:+7.1%}  {flag}")
+    regressed = [row for row in rows if row["regressed"]]
+    print(f"{len(rows)} metrics compared, {len(regressed)} regressed beyond {args.threshold:.0%}")
+    if regressed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
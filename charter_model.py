@@ -0,0 +1,247 @@
+import re
+import sys
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+
+from templates import get_adjusted_template, get_template_names, get_vessel_class_names
+
+# Charter terms parsed once, where they enter the system (the form, a fixture row, an API
+# request): dates are dates, rates are Rate values, the Worldscale checkbox is a bool and
+# the vessel class is an enum, and the same pass collects the validation errors.
+#
+# CharterTerms is slotted and shares what repeats across fixtures: strings are interned,
+# unchanged template defaults such as the clause blocks are the template's own strings, and
+# rates and dates parsed from the same text are the same objects (all immutable), so 100k
+# fixtures fit in memory. A value that does not parse as its type without being an
+# error, such as the "[Date]" placeholder or demurrage "As agreed", is kept as given in
+# extra along with terms the model has no field for, so get() and to_terms() return exactly
+# the terms that were parsed. get() reads like custom_terms.get, so the renderer and the
+# compliance engine take either.
+
+PORT_PLACEHOLDER = "Select a port"
+REQUIRED_FIELDS = ["Owners", "Charterers", "Vessel Name"]
+
+VesselClass = Enum("VesselClass", {name.upper(): name for name in get_vessel_class_names()}, type=str)
+
+class RateKind(str, Enum):
+    WORLDSCALE = "WS"
+    USD = "USD"
+
+@dataclass(frozen=True, slots=True)
+class Rate:
+    # A rate as written ("WS65", "WS100–WS150", "$40,000/day", "USD 12.50/t") and its
+    # numbers; high is set for a range and unit is whatever follows the amount
+    text: str
+    kind: RateKind
+    low: Decimal
+    high: Decimal = None
+    unit: str = ""
+
+    def __str__(self):
+        return self.text
+
+_NUMBER = r"(\d[\d,]*(?:\.\d+)?)"
+_DASH = r"\s*(?:[-–—]|to)\s*"
+WORLDSCALE_RATE = re.compile(rf"(?:ws|worldscale)\s*{_NUMBER}(?:{_DASH}(?:ws|worldscale)?\s*{_NUMBER})?(?:\s*(?:points?|pts))?", re.I)
+_UNIT = r"(?:/\s*|per\s+)(?:day|d|ton|tonne|t|mt)|pdpr|pmt|lump\s*sum"
+AMOUNT_RATE = re.compile(rf"(usd\s*|us\$\s*|\$\s*)?{_NUMBER}(?:{_DASH}(?:usd\s*|\$\s*)?{_NUMBER})?\s*(?:usd\s*)?({_UNIT})?", re.I)
+PLACEHOLDER = re.compile(r"\[[^\]]*\]")
+ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+def _decimal(number):
+    return Decimal(number.replace(",", ""))
+
+def parse_rate(value, worldscale=False):
+    # Rate for "WS65", "WS100–WS150", "$20,000/day" or "USD 25/t"; a bare number is WS points
+    # when worldscale is set and USD otherwise. None when the text is not a rate.
+    if isinstance(value, Rate):
+        return value
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        value = str(value)
+    if not isinstance(value, str):
+        return None
+    return _parse_rate_text(value, worldscale)
+
+@lru_cache(maxsize=4096)
+def _parse_rate_text(value, worldscale):
+    text = value.strip()
+    match = WORLDSCALE_RATE.fullmatch(text)
+    if match:
+        low, high = match.groups()
+        return Rate(value, RateKind.WORLDSCALE, _decimal(low), _decimal(high) if high else None)
+    match = AMOUNT_RATE.fullmatch(text)
+    if match:
+        currency, low, high, unit = match.groups()
+        kind = RateKind.WORLDSCALE if worldscale and not currency and not unit else RateKind.USD
+        return Rate(value, kind, _decimal(low), _decimal(high) if high else None, unit or "")
+    return None
+
+def parse_date(value):
+    # date for a date, datetime or ISO date string; None when it is not one
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        return _parse_date_text(value)
+    return None
+
+@lru_cache(maxsize=4096)
+def _parse_date_text(value):
+    text = value.strip()
+    if not ISO_DATE.fullmatch(text):
+        return None
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        return None
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("true", "yes", "y", "1")
+
+def is_placeholder(value):
+    return isinstance(value, str) and bool(PLACEHOLDER.search(value))
+
+def _text(value):
+    # Interned so repeated parties, vessels, ports and rider clauses across fixtures share
+    # one string
+    return sys.intern(value) if type(value) is str else value
+
+@dataclass(frozen=True, slots=True)
+class CharterTerms:
+    template: str = None
+    vessel_class: VesselClass = None
+    owners: str = None
+    charterers: str = None
+    vessel_name: str = None
+    vessel_description: str = None
+    cargo: str = None
+    cargo_capacity: str = None
+    loading_port: str = None
+    discharging_port: str = None
+    delivery_port: str = None
+    redelivery_port: str = None
+    route: str = None
+    period: str = None
+    laydays: date = None
+    cancelling: date = None
+    laytime: str = None
+    demurrage: Rate = None
+    freight_rate: Rate = None
+    hire_rate: Rate = None
+    use_worldscale: bool = None
+    standard_clauses: str = None
+    modern_clauses: str = None
+    additional_clauses: str = None
+    extra: dict = None
+
+    def get(self, term, default=None):
+        attribute = TERM_ATTRIBUTES.get(term)
+        value = getattr(self, attribute) if attribute else None
+        if value is None and self.extra is not None:
+            value = self.extra.get(term)
+        return default if value is None else value
+
+    def to_terms(self):
+        # The terms dict this charter was parsed from, with parsed values
+        terms = {term: getattr(self, attribute) for term, attribute in TERM_ATTRIBUTES.items() if getattr(self, attribute) is not None}
+        if self.extra:
+            terms.update(self.extra)
+        return terms
+
+# Term name in the forms -> CharterTerms field; template and vessel_class are not terms
+TERM_ATTRIBUTES = {
+    field.name.replace("_", " ").title(): field.name
+    for field in fields(CharterTerms)
+    if field.name not in ("template", "vessel_class", "extra")
+}
+DATE_TERMS = ("Laydays", "Cancelling")
+RATE_TERMS = ("Freight Rate", "Hire Rate", "Demurrage")
+FREIGHT_RATE_ERROR = "Freight rate must be Worldscale points (e.g. WS65 or WS100–WS150) or an amount"
+
+# Validation rules, run on one terms dict by parse_charter and on a whole fixture DataFrame
+# by batch.validate_fixtures. Each check has one implementation per executor, both built on
+# the patterns above; a field reports the first rule it fails.
+#   date       given, not blank or a placeholder, and not a YYYY-MM-DD date
+#   required   given but empty
+#   port       missing, empty or the "Select a port" placeholder
+#   after      field is a date on or before the date in other
+#   rate       given, not a placeholder, and not Worldscale points or an amount
+RULES = [
+    {"field": "Laydays", "check": "date", "message": "Laydays must be a date (YYYY-MM-DD)"},
+    {"field": "Cancelling", "check": "date", "message": "Cancelling must be a date (YYYY-MM-DD)"},
+    *({"field": term, "check": "required", "message": f"{term} is required"} for term in REQUIRED_FIELDS),
+    {"field": "Loading Port", "check": "port", "message": "Please select a loading port"},
+    {"field": "Discharging Port", "check": "port", "message": "Please select a discharging port"},
+    {"field": "Cancelling", "check": "after", "other": "Laydays", "message": "Cancelling date must be after laydays"},
+    {"field": "Freight Rate", "check": "rate", "message": FREIGHT_RATE_ERROR},
+]
+
+def _failed(rule, terms, charter):
+    field = rule["field"]
+    value = terms.get(field)
+    check = rule["check"]
+    if check == "date":
+        return value is not None and getattr(charter, TERM_ATTRIBUTES[field]) is None and not is_placeholder(value) and bool(str(value).strip())
+    if check == "required":
+        return field in terms and not value
+    if check == "port":
+        return value in (None, "", PORT_PLACEHOLDER)
+    if check == "after":
+        later, earlier = getattr(charter, TERM_ATTRIBUTES[field]), getattr(charter, TERM_ATTRIBUTES[rule["other"]])
+        return later is not None and earlier is not None and earlier >= later
+    if check == "rate":
+        return bool(value) and getattr(charter, TERM_ATTRIBUTES[field]) is None and not is_placeholder(value)
+    raise ValueError(f"Unknown check {check!r}")
+
+def parse_charter(terms, template_name=None, vessel_class=None):
+    # (CharterTerms, {field: message}) for a terms dict. template_name and vessel_class are
+    # checked against the registry when given.
+    errors = {}
+    values = {}
+    extra = {}
+    if template_name is not None and template_name not in get_template_names():
+        errors["Template"] = f"Unknown template '{template_name}'"
+    if vessel_class is not None:
+        try:
+            values["vessel_class"] = VesselClass(vessel_class)
+        except ValueError:
+            errors["Vessel Class"] = f"Unknown vessel class '{vessel_class}'"
+    defaults = {}
+    if template_name is not None:
+        values["template"] = _text(template_name)
+        defaults = get_adjusted_template(template_name, vessel_class)
+
+    worldscale = parse_bool(terms.get("Use Worldscale", True))
+    for term, value in terms.items():
+        attribute = TERM_ATTRIBUTES.get(term)
+        if attribute is None:
+            extra[_text(term)] = _text(value)
+            continue
+        if value is None:
+            continue
+        if term in DATE_TERMS:
+            parsed = parse_date(value)
+        elif term in RATE_TERMS:
+            parsed = parse_rate(value, worldscale and term == "Freight Rate")
+        elif term == "Use Worldscale":
+            parsed = worldscale
+        else:
+            # Unchanged defaults, such as the clause blocks, share the template's string
+            default = defaults.get(term)
+            parsed = default if value == default else _text(value)
+        if parsed is None:
+            extra[term] = _text(value)
+        else:
+            values[attribute] = parsed
+
+    charter = CharterTerms(**values, extra=extra or None)
+    for rule in RULES:
+        if rule["field"] not in errors and _failed(rule, terms, charter):
+            errors[rule["field"]] = rule["message"]
+    return charter, errors
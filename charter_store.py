@@ -0,0 +1,389 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from instrumentation import span, timed
+from templates import get_adjusted_template
+
+# Saved charters live in SQLite in WAL mode: a save is one short transaction (O(1) in
+# history size), and concurrent Streamlit sessions serialise on SQLite's write lock instead
+# of racing to rewrite the same JSON file.
+#
+# A charter is stored as a delta against the defaults of its (template, vessel class):
+#
+#   {"set": {term: value, ...}, "unset": [term, ...], "order": [term, ...]}
+#
+# with empty parts left out and "order" only kept when the terms are not in snapshot order.
+# The defaults themselves are a snapshot, stored once per distinct content, so a charter
+# still loads as saved after the templates change. Values keep their type (dates load back
+# as dates), and strings of TEXT_MIN_CHARS or more, such as clause blocks, are stored once
+# in the texts table and referenced by id. Rows saved before deltas (snapshot IS NULL) hold
+# the full terms and load unchanged; compact() rewrites them as deltas.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS charters (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    template TEXT NOT NULL,
+    vessel_class TEXT NOT NULL,
+    vessel_name TEXT,
+    laydays TEXT,
+    terms TEXT NOT NULL,
+    snapshot INTEGER REFERENCES snapshots (id)
+);
+CREATE INDEX IF NOT EXISTS idx_charters_template ON charters (template, vessel_class);
+CREATE INDEX IF NOT EXISTS idx_charters_vessel_class ON charters (vessel_class, template);
+CREATE INDEX IF NOT EXISTS idx_charters_vessel_name ON charters (vessel_name COLLATE NOCASE, template, vessel_class);
+CREATE INDEX IF NOT EXISTS idx_charters_laydays ON charters (laydays, template, vessel_class);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    digest TEXT NOT NULL UNIQUE,
+    terms TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS texts (
+    id INTEGER PRIMARY KEY,
+    digest TEXT NOT NULL UNIQUE,
+    text TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS migrations (
+    source TEXT PRIMARY KEY,
+    migrated_at REAL NOT NULL,
+    charters INTEGER NOT NULL
+);
+"""
+
+BUSY_TIMEOUT_MS = 10000
+
+TEXT_MIN_CHARS = 64
+
+_local = threading.local()
+
+def connect(db_path):
+    # One connection per thread and database; sqlite3 connections are not shared across threads
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.executescript(SCHEMA)
+        _add_snapshot_column(conn)
+        connections[db_path] = conn
+    return conn
+
+def _add_snapshot_column(conn):
+    # Stores created before delta encoding; another process may be adding it at the same time
+    if "snapshot" in {row[1] for row in conn.execute("PRAGMA table_info(charters)")}:
+        return
+    try:
+        conn.execute("ALTER TABLE charters ADD COLUMN snapshot INTEGER REFERENCES snapshots (id)")
+    except sqlite3.OperationalError:
+        if "snapshot" not in {row[1] for row in conn.execute("PRAGMA table_info(charters)")}:
+            raise
+
+def close(db_path):
+    connections = getattr(_local, "connections", {})
+    conn = connections.pop(db_path, None)
+    if conn is not None:
+        conn.close()
+
+def content_digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _plain(value):
+    # JSON value for a term; dates and decimals are tagged so they load back as the same type
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, date):
+        return {"$date": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"$decimal": str(value)}
+    return str(value)
+
+_TAGS = {"$date": date.fromisoformat, "$datetime": datetime.fromisoformat, "$decimal": Decimal}
+
+def _typed(obj):
+    # json object_hook: tagged values back to their type; text references are resolved later
+    if len(obj) == 1:
+        (tag, raw), = obj.items()
+        if tag in _TAGS:
+            return _TAGS[tag](raw)
+    return obj
+
+def _resolve(values, texts):
+    return {key: texts[value["$text"]] if type(value) is dict else value for key, value in values.items()}
+
+def _same(a, b):
+    # True == 1 in Python, but a checkbox and a number are different terms
+    return type(a) is type(b) and a == b
+
+def _summary(terms):
+    # Index columns are text, as the filters compare them
+    vessel_name, laydays = terms.get("Vessel Name"), terms.get("Laydays")
+    return (None if vessel_name is None else str(vessel_name), None if laydays is None else str(laydays))
+
+_defaults = {}
+
+def _snapshot(template, vessel_class):
+    # (plain defaults, digest) for a template and vessel class, recomputed when the templates reload
+    adjusted = get_adjusted_template(template, vessel_class)
+    cached = _defaults.get((template, vessel_class))
+    if cached is None or cached[0] is not adjusted:
+        plain = {key: _plain(value) for key, value in adjusted.items()}
+        cached = _defaults[(template, vessel_class)] = (adjusted, plain, content_digest(json.dumps(plain)))
+    return cached[1], cached[2]
+
+def _intern(conn, refs, table, column, digest, payload):
+    # Id of the row holding this content, adding it if new; refs remembers ids for one transaction
+    key = (table, digest)
+    if key not in refs:
+        conn.execute(f"INSERT OR IGNORE INTO {table} (digest, {column}) VALUES (?, ?)", (digest, payload()))
+        refs[key] = conn.execute(f"SELECT id FROM {table} WHERE digest = ?", (digest,)).fetchone()[0]
+    return refs[key]
+
+def _shared(conn, refs, values):
+    # Long strings replaced by references to the texts table
+    shared = {}
+    for key, value in values.items():
+        if isinstance(value, str) and len(value) >= TEXT_MIN_CHARS:
+            value = {"$text": _intern(conn, refs, "texts", "text", content_digest(value), lambda value=value: value)}
+        shared[key] = value
+    return shared
+
+def _delta(terms, defaults):
+    plain = {key: _plain(value) for key, value in terms.items()}
+    delta = {}
+    changed = {key: value for key, value in plain.items() if key not in defaults or not _same(value, defaults[key])}
+    if changed:
+        delta["set"] = changed
+    unset = [key for key in defaults if key not in plain]
+    if unset:
+        delta["unset"] = unset
+    order = [key for key in defaults if key in plain] + [key for key in changed if key not in defaults]
+    if order != list(plain):
+        delta["order"] = list(plain)
+    return delta
+
+def _row(conn, refs, template, vessel_class, terms, created_at=None):
+    defaults, digest = _snapshot(template, vessel_class)
+    snapshot_id = _intern(conn, refs, "snapshots", "terms", digest, lambda: json.dumps(_shared(conn, refs, defaults)))
+    delta = _delta(terms, defaults)
+    if "set" in delta:
+        delta["set"] = _shared(conn, refs, delta["set"])
+    return (
+        time.time() if created_at is None else created_at,
+        template,
+        vessel_class,
+        *_summary(terms),
+        json.dumps(delta, separators=(",", ":")),
+        snapshot_id,
+    )
+
+_INSERT = "INSERT INTO charters (created_at, template, vessel_class, vessel_name, laydays, terms, snapshot) VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+@timed("store.save_charter")
+def save_charter(db_path, template, vessel_class, terms):
+    conn = connect(db_path)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        cursor = conn.execute(_INSERT, _row(conn, {}, template, vessel_class, terms))
+    return cursor.lastrowid
+
+@timed("store.save_charters")
+def save_charters(db_path, charters):
+    # Bulk insert of (template, vessel_class, terms) tuples in a single transaction
+    conn = connect(db_path)
+    refs = {}
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(_INSERT, [_row(conn, refs, *charter) for charter in charters])
+
+_snapshots = {}
+
+def _texts(conn, ids):
+    ids = list(ids)
+    texts = {}
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        texts.update(conn.execute(f"SELECT id, text FROM texts WHERE id IN ({', '.join('?' * len(chunk))})", chunk))
+    return texts
+
+def _text_ids(values):
+    return {value["$text"] for value in values if type(value) is dict}
+
+def _decode(conn, rows):
+    # Full terms for (terms, snapshot id) rows read together, fetching shared texts once
+    deltas = [json.loads(terms, object_hook=_typed) for terms, _ in rows]
+    shares = ['"$text"' in terms for terms, _ in rows]
+    snapshot_ids = {snapshot_id for _, snapshot_id in rows if snapshot_id is not None}
+    snapshots = {}
+    texts = {}
+    if snapshot_ids:
+        found = conn.execute(f"SELECT id, digest, terms FROM snapshots WHERE id IN ({', '.join('?' * len(snapshot_ids))})", list(snapshot_ids)).fetchall()
+        # Content-addressed, so a decoded snapshot is good for every store and never goes stale
+        missing = [(digest, json.loads(terms, object_hook=_typed)) for _, digest, terms in found if digest not in _snapshots]
+        needed = _text_ids(value for _, terms in missing for value in terms.values())
+        for (_, snapshot_id), delta, shared in zip(rows, deltas, shares):
+            if shared and snapshot_id is not None:
+                needed |= _text_ids(delta.get("set", {}).values())
+        texts = _texts(conn, needed)
+        for digest, terms in missing:
+            _snapshots[digest] = _resolve(terms, texts)
+        snapshots = {snapshot_id: _snapshots[digest] for snapshot_id, digest, _ in found}
+    decoded = []
+    for (_, snapshot_id), delta, shared in zip(rows, deltas, shares):
+        if snapshot_id is None:
+            decoded.append(delta)
+            continue
+        changed = delta.get("set", {})
+        if shared:
+            changed = _resolve(changed, texts)
+        unset = delta.get("unset")
+        terms = {key: value for key, value in snapshots[snapshot_id].items() if key not in unset} if unset else dict(snapshots[snapshot_id])
+        terms.update(changed)
+        if "order" in delta:
+            terms = {key: terms[key] for key in delta["order"]}
+        decoded.append(terms)
+    return decoded
+
+# Columns that can be filtered and faceted without touching the terms JSON; the indexes
+# also carry template and vessel_class so counts and facets never read the table
+SUMMARY_COLUMNS = ["id", "created_at", "template", "vessel_class", "vessel_name", "laydays"]
+FACET_COLUMNS = ["template", "vessel_class"]
+
+def _where(filters):
+    # filters: template, vessel_class (exact), vessel_name (case-insensitive prefix),
+    # laydays_from / laydays_to (inclusive ISO dates); every condition is index-backed
+    clauses = []
+    params = []
+    filters = filters or {}
+    for column in ("template", "vessel_class"):
+        if filters.get(column):
+            clauses.append(f"{column} = ?")
+            params.append(filters[column])
+    if filters.get("vessel_name"):
+        prefix = filters["vessel_name"]
+        clauses.append("vessel_name >= ? COLLATE NOCASE AND vessel_name < ? COLLATE NOCASE")
+        params.extend([prefix, prefix + "\U0010ffff"])
+    if filters.get("laydays_from"):
+        clauses.append("laydays >= ?")
+        params.append(str(filters["laydays_from"]))
+    if filters.get("laydays_to"):
+        clauses.append("laydays <= ?")
+        params.append(str(filters["laydays_to"]))
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+@timed("store.count_charters")
+def count_charters(db_path, filters=None):
+    where, params = _where(filters)
+    return connect(db_path).execute(f"SELECT COUNT(*) FROM charters{where}", params).fetchone()[0]
+
+@timed("store.facet_counts")
+def facet_counts(db_path, column, filters=None):
+    # [(value, count), ...] for one of FACET_COLUMNS, most common first
+    if column not in FACET_COLUMNS:
+        raise ValueError(f"Cannot facet on {column!r}")
+    where, params = _where(filters)
+    return connect(db_path).execute(
+        f"SELECT {column}, COUNT(*) FROM charters{where} GROUP BY {column} ORDER BY COUNT(*) DESC, {column}",
+        params,
+    ).fetchall()
+
+@timed("store.query_charters")
+def query_charters(db_path, filters=None, limit=20, offset=0):
+    # One page of charter summaries, newest first; the terms JSON is not read
+    where, params = _where(filters)
+    rows = connect(db_path).execute(
+        f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM charters{where} ORDER BY id DESC LIMIT ? OFFSET ?",
+        params + [limit, offset],
+    ).fetchall()
+    return [dict(zip(SUMMARY_COLUMNS, row)) for row in rows]
+
+def get_charter(db_path, charter_id):
+    conn = connect(db_path)
+    row = conn.execute(
+        "SELECT id, template, vessel_class, terms, snapshot FROM charters WHERE id = ?", (charter_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    terms, = _decode(conn, [row[3:]])
+    return {"id": row[0], "template": row[1], "vessel_class": row[2], "terms": terms}
+
+def iter_charters(db_path, batch_size=500, filters=None):
+    # Yields saved charters matching filters (as for query_charters) oldest first without
+    # holding the whole history in memory
+    conn = connect(db_path)
+    where, params = _where(filters)
+    where = f"{where} AND id > ?" if where else " WHERE id > ?"
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            f"SELECT id, template, vessel_class, terms, snapshot FROM charters{where} ORDER BY id LIMIT ?",
+            params + [last_id, batch_size],
+        ).fetchall()
+        if not rows:
+            return
+        for (charter_id, template, vessel_class, _, _), terms in zip(rows, _decode(conn, [row[3:] for row in rows])):
+            yield {"id": charter_id, "template": template, "vessel_class": vessel_class, "terms": terms}
+        last_id = rows[-1][0]
+
+def migrate_json(db_path, json_path):
+    # One-time import of the legacy charters.json; the source file is left in place and
+    # recorded in the migrations table so later calls are a single lookup. A missing file
+    # is not recorded, so it is still imported if it turns up later.
+    if not os.path.exists(json_path):
+        return 0
+    conn = connect(db_path)
+    source = os.path.abspath(json_path)
+    if conn.execute("SELECT 1 FROM migrations WHERE source = ?", (source,)).fetchone():
+        return 0
+    with span("store.read_json"), open(json_path, "r") as f:
+        saved_charters = json.load(f)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        # Another process may have migrated while we waited for the write lock
+        if conn.execute("SELECT 1 FROM migrations WHERE source = ?", (source,)).fetchone():
+            return 0
+        refs = {}
+        conn.executemany(
+            _INSERT,
+            [_row(conn, refs, c["template"], c["vessel_class"], c.get("terms", {})) for c in saved_charters],
+        )
+        conn.execute(
+            "INSERT INTO migrations (source, migrated_at, charters) VALUES (?, ?, ?)",
+            (source, time.time(), len(saved_charters)),
+        )
+    return len(saved_charters)
+
+@timed("store.compact")
+def compact(db_path, batch_size=500):
+    # Rewrites rows saved before delta encoding as deltas, then reclaims the freed pages.
+    # Their values were saved as strings and stay strings.
+    conn = connect(db_path)
+    converted = 0
+    while True:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, template, vessel_class, terms FROM charters WHERE snapshot IS NULL ORDER BY id LIMIT ?",
+                (batch_size,),
+            ).fetchall()
+            refs = {}
+            for charter_id, template, vessel_class, terms in rows:
+                _, _, _, _, _, delta, snapshot_id = _row(conn, refs, template, vessel_class, json.loads(terms), 0)
+                conn.execute("UPDATE charters SET terms = ?, snapshot = ? WHERE id = ?", (delta, snapshot_id, charter_id))
+        converted += len(rows)
+        if len(rows) < batch_size:
+            break
+    conn.execute("VACUUM")
+    return converted
@@ -0,0 +1,266 @@
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from instrumentation import timed
+
+# Rider clauses grouped in packs. The built-in pack is always there; every *.json file in
+# CHARTER_CLAUSE_PACKS_DIR (default: clause_packs/ next to this file) is another pack:
+#
+#   {"tags": ["bimco"], "templates": [], "clauses": [
+#       {"id": "sanctions", "title": "...", "description": "...", "content": "...",
+#        "tags": ["sanctions"], "templates": ["TANKERVOY 87"]}]}
+#
+# Pack-level tags and templates apply to all its clauses; an empty templates list means
+# the clause suits every form. Files are only listed until a search needs their clauses,
+# then read once and re-read when they change on disk. Each pack keeps an inverted index
+# over titles, descriptions and bodies, and searches rank hits with BM25.
+
+CLAUSE_PACKS_DIR = os.environ.get("CHARTER_CLAUSE_PACKS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "clause_packs"))
+
+BUILTIN_PACK = "builtin"
+BUILTIN_CLAUSES = [
+    {
+        "id": "demurrage",
+        "title": "Demurrage",
+        "content": "Demurrage shall be payable at the rate of USD [amount] per day or pro-rata for any part of a day.",
+        "description": "Covers compensation for delays beyond agreed laytime at port.",
+        "tags": ["laytime"],
+    },
+    {
+        "id": "forceMajeure",
+        "title": "Force Majeure",
+        "content": "Neither party shall be liable for delays due to events beyond their reasonable control, including acts of God, war, or strikes.",
+        "description": "Protects against liability for unavoidable delays (e.g., natural disasters, strikes).",
+        "tags": ["liability"],
+    },
+    {
+        "id": "cargoInspection",
+        "title": "Cargo Inspection",
+        "content": "Charterers shall have the right to appoint an independent inspector to verify cargo quantity and quality at loading and discharging ports.",
+        "description": "Allows charterers to ensure cargo meets specifications via third-party inspection.",
+        "tags": ["cargo"],
+    },
+]
+
+# Term weight of a hit in each field; BM25 parameters
+FIELD_WEIGHTS = {"title": 3.0, "description": 2.0, "content": 1.0}
+K1 = 1.2
+B = 0.75
+# Vocabulary words a query word may expand to as a prefix ("demur" -> "demurrage"); past
+# this, the words in the most clauses are kept and the search reports the word as truncated
+MAX_PREFIX_EXPANSIONS = 32
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text):
+    return _TOKEN.findall(str(text).lower())
+
+def clause_key(pack, clause_id):
+    return f"{pack}:{clause_id}"
+
+class PackIndex:
+    # One pack's clauses with postings from word -> {clause position: weighted term count}
+    # and sets by tag and template; clauses with no templates sit under None
+
+    def __init__(self, name, clauses, tags=(), templates=()):
+        self.name = name
+        self.clauses = []
+        self.postings = defaultdict(dict)
+        self.by_tag = defaultdict(set)
+        self.by_template = defaultdict(set)
+        self.lengths = []
+        self.by_id = {}
+        for position, clause in enumerate(clauses):
+            clause = {
+                "id": str(clause["id"]),
+                "title": clause.get("title") or str(clause["id"]),
+                "description": clause.get("description", ""),
+                "content": clause.get("content", ""),
+                "tags": sorted({*tags, *clause.get("tags", ())}),
+                "templates": sorted({*templates, *clause.get("templates", ())}),
+                "pack": name,
+            }
+            clause["key"] = clause_key(name, clause["id"])
+            self.clauses.append(clause)
+            self.by_id[clause["id"]] = clause
+            length = 0.0
+            for field, weight in FIELD_WEIGHTS.items():
+                for word in tokenize(clause[field]):
+                    self.postings[word][position] = self.postings[word].get(position, 0.0) + weight
+                    length += weight
+            self.lengths.append(length)
+            for tag in clause["tags"]:
+                self.by_tag[tag].add(position)
+            for template_name in clause["templates"] or [None]:
+                self.by_template[template_name].add(position)
+        self.vocabulary = sorted(self.postings)
+
+    def expand(self, word):
+        # (words, truncated): the word itself plus vocabulary words it is a prefix of, cut to
+        # the MAX_PREFIX_EXPANSIONS found in the most clauses. "{" sorts after every token
+        # character, so the prefix's words end before word + "{".
+        start = bisect_left(self.vocabulary, word)
+        found = self.vocabulary[start:bisect_left(self.vocabulary, word + "{", start)]
+        if len(found) <= MAX_PREFIX_EXPANSIONS:
+            return found, False
+        ranked = heapq.nlargest(MAX_PREFIX_EXPANSIONS, found, key=lambda candidate: (candidate == word, len(self.postings[candidate])))
+        return ranked, True
+
+    def allowed(self, tags, template_name):
+        # Positions passing the filters, or None when nothing is filtered
+        allowed = None
+        for tag in tags:
+            allowed = self.by_tag.get(tag, set()) if allowed is None else allowed & self.by_tag.get(tag, set())
+        if template_name:
+            matching = self.by_template.get(template_name, set()) | self.by_template.get(None, set())
+            allowed = matching if allowed is None else allowed & matching
+        return allowed
+
+class SearchResults(list):
+    # Clauses, best first; truncated lists the query words whose prefix matched more than
+    # MAX_PREFIX_EXPANSIONS words in some pack, so rarer completions were not searched
+    truncated = ()
+
+def _read_pack(path):
+    with open(path, "r") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        data = {"clauses": data}
+    return data
+
+class ClauseLibrary:
+    def __init__(self, directory=None, builtin=BUILTIN_CLAUSES):
+        self.directory = CLAUSE_PACKS_DIR if directory is None else directory
+        self._packs = {BUILTIN_PACK: PackIndex(BUILTIN_PACK, builtin)}
+        self._pack_state = {}
+        self._warnings = {}
+        self._lock = threading.Lock()
+        self.stats = {"packs_loaded": 0, "clauses_loaded": 0, "searches": 0}
+
+    def _files(self):
+        # Pack name -> (path, mtime); only stats the directory
+        if not self.directory or not os.path.isdir(self.directory):
+            return {}
+        return {
+            entry.name[:-5]: (entry.path, entry.stat().st_mtime_ns)
+            for entry in os.scandir(self.directory)
+            if entry.name.endswith(".json")
+        }
+
+    def pack_names(self):
+        return [BUILTIN_PACK, *sorted(self._files())]
+
+    def _load(self, names=None):
+        # Loaded pack indexes for names (all packs when None), reading new or changed files
+        files = self._files()
+        wanted = [BUILTIN_PACK, *sorted(files)] if names is None else list(names)
+        with self._lock:
+            for name in list(self._pack_state):
+                if name not in files:
+                    del self._pack_state[name]
+                    self._packs.pop(name, None)
+                    self._warnings.pop(name, None)
+            for name in wanted:
+                if name == BUILTIN_PACK or name not in files:
+                    continue
+                path, mtime = files[name]
+                if self._pack_state.get(name) != mtime:
+                    # A pack that cannot be read keeps the index it last loaded with until the
+                    # file changes again, and warnings() says why
+                    self._pack_state[name] = mtime
+                    try:
+                        data = _read_pack(path)
+                        pack = PackIndex(name, data.get("clauses", []), data.get("tags", ()), data.get("templates", ()))
+                    except (OSError, AttributeError, KeyError, TypeError, ValueError) as exc:
+                        kept = " (keeping the last version that loaded)" if name in self._packs else ""
+                        problem = f"a clause has no {exc} field" if isinstance(exc, KeyError) else exc
+                        self._warnings[name] = f"Clause pack {name}.json was not loaded{kept}: {problem}"
+                        continue
+                    self._packs[name] = pack
+                    self._warnings.pop(name, None)
+                    self.stats["packs_loaded"] += 1
+                    self.stats["clauses_loaded"] += len(pack.clauses)
+            return [self._packs[name] for name in wanted if name in self._packs]
+
+    def warnings(self):
+        # Problems with the pack files read so far
+        with self._lock:
+            return list(self._warnings.values())
+
+    def tags(self, packs=None):
+        return sorted({tag for pack in self._load(packs) for tag in pack.by_tag})
+
+    def get(self, key):
+        pack_name, _, clause_id = str(key).partition(":")
+        for pack in self._load([pack_name]):
+            return pack.by_id.get(clause_id)
+        return None
+
+    @timed("clause_library.search")
+    def search(self, query="", tags=(), template_name=None, packs=None, limit=50):
+        # Clauses matching every query word (as a word or a word prefix) and the filters,
+        # best first; with no query, the filtered clauses in pack order
+        indexes = self._load(packs)
+        self.stats["searches"] += 1
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            found = []
+            for pack in indexes:
+                allowed = pack.allowed(tags, template_name)
+                positions = range(len(pack.clauses)) if allowed is None else sorted(allowed)
+                found.extend(pack.clauses[position] for position in positions)
+                if len(found) >= limit:
+                    break
+            return SearchResults(found[:limit])
+
+        expansions = []
+        truncated = []
+        for word in words:
+            expansion = {}
+            for pack in indexes:
+                expansion[pack.name], cut = pack.expand(word)
+                if cut and word not in truncated:
+                    truncated.append(word)
+            expansions.append(expansion)
+        total = sum(len(pack.clauses) for pack in indexes)
+        average_length = sum(sum(pack.lengths) for pack in indexes) / total if total else 0.0
+        frequency = defaultdict(int)
+        for expansion in expansions:
+            for pack in indexes:
+                for word in expansion[pack.name]:
+                    frequency[word] += len(pack.postings[word])
+        idf = {word: math.log(1 + (total - n + 0.5) / (n + 0.5)) for word, n in frequency.items()}
+
+        scored = []
+        for pack in indexes:
+            # Only clauses holding every query word are scored; sets are intersected smallest first
+            matches = []
+            for expansion in expansions:
+                positions = set()
+                for word in expansion[pack.name]:
+                    positions.update(pack.postings[word])
+                matches.append(positions)
+            candidates = set.intersection(*sorted(matches, key=len))
+            allowed = pack.allowed(tags, template_name)
+            if allowed is not None:
+                candidates &= allowed
+            for position in candidates:
+                norm = K1 * (1 - B + B * pack.lengths[position] / average_length)
+                score = 0.0
+                for expansion in expansions:
+                    for word in expansion[pack.name]:
+                        count = pack.postings[word].get(position)
+                        if count:
+                            score += idf[word] * count * (K1 + 1) / (count + norm)
+                scored.append((score, pack.clauses[position]))
+        results = SearchResults(clause for _, clause in heapq.nlargest(limit, scored, key=lambda hit: hit[0]))
+        results.truncated = tuple(truncated)
+        return results
+
+default_library = ClauseLibrary()
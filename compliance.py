@@ -0,0 +1,247 @@
+import hashlib
+import re
+import sys
+import threading
+from collections import OrderedDict
+from datetime import date
+from functools import lru_cache
+
+from route_index import default_index
+from templates import clause_fragments
+from validation import PORT_PLACEHOLDER
+
+# Compliance rules for generated charters. Clause rules are regexes over the clause text:
+# "require" rules warn when their wording is missing, the others warn when it is present.
+# The keywords of every clause rule are compiled into one alternation, so each clause field
+# is scanned in a single pass, and a field's result is cached on its text, so a rerun only
+# rescans the clause fields that actually changed. Template clause blocks are scanned per
+# clause fragment, so the cache holds each shared clause once, whichever forms use it; a
+# fragment is a whole clause, so no rule can match across two of them. Field rules are
+# plain checks on the terms; "applies" and field rules list the fields they read in
+# "fields", and a check whose fields are all unchanged returns the previous warnings
+# without evaluating any rule. Messages keep the order of the rule lists.
+
+CLAUSE_FIELDS = ("Standard Clauses", "Modern Clauses", "Additional Clauses")
+PORT_FIELDS = ("Loading Port", "Discharging Port")
+
+# Country prefixes of UN/LOCODEs for the EU ETS and the Gulf of Guinea piracy area
+EU_COUNTRIES = {"AT", "BE", "BG", "CY", "DE", "DK", "EE", "ES", "FI", "FR", "GR", "HR", "IE", "IT", "LT", "LV", "MT", "NL", "PL", "PT", "RO", "SE", "SI"}
+GULF_OF_GUINEA_COUNTRIES = {"NG", "BJ", "TG", "GH", "CM", "GQ", "GA"}
+
+MAX_LAYCAN_DAYS = 15
+PLACEHOLDER = re.compile(r"^\s*\[[^\]]*\]\s*$")
+
+@lru_cache(maxsize=1024)
+def _countries(port_text):
+    return frozenset(code[:2] for code in default_index.resolve(port_text))
+
+def _port_countries(get):
+    return frozenset().union(*(_countries(str(get(field) or "")) for field in PORT_FIELDS))
+
+def _touches_eu(get):
+    return bool(_port_countries(get) & EU_COUNTRIES)
+
+def _touches_gulf_of_guinea(get):
+    return bool(_port_countries(get) & GULF_OF_GUINEA_COUNTRIES)
+
+# keywords are lowercase literals that start each way of writing the clause; pattern is
+# matched at a keyword hit (on lowercased text) to confirm it, so it must begin there too
+CLAUSE_RULES = [
+    {"id": "tovalop", "require": True, "keywords": ["tovalop"], "pattern": r"tovalop",
+     "message": "Warning: TOVALOP clause recommended for pollution liability compliance."},
+    {"id": "sanctions", "require": True, "keywords": ["sanction"], "pattern": r"\bsanctions?\b",
+     "message": "Warning: Sanctions clause recommended (e.g. BIMCO Sanctions Clause for Voyage Charter Parties)."},
+    {"id": "imo_2020", "require": True, "keywords": ["imo", "sulphur", "sulfur", "marpol"],
+     "pattern": r"\bimo\s*2020\b|\bsul(?:ph|f)ur\b|\bmarpol\s+annex\s+vi\b",
+     "message": "Warning: Bunker sulphur clause recommended for IMO 2020 (MARPOL Annex VI) compliance."},
+    {"id": "war_risks", "require": True, "keywords": ["voywar", "conwartime", "war"],
+     "pattern": r"\bvoywar\b|\bconwartime\b|\bwar\s+risks?\b",
+     "message": "Warning: BIMCO war risks clause (VOYWAR / CONWARTIME) recommended."},
+    {"id": "ets", "require": True, "applies": _touches_eu, "fields": PORT_FIELDS, "keywords": ["ets", "emission", "eua"],
+     "pattern": r"\bets\b|\bemissions?\s+trading\b|\beuas?\b",
+     "message": "Warning: EU ETS emissions allowance clause recommended for a voyage calling at an EU port."},
+    {"id": "piracy", "require": True, "applies": _touches_gulf_of_guinea, "fields": PORT_FIELDS, "keywords": ["piracy"], "pattern": r"\bpiracy\b",
+     "message": "Warning: Piracy clause recommended for Gulf of Guinea calls."},
+    {"id": "isps", "require": True, "keywords": ["isps"], "pattern": r"\bisps\b",
+     "message": "Warning: ISPS Code clause recommended."},
+    {"id": "both_to_blame", "require": True, "keywords": ["both"], "pattern": r"\bboth[\s-]+to[\s-]+blame\b",
+     "message": "Warning: Both-to-Blame Collision clause recommended."},
+    {"id": "paramount", "require": True, "keywords": ["clause paramount", "paramount", "hague"],
+     "pattern": r"\bclause\s+paramount\b|\bparamount\s+clause\b|\bhague(?:[\s-]+visby)?\s+rules\b",
+     "message": "Warning: Clause Paramount recommended for bills of lading."},
+    {"id": "arbitration", "require": True, "keywords": ["arbitration"], "pattern": r"\barbitration\b",
+     "message": "Warning: Law and arbitration clause recommended."},
+    {"id": "high_sulphur", "keywords": ["3.5", "hsfo"], "pattern": r"3\.5\s*%(?:\s*m/m)?\s+sul(?:ph|f)ur\b|\bhsfo\b",
+     "message": "Warning: Clauses refer to high-sulphur fuel, which IMO 2020 only permits with a scrubber."},
+    {"id": "sanctioned_jurisdiction", "keywords": ["iran", "north korea", "dprk", "syria", "crimea", "venezuela"],
+     "pattern": r"\b(?:iran(?:ian)?|north\s+korea|dprk|syrian?|crimea|venezuelan?)\b",
+     "message": "Warning: Clauses name a sanctioned jurisdiction; check sanctions screening."},
+    {"id": "unfilled_placeholder", "keywords": ["[amount", "[to be specified", "[date", "[charterer name", "[owner name"],
+     "pattern": r"\[(?:amount|to be specified|date|charterer name|owner name)[^\]]*\]",
+     "message": "Warning: Clauses still contain placeholders such as [amount]."},
+]
+
+def _blank(value):
+    return value is None or not str(value).strip() or value == PORT_PLACEHOLDER or bool(PLACEHOLDER.match(str(value)))
+
+def _as_date(value):
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value).strip()[:10])
+    except ValueError:
+        return None
+
+def _laycan(get):
+    return _as_date(get("Laydays")), _as_date(get("Cancelling"))
+
+FIELD_RULES = [
+    {"id": "owners", "fields": ("Owners",),
+     "check": lambda get: get("Owners") is not None and (_blank(get("Owners")) or get("Owners") == "Owners"),
+     "message": "Warning: Owners are not named."},
+    {"id": "charterers", "fields": ("Charterers",),
+     "check": lambda get: get("Charterers") is not None and (_blank(get("Charterers")) or get("Charterers") == "Charterers"),
+     "message": "Warning: Charterers are not named."},
+    {"id": "vessel", "fields": ("Vessel Name",),
+     "check": lambda get: get("Vessel Name") is not None and (_blank(get("Vessel Name")) or str(get("Vessel Name")).strip().upper() in ("TBN", "VESSEL NAME")),
+     "message": "Warning: Vessel not yet nominated (TBN)."},
+    {"id": "same_ports", "fields": ("Loading Port", "Discharging Port"),
+     "check": lambda get: not _blank(get("Loading Port")) and get("Loading Port") == get("Discharging Port"),
+     "message": "Warning: Loading and discharging ports are the same."},
+    {"id": "laycan_order", "fields": ("Laydays", "Cancelling"),
+     "check": lambda get: None not in _laycan(get) and _laycan(get)[1] < _laycan(get)[0],
+     "message": "Warning: Cancelling date falls before laydays."},
+    {"id": "laycan_width", "fields": ("Laydays", "Cancelling"),
+     "check": lambda get: None not in _laycan(get) and (_laycan(get)[1] - _laycan(get)[0]).days > MAX_LAYCAN_DAYS,
+     "message": f"Warning: Laydays/cancelling window is wider than {MAX_LAYCAN_DAYS} days."},
+    {"id": "freight", "fields": ("Freight Rate",),
+     "check": lambda get: get("Freight Rate") is not None and (_blank(get("Freight Rate")) or "[To be specified]" in str(get("Freight Rate"))),
+     "message": "Warning: Freight rate is not specified."},
+]
+
+def _digest(text):
+    return hashlib.sha256(text.encode("utf-8", "surrogatepass")).digest()
+
+# Texts at least this long have their digests cached
+DIGEST_CACHE_MIN_CHARS = 4096
+
+class RuleEngine:
+    # cache_size bounds the cached checks, which are keyed by digests of the field values;
+    # scan_cache_bytes bounds the texts held by the scan and digest caches, each
+    def __init__(self, clause_rules=CLAUSE_RULES, field_rules=FIELD_RULES, cache_size=256, scan_cache_bytes=16 * 1024 * 1024):
+        self.clause_rules = list(clause_rules)
+        self.field_rules = list(field_rules)
+        self.cache_size = cache_size
+        self.scan_cache_bytes = scan_cache_bytes
+        # One pass finds keyword hits: a plain alternation of literals lets re skip ahead with
+        # its literal-prefix search, which named groups per rule would defeat. Longer keywords
+        # come first, so "clause paramount" wins over a shorter keyword at the same position.
+        self._confirm = {}
+        for rule in self.clause_rules:
+            pattern = re.compile(rule["pattern"])
+            for keyword in rule["keywords"]:
+                self._confirm.setdefault(keyword, []).append((rule["id"], pattern))
+        self._keywords = re.compile("|".join(re.escape(k) for k in sorted(self._confirm, key=len, reverse=True)))
+        self._rule_ids = {rule["id"] for rule in self.clause_rules}
+        self._fields = tuple(dict.fromkeys([*CLAUSE_FIELDS, *(f for rule in self.clause_rules + self.field_rules for f in rule.get("fields", ()))]))
+        self._checks = OrderedDict()
+        self._forbidden = {rule["id"] for rule in self.clause_rules if not rule.get("require")}
+        self._scans = OrderedDict()
+        self._scans_bytes = 0
+        # Digests of long texts, so an unchanged rider is compared rather than rehashed
+        self._digests = OrderedDict()
+        self._digests_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"scans": 0, "cached": 0, "scanned_chars": 0}
+
+    def scan(self, text):
+        # Ids of the clause rules whose wording appears in text; cached on the text itself
+        with self._lock:
+            found = self._scans.get(text)
+            if found is not None:
+                self._scans.move_to_end(text)
+                self.stats["cached"] += 1
+                return found
+        found = set()
+        lowered = text.lower()
+        for match in self._keywords.finditer(lowered):
+            for rule_id, pattern in self._confirm[match.group()]:
+                if rule_id not in found and pattern.match(lowered, match.start()):
+                    found.add(rule_id)
+            if len(found) == len(self._rule_ids):
+                break
+        found = frozenset(found)
+        with self._lock:
+            self.stats["scans"] += 1
+            self.stats["scanned_chars"] += len(text)
+            size = sys.getsizeof(text)
+            if text not in self._scans and size <= self.scan_cache_bytes:
+                self._scans[text] = found
+                self._scans_bytes += size
+                while self._scans_bytes > self.scan_cache_bytes:
+                    self._scans_bytes -= sys.getsizeof(self._scans.popitem(last=False)[0])
+        return found
+
+    def _field_key(self, value):
+        # Text is keyed by its digest, so cached checks do not hold whole clause blocks
+        if not isinstance(value, str):
+            return value
+        if len(value) < DIGEST_CACHE_MIN_CHARS:
+            return _digest(value)
+        with self._lock:
+            digest = self._digests.get(value)
+            if digest is not None:
+                self._digests.move_to_end(value)
+                return digest
+        digest = _digest(value)
+        size = sys.getsizeof(value)
+        with self._lock:
+            if value not in self._digests and size <= self.scan_cache_bytes:
+                self._digests[value] = digest
+                self._digests_bytes += size
+                while self._digests_bytes > self.scan_cache_bytes:
+                    self._digests_bytes -= sys.getsizeof(self._digests.popitem(last=False)[0])
+        return digest
+
+    def check(self, get):
+        # Warning messages for terms read through get (e.g. custom_terms.get), in rule order
+        key = tuple(self._field_key(get(field)) for field in self._fields)
+        try:
+            hash(key)
+        except TypeError:
+            return self._evaluate(get)
+        with self._lock:
+            warnings = self._checks.get(key)
+            if warnings is not None:
+                self._checks.move_to_end(key)
+                return list(warnings)
+        warnings = self._evaluate(get)
+        with self._lock:
+            self._checks[key] = tuple(warnings)
+            if len(self._checks) > self.cache_size:
+                self._checks.popitem(last=False)
+        return warnings
+
+    def _evaluate(self, get):
+        found = set()
+        for field in CLAUSE_FIELDS:
+            value = get(field) or ""
+            text = value if isinstance(value, str) else str(value)
+            # A block composed from clause fragments is scanned a fragment at a time
+            for part in clause_fragments(text) or (text,):
+                found |= self.scan(part)
+        warnings = []
+        for rule in self.clause_rules:
+            if "applies" in rule and not rule["applies"](get):
+                continue
+            if (rule["id"] in found) == (rule["id"] in self._forbidden):
+                warnings.append(rule["message"])
+        for rule in self.field_rules:
+            if rule["check"](get):
+                warnings.append(rule["message"])
+        return warnings
+
+default_engine = RuleEngine()
+
+def check_terms(custom_terms):
+    return default_engine.check(custom_terms.get)
@@ -1,100 +1,467 @@
-def generate_document(template_name, custom_terms):
-    # Extract custom terms with defaults
-    owners = custom_terms.get('Owners', 'Owners')
-    charterers = custom_terms.get('Charterers', 'Charterers')
-    vessel_name = custom_terms.get('Vessel Name', 'Vessel Name')
-    vessel_description = custom_terms.get('Vessel Description', 'Description of the vessel including class, tonnage, and specifications.')
-    loading_port = custom_terms.get('Loading Port', 'In Charterers\' option.')
-    discharging_port = custom_terms.get('Discharging Port', 'In Charterers\' option.')
-    laydays = custom_terms.get('Laydays', 'Date').strftime('%Y-%m-%d') if hasattr(custom_terms.get('Laydays'), 'strftime') else custom_terms.get('Laydays', 'Date')
-    cancelling = custom_terms.get('Cancelling', 'Date').strftime('%Y-%m-%d') if hasattr(custom_terms.get('Cancelling'), 'strftime') else custom_terms.get('Cancelling', 'Date')
-    freight_rate = custom_terms.get('Freight Rate', 'Rate')
-    use_worldscale = custom_terms.get('Use Worldscale', True)
-    standard_clauses = custom_terms.get('Standard Clauses', '')
-    modern_clauses = custom_terms.get('Modern Clauses', '')
-    additional_clauses = custom_terms.get('Additional Clauses', '')
-
-    # Compliance check for TOVALOP
-    compliance_warnings = []
-    if 'TOVALOP' not in (standard_clauses + modern_clauses + additional_clauses):
-        compliance_warnings.append("Warning: TOVALOP clause recommended for pollution liability compliance.")
-
-    # Generate document
-    document = f"""
-# TANKERVOY 87
-## Tanker Voyage Charter Party
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from datetime import date
+from string import Formatter
 
-**IT IS THIS DAY AGREED** between {owners} (hereinafter referred to as "Owners") of the motor/tank vessel called {vessel_name} and {charterers} (hereinafter referred to as "Charterers") that the transportation herein provided for will be performed subject to the terms and conditions of this Charter, which includes Part I and Part II. If there is any conflict between the provisions of Part I and those of Part II, the provisions of Part I shall prevail.
-
----
+import compliance
+import docx_stream
+from instrumentation import span, timed
 
-### PART I
+# Each charter form is an ordered list of (section_id, text) pairs; {field} marks a slot
+# filled from custom_terms. Forms are compiled once into render plans (see compile_plan),
+# and per section for previews that only re-render what changed (see render_sections).
 
-**(A) Vessel's Description**  
-{vessel_description}
+WORLDSCALE_TERMS = 'Except as otherwise stated or required by the context of this Charter, all terms and conditions of the current scale of nominal tanker freight rates published by the Worldscale Association (London) Ltd and the Worldscale Association (NYC) Inc. as in force on the date of commencement of loading ("Worldscale") shall apply.'
+CUSTOM_FREIGHT_TERMS = 'Custom freight terms apply as specified.'
 
-**(D) Loading Port(s) or Range(s)**  
-{loading_port}
+_CLAUSE_BOXES = [
+    ("standard_clauses", "**({standard_letter}) Standard Clauses**  \n{{standard_clauses}}\n\n"),
+    ("modern_clauses", "**({modern_letter}) Modern Clauses**  \n{{modern_clauses}}\n\n"),
+    ("additional_clauses", "**({additional_letter}) Additional Clauses**  \n{{additional_clauses}}\n\n"),
+]
 
-**(E) Discharging Port(s) or Range(s)**  
-{discharging_port}
+_WITNESS = ("witness", """**IN WITNESS WHEREOF** Owners and Charterers have caused this Charter consisting of a preamble and Parts I and II to be executed the day and year first above written.
 
-**(F) Laydays**  
-Laydays shall not commence before noon (local time) on {laydays}, unless with Charterers' consent.
+For OWNERS: __________________________  
+For CHARTERERS: ______________________
 
-**(G) Cancelling**  
-Noon (local time) on: {cancelling}.
+---
 
-**(H) Worldscale Terms**  
-{'Except as otherwise stated or required by the context of this Charter, all terms and conditions of the current scale of nominal tanker freight rates published by the Worldscale Association (London) Ltd and the Worldscale Association (NYC) Inc. as in force on the date of commencement of loading ("Worldscale") shall apply.' if use_worldscale else 'Custom freight terms apply as specified.'}
+### PART II
 
-**(J) Freight Rate**  
-Freight shall be paid at the rate of {freight_rate} per ton on the intaken quantity of cargo.
+""")
 
-**(Q) Standard Clauses**  
-{standard_clauses or 'None.'}
+_COMPLIANCE = ("compliance", """---
 
-**(R) Modern Clauses**  
-{modern_clauses or 'None.'}
+**Compliance Warnings**  
+{compliance_warnings}
+""")
 
-**(S) Additional Clauses**  
-{additional_clauses or 'None.'}
+def _clause_boxes(standard_letter, modern_letter, additional_letter):
+    return [
+        (section_id, text.format(standard_letter=standard_letter, modern_letter=modern_letter, additional_letter=additional_letter))
+        for section_id, text in _CLAUSE_BOXES
+    ]
 
-**IN WITNESS WHEREOF** Owners and Charterers have caused this Charter consisting of a preamble and Parts I and II to be executed the day and year first above written.
+_TANKERVOY_87 = [
+    ("preamble", """
+# TANKERVOY 87
+## Tanker Voyage Charter Party
 
-For OWNERS: __________________________  
-For CHARTERERS: ______________________
+**IT IS THIS DAY AGREED** between {owners} (hereinafter referred to as "Owners") of the motor/tank vessel called {vessel_name} and {charterers} (hereinafter referred to as "Charterers") that the transportation herein provided for will be performed subject to the terms and conditions of this Charter, which includes Part I and Part II. If there is any conflict between the provisions of Part I and those of Part II, the provisions of Part I shall prevail.
 
 ---
 
-### PART II
+### PART I
 
-**1. Condition of Vessel**  
+"""),
+    ("vessel_description", "**(A) Vessel's Description**  \n{vessel_description}\n\n"),
+    ("loading_port", "**(D) Loading Port(s) or Range(s)**  \n{loading_port}\n\n"),
+    ("discharging_port", "**(E) Discharging Port(s) or Range(s)**  \n{discharging_port}\n\n"),
+    ("laydays", "**(F) Laydays**  \nLaydays shall not commence before noon (local time) on {laydays}, unless with Charterers' consent.\n\n"),
+    ("cancelling", "**(G) Cancelling**  \nNoon (local time) on: {cancelling}.\n\n"),
+    ("worldscale_terms", "**(H) Worldscale Terms**  \n{worldscale_terms}\n\n"),
+    ("freight_rate", "**(J) Freight Rate**  \nFreight shall be paid at the rate of {freight_rate} per ton on the intaken quantity of cargo.\n\n"),
+    *_clause_boxes("Q", "R", "S"),
+    _WITNESS,
+    ("clause_1", """**1. Condition of Vessel**  
 The vessel's class as specified in Part I shall be maintained during the currency of this Charter. The Owners shall:  
 (a) before and at the beginning of the loaded voyage exercise due diligence to make the vessel seaworthy and in every way fit for the voyage and for the carriage of the cargo.
 
-**6. Cancellation by Charterer**  
+"""),
+    ("clause_6", """**6. Cancellation by Charterer**  
 If the vessel has not given a valid notice of readiness in accordance with Clause 8 before Cancelling specified in Part I (G), Charterers shall have the option of cancelling this Charter unless the vessel shall have been delayed due to Charterers' late nomination or revised orders.
 
-**12. Freight Payment**  
+"""),
+    ("clause_12", """**12. Freight Payment**  
 (a) Subject to Clauses 4 and 35, freight shall be paid at the rate(s) specified in Part I (J), and calculated on the intaken quantity of cargo and on Collected Wastings. Payment of freight shall be made by Charterers in cash without deductions.
 
-**20. ETA**  
+"""),
+    ("clause_20", """**20. ETA**  
 (a) The master shall radio Charterers and agents at loading and discharging ports advising the vessel's ETA on sailing from the last port or when bound for such ports.
 
-**28. New Jason Clause**  
+"""),
+    ("clause_28", """**28. New Jason Clause**  
 General Average shall be payable according to the York/Antwerp Rules, 1974. If the adjustment is made in accordance with the law and practice of the United States of America, the following clause shall apply:  
 "In the event of accident, danger, damage or disaster before or after the commencement of the voyage, resulting from any cause whatsoever, whether due to negligence or not..."
 
-**31. Bills of Lading**  
+"""),
+    ("clause_31", """**31. Bills of Lading**  
 Subject to all the relevant provisions of this Charter, bills of lading are to be signed as presented, but without prejudice to the Charter. Charterers hereby indemnify Owners against all liabilities and expenses (including legal costs) that may arise from the signing of bills of lading as presented.
 
-**32. TOVALOP**  
+"""),
+    ("clause_32", """**32. TOVALOP**  
 Owners warrant that the vessel is a tanker owned by a Participating Owner in TOVALOP and will so remain during the currency of this Charter. When an escape or discharge of Oil occurs from the vessel and causes or threatens to cause Pollution Damage, Charterers may undertake measures to prevent or minimize such Pollution Damage.
 
+"""),
+    _COMPLIANCE,
+]
+
+_SHELL_TIME_4 = [
+    ("preamble", """
+# SHELLTIME 4
+## Time Charter Party
+
+**IT IS THIS DAY AGREED** between {owners} (hereinafter referred to as "Owners"), being owners of the motor/tank vessel called {vessel_name}, and {charterers} (hereinafter referred to as "Charterers") that Owners let and Charterers hire the vessel for the period and on the terms set out in this Charter, which includes Part I and Part II. If there is any conflict between the provisions of Part I and those of Part II, the provisions of Part I shall prevail.
+
 ---
 
-**Compliance Warnings**  
-{'; '.join(compliance_warnings) if compliance_warnings else 'None'}
-"""
-    return document
+### PART I
+
+"""),
+    ("vessel_description", "**(A) Vessel's Description**  \n{vessel_description}\n\n"),
+    ("period", "**(B) Period**  \n{period}, in Charterers' option.\n\n"),
+    ("route", "**(C) Trading Limits**  \n{route}, always within Institute Warranty Limits.\n\n"),
+    ("delivery_port", "**(D) Delivery**  \n{delivery_port}\n\n"),
+    ("redelivery_port", "**(E) Redelivery**  \n{redelivery_port}\n\n"),
+    ("laydays", "**(F) Laydays**  \nThe vessel shall not be delivered before noon (local time) on {laydays} without Charterers' consent.\n\n"),
+    ("cancelling", "**(G) Cancelling**  \nNoon (local time) on: {cancelling}.\n\n"),
+    ("hire_rate", "**(H) Rate of Hire**  \n{hire_rate}, pro rata for any part of a day, from the time of delivery until the time of redelivery.\n\n"),
+    ("loading_port", "**(J) Loading Port(s) or Range(s)**  \n{loading_port}\n\n"),
+    ("discharging_port", "**(K) Discharging Port(s) or Range(s)**  \n{discharging_port}\n\n"),
+    *_clause_boxes("Q", "R", "S"),
+    _WITNESS,
+    ("clause_1", """**1. Description and Condition of Vessel**  
+At the date of delivery the vessel shall be classed as described in Part I, in every way fit to carry crude petroleum and/or its products, tight, staunch, strong and in every way fit for the service.
+
+"""),
+    ("clause_4", """**4. Period, Trading Limits and Safe Places**  
+Owners agree to let and Charterers agree to hire the vessel for the period stated in Part I (B), for the purpose of carrying all lawful merchandise within the trading limits stated in Part I (C). Charterers shall use due diligence to ensure that the vessel is only employed between and at safe places.
+
+"""),
+    ("clause_5", """**5. Laydays/Cancelling**  
+The vessel shall not be delivered before the date in Part I (F). If the vessel is not ready for delivery by the cancelling date in Part I (G), Charterers shall have the option of cancelling this Charter.
+
+"""),
+    ("clause_8", """**8. Rate of Hire**  
+Subject as herein provided, Charterers shall pay for the use and hire of the vessel at the rate stated in Part I (H), commencing on and from the date and hour of her delivery and continuing until the date and hour when she is redelivered.
+
+"""),
+    ("clause_9", """**9. Payment of Hire**  
+Payment of hire shall be made in immediately available funds monthly in advance, less any hire paid which Charterers reasonably estimate will not be due.
+
+"""),
+    ("clause_21", """**21. Off-Hire**  
+On each and every occasion that there is loss of time due to deficiency of personnel or stores, repairs, breakdown or any other cause preventing the efficient working of the vessel, the vessel shall be off-hire from the commencement of such loss of time until she is again ready and in an efficient state to resume her service.
+
+"""),
+    ("clause_38", """**38. TOVALOP**  
+Owners warrant that the vessel is a tanker owned by a Participating Owner in TOVALOP and will so remain during the currency of this Charter.
+
+"""),
+    _COMPLIANCE,
+]
+
+_ASBATANKVOY_2025 = [
+    ("preamble", """
+# ASBATANKVOY 2025
+## Tanker Voyage Charter Party
+
+**IT IS THIS DAY AGREED** between {owners} (hereinafter referred to as "Owners") of the motor/tank vessel called {vessel_name} and {charterers} (hereinafter referred to as "Charterers") that the vessel shall, with all convenient dispatch, proceed to the loading port(s) named in Part I, load a full cargo as specified and carry it to the discharging port(s), subject to the terms of Part I and Part II of this Charter.
+
+---
+
+### PART I
+
+"""),
+    ("vessel_description", "**(A) Description and Position of Vessel**  \n{vessel_description}\n\n"),
+    ("laydays", "**(B) Laydays**  \nCommencing: {laydays}. Cancelling: {cancelling}.\n\n"),
+    ("loading_port", "**(C) Loading Port(s)**  \n{loading_port}\n\n"),
+    ("discharging_port", "**(D) Discharging Port(s)**  \n{discharging_port}\n\n"),
+    ("cargo", "**(E) Cargo**  \n{cargo}, {cargo_capacity}, in Charterers' option.\n\n"),
+    ("freight_rate", "**(F) Freight Rate**  \n{freight_rate} per ton of 2,240 lbs. {worldscale_terms}\n\n"),
+    ("laytime", "**(H) Total Laytime in Running Hours**  \n{laytime}\n\n"),
+    ("demurrage", "**(I) Demurrage per Day**  \n{demurrage}, pro rata for part of a day.\n\n"),
+    *_clause_boxes("Q", "R", "S"),
+    _WITNESS,
+    ("clause_1", """**1. Warranty – Voyage – Cargo**  
+The vessel, classed as described in Part I, shall be tight, staunch and strong, in every way fit for the voyage, and shall with all convenient dispatch proceed to the loading port(s) named in Part I (C).
+
+"""),
+    ("clause_2", """**2. Freight**  
+Freight shall be at the rate stated in Part I (F) and shall be payable without discount upon delivery of cargo at destination.
+
+"""),
+    ("clause_5", """**5. Laydays**  
+Laytime shall not commence before the date stated in Part I (B). Should the vessel not be ready to load by 4:00 o'clock P.M. on the cancelling date, Charterers shall have the option of cancelling this Charter.
+
+"""),
+    ("clause_7", """**7. Hours for Loading and Discharging**  
+The number of running hours specified as laytime in Part I (H) shall be permitted the vessel for loading and discharging cargo.
+
+"""),
+    ("clause_8", """**8. Demurrage**  
+Charterers shall pay demurrage per running hour and pro rata for a part thereof at the rate specified in Part I (I) for all time that loading and discharging exceeds the allowed laytime.
+
+"""),
+    ("clause_20", """**20. TOVALOP**  
+Owners warrant that the vessel is a tanker owned by a Participating Owner in TOVALOP and will so remain during the currency of this Charter.
+
+"""),
+    _COMPLIANCE,
+]
+
+_SHELLVOY_6 = [
+    ("preamble", """
+# SHELLVOY 6
+## Voyage Charter Party
+
+**IT IS THIS DAY AGREED** between {owners} (hereinafter referred to as "Owners"), being owners of the motor/tank vessel called {vessel_name}, and {charterers} (hereinafter referred to as "Charterers") that the service for which provision is herein made shall be subject to the terms and conditions of this Charter, which includes Part I and Part II. If there is any conflict between the provisions of Part I and those of Part II, the provisions of Part I shall prevail.
+
+---
+
+### PART I
+
+"""),
+    ("vessel_description", "**(A) Description of Vessel**  \n{vessel_description}\n\n"),
+    ("laydays", "**(C) Laydays**  \nCommencing {laydays}. Terminating {cancelling}.\n\n"),
+    ("loading_port", "**(D) Loading Range**  \n{loading_port}\n\n"),
+    ("discharging_port", "**(E) Discharging Range**  \n{discharging_port}\n\n"),
+    ("cargo", "**(F) Cargo Description**  \n{cargo}, {cargo_capacity}.\n\n"),
+    ("freight_rate", "**(G) Freight Rate**  \n{freight_rate}\n\n"),
+    ("worldscale_terms", "**(H) Freight Terms**  \n{worldscale_terms}\n\n"),
+    ("laytime", "**(I) Laytime**  \n{laytime}\n\n"),
+    ("demurrage", "**(J) Demurrage per Day**  \n{demurrage}\n\n"),
+    *_clause_boxes("Q", "R", "S"),
+    _WITNESS,
+    ("clause_1", """**1. Condition of Vessel**  
+Owners shall exercise due diligence to ensure that from the time when the obligation to proceed to the loading port(s) attaches and throughout the charter service the vessel is tight, staunch, strong, in good order and condition and in every way fit for the voyage.
+
+"""),
+    ("clause_13", """**13. Notice of Readiness / Laytime**  
+Laytime or, if the vessel is on demurrage, demurrage shall commence upon the expiry of six hours after receipt of notice of readiness, or upon the vessel's arrival in berth, whichever first occurs.
+
+"""),
+    ("clause_15", """**15. Demurrage**  
+Charterers shall pay demurrage at the rate stated in Part I (J) for all time by which the laytime is exceeded. If demurrage is incurred by reason of fire, explosion or breakdown of machinery, the rate shall be reduced by half.
+
+"""),
+    ("clause_25", """**25. Ship-to-Ship Transfers**  
+Charterers shall have the right to order the vessel to load or discharge by ship-to-ship transfer, which shall be carried out in accordance with recommendations set out in the latest applicable industry guidelines.
+
+"""),
+    ("clause_30", """**30. TOVALOP**  
+Owners warrant that the vessel is a tanker owned by a Participating Owner in TOVALOP and will so remain during the currency of this Charter.
+
+"""),
+    _COMPLIANCE,
+]
+
+def _voyage_form(title):
+    # Generic Part I/Part II voyage skeleton for forms without a dedicated layout
+    return [
+        ("preamble", f"""
+# {title}
+## Tanker Voyage Charter Party
+
+**IT IS THIS DAY AGREED** between {{owners}} (hereinafter referred to as "Owners") of the motor/tank vessel called {{vessel_name}} and {{charterers}} (hereinafter referred to as "Charterers") that the transportation herein provided for will be performed subject to the terms and conditions of this Charter, which includes Part I and Part II. If there is any conflict between the provisions of Part I and those of Part II, the provisions of Part I shall prevail.
+
+---
+
+### PART I
+
+"""),
+        ("vessel_description", "**(A) Vessel's Description**  \n{vessel_description}\n\n"),
+        ("cargo", "**(B) Cargo**  \n{cargo}, {cargo_capacity}.\n\n"),
+        ("loading_port", "**(C) Loading Port(s) or Range(s)**  \n{loading_port}\n\n"),
+        ("discharging_port", "**(D) Discharging Port(s) or Range(s)**  \n{discharging_port}\n\n"),
+        ("laydays", "**(E) Laydays**  \nLaydays shall not commence before noon (local time) on {laydays}, unless with Charterers' consent.\n\n"),
+        ("cancelling", "**(F) Cancelling**  \nNoon (local time) on: {cancelling}.\n\n"),
+        ("worldscale_terms", "**(G) Worldscale Terms**  \n{worldscale_terms}\n\n"),
+        ("freight_rate", "**(H) Freight Rate**  \nFreight shall be paid at the rate of {freight_rate} per ton on the intaken quantity of cargo.\n\n"),
+        ("laytime", "**(I) Laytime**  \n{laytime}\n\n"),
+        ("demurrage", "**(J) Demurrage**  \n{demurrage}\n\n"),
+        *_clause_boxes("Q", "R", "S"),
+        _WITNESS,
+        ("clause_1", """**1. Condition of Vessel**  
+Owners shall exercise due diligence to make the vessel seaworthy and in every way fit for the voyage and for the carriage of the cargo, and shall maintain her class throughout the currency of this Charter.
+
+"""),
+        ("clause_freight", """**Freight Payment**  
+Freight shall be paid at the rate specified in Part I (H), calculated on the intaken quantity of cargo, without discount, deduction or set-off.
+
+"""),
+        ("clause_laytime", """**Laytime and Demurrage**  
+Laytime as specified in Part I (I) shall be allowed for loading and discharging. Charterers shall pay demurrage at the rate specified in Part I (J) for all time by which the allowed laytime is exceeded.
+
+"""),
+        ("clause_tovalop", """**TOVALOP**  
+Owners warrant that the vessel is a tanker owned by a Participating Owner in TOVALOP and will so remain during the currency of this Charter.
+
+"""),
+        _COMPLIANCE,
+    ]
+
+FORMS = {
+    "TANKERVOY 87": _TANKERVOY_87,
+    "Shell Time 4": _SHELL_TIME_4,
+    "Asbatankvoy 2025": _ASBATANKVOY_2025,
+    "Shellvoy 6": _SHELLVOY_6,
+    "BPVOY4": _voyage_form("BPVOY4"),
+    "ExxonMobil Voy2000": _voyage_form("EXXONMOBIL VOY2000"),
+    "INTERTANKVOY 76": _voyage_form("INTERTANKVOY 76"),
+}
+
+def _format_date(value, default):
+    if type(value) is date:
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    return default if value is None else value
+
+def _compliance_warnings(get):
+    compliance_warnings = compliance.default_engine.check(get)
+    return '; '.join(compliance_warnings) if compliance_warnings else 'None'
+
+# Slot name -> (term, default) for values copied straight from custom_terms
+_TERM_FIELDS = {
+    'owners': ('Owners', 'Owners'),
+    'charterers': ('Charterers', 'Charterers'),
+    'vessel_name': ('Vessel Name', 'Vessel Name'),
+    'vessel_description': ('Vessel Description', 'Description of the vessel including class, tonnage, and specifications.'),
+    'loading_port': ('Loading Port', 'In Charterers\' option.'),
+    'discharging_port': ('Discharging Port', 'In Charterers\' option.'),
+    'freight_rate': ('Freight Rate', 'Rate'),
+    'cargo': ('Cargo', 'Crude Oil or Products'),
+    'cargo_capacity': ('Cargo Capacity', 'full cargo'),
+    'laytime': ('Laytime', '72 hours'),
+    'demurrage': ('Demurrage', 'As agreed'),
+    'route': ('Route', 'Any'),
+    'period': ('Period', 'As agreed'),
+    'hire_rate': ('Hire Rate', 'As agreed'),
+    'delivery_port': ('Delivery Port', 'In Charterers\' option.'),
+    'redelivery_port': ('Redelivery Port', 'In Charterers\' option.'),
+}
+
+# Slot name -> function of custom_terms.get for values that need formatting
+_DERIVED_FIELDS = {
+    'laydays': lambda get: _format_date(get('Laydays'), 'Date'),
+    'cancelling': lambda get: _format_date(get('Cancelling'), 'Date'),
+    'worldscale_terms': lambda get: WORLDSCALE_TERMS if get('Use Worldscale', True) else CUSTOM_FREIGHT_TERMS,
+    'standard_clauses': lambda get: get('Standard Clauses', '') or 'None.',
+    'modern_clauses': lambda get: get('Modern Clauses', '') or 'None.',
+    'additional_clauses': lambda get: get('Additional Clauses', '') or 'None.',
+    'compliance_warnings': _compliance_warnings,
+}
+
+def _slot(field):
+    if field in _DERIVED_FIELDS:
+        return (None, None, _DERIVED_FIELDS[field])
+    term, default = _TERM_FIELDS[field]
+    return (term, default, None)
+
+def _form(template_name):
+    return FORMS.get(template_name) or _voyage_form(template_name.upper() or "TANKERVOY 87")
+
+def _compile(texts):
+    # (parts, slots): parts alternates static text (even indices) with empty slots (odd
+    # indices), and slots says how to fill each one from custom_terms
+    statics = [""]
+    slots = []
+    for text in texts:
+        for literal, field, _, _ in Formatter().parse(text):
+            statics[-1] += literal
+            if field is not None:
+                slots.append(_slot(field))
+                statics.append("")
+    parts = [None] * (2 * len(slots) + 1)
+    parts[::2] = statics
+    return parts, tuple(slots)
+
+def _fill(slots, get):
+    return [str(get(term, default) if derive is None else derive(get)) for term, default, derive in slots]
+
+_plans = {}
+
+def compile_plan(template_name):
+    # The whole form as one plan, so rendering is one slice fill and one join
+    plan = _plans.get(template_name)
+    if plan is None:
+        plan = _plans[template_name] = _compile(text for _, text in _form(template_name))
+    return plan
+
+@timed("document.generate")
+def generate_document(template_name, custom_terms):
+    parts, slots = compile_plan(template_name)
+    parts = parts.copy()
+    parts[1::2] = _fill(slots, custom_terms.get)
+    return "".join(parts)
+
+_section_plans = {}
+
+def compile_sections(template_name):
+    # One (section_id, parts, slots) plan per section, in document order
+    plan = _section_plans.get(template_name)
+    if plan is None:
+        plan = _section_plans[template_name] = tuple((section_id, *_compile([text])) for section_id, text in _form(template_name))
+    return plan
+
+# Section texts, keyed by their digest; bounded by the memory the texts take, since riders
+# and clause blocks make some sections many KB
+SECTION_CACHE_BYTES = 16 * 1024 * 1024
+_sections = OrderedDict()
+_sections_bytes = 0
+_sections_lock = threading.Lock()
+
+def _section_digest(template_name, section_id, values):
+    # The text is fixed by the form section and its slot values, so these are hashed instead
+    # of the text; each value is length-prefixed so the boundaries between them stay unambiguous
+    payload = "".join([f"{template_name}\0{section_id}", *(f"\0{len(value)}:{value}" for value in values)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+@timed("document.sections")
+def render_sections(template_name, custom_terms):
+    # [(section_id, digest, text)] in document order; the texts join to generate_document().
+    # A section is cached on the digest of its filled slot values, so an edit only re-renders
+    # the sections that read the edited term, and the digest says which sections changed.
+    global _sections_bytes
+    get = custom_terms.get
+    sections = []
+    for section_id, parts, slots in compile_sections(template_name):
+        values = _fill(slots, get)
+        digest = _section_digest(template_name, section_id, values)
+        with _sections_lock:
+            text = _sections.get(digest)
+            if text is not None:
+                _sections.move_to_end(digest)
+        if text is None:
+            filled = parts.copy()
+            filled[1::2] = values
+            text = "".join(filled)
+            size = sys.getsizeof(text)
+            if size <= SECTION_CACHE_BYTES:
+                with _sections_lock:
+                    if digest not in _sections:
+                        _sections[digest] = text
+                        _sections_bytes += size
+                    while _sections_bytes > SECTION_CACHE_BYTES:
+                        _sections_bytes -= sys.getsizeof(_sections.popitem(last=False)[1])
+        sections.append((section_id, digest, text))
+    return sections
+
+def changed_sections(previous, sections):
+    # Ids of sections whose digest differs from previous ({section_id: digest}) or that are new
+    return [section_id for section_id, digest, _ in sections if previous.get(section_id) != digest]
+
+def build_docx(doc_text):
+    # The python-docx tree the download used to be built from, kept as the reference the
+    # docx benchmark compares the streaming writer with. python-docx (and lxml) take longer
+    # to import than the rest of the app's own modules together.
+    from docx import Document
+    doc = Document()
+    for paragraph in doc_text.split('\n\n'):
+        doc.add_paragraph(paragraph.replace('\n', ' '))
+    return doc
+
+def write_docx(doc_text, target):
+    # doc_text may be an iterable of chunks, such as the texts from render_sections;
+    # target is a path or a writable binary file
+    with span("docx.write"):
+        docx_stream.write_docx(doc_text, target)
+
+def generate_docx_bytes(doc_text):
+    # Streamed into one buffer of compressed output; no document tree is built
+    with span("docx.write"):
+        return docx_stream.docx_bytes(doc_text)
@@ -0,0 +1,170 @@
+import re
+import zipfile
+from io import BytesIO
+
+# Streaming .docx writer: turns the charter Markdown into WordprocessingML paragraph by
+# paragraph and writes each one straight into the deflated word/document.xml entry of the
+# zip, so memory stays flat however long the charter is, and no python-docx tree (or lxml)
+# is ever built. The target is a path or any writable binary file, sockets included: zipfile
+# writes data descriptors when it cannot seek back.
+#
+# The Markdown the forms produce is kept as Word formatting: # to ###### headings become
+# Heading 1-6, **bold** becomes bold runs, a line ending in two spaces is a line break,
+# numbered clause lines are paragraphs of their own and --- is a horizontal rule. Other
+# newlines inside a paragraph are spaces, as in rendered Markdown.
+
+_W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+# Fixed timestamps, so the same charter always gives the same bytes
+_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+_CONTENT_TYPES = _XML_HEADER + (
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/word/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+    '</Types>'
+)
+_PACKAGE_RELS = _XML_HEADER + (
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>'
+    '</Relationships>'
+)
+_DOCUMENT_RELS = _XML_HEADER + (
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+# Heading level -> font size in half-points
+_HEADING_SIZES = {1: 32, 2: 28, 3: 26, 4: 24, 5: 22, 6: 22}
+_STYLES = _XML_HEADER + (
+    f'<w:styles xmlns:w="{_W}">'
+    '<w:docDefaults><w:rPrDefault><w:rPr><w:rFonts w:ascii="Calibri" w:hAnsi="Calibri" w:cs="Calibri"/>'
+    '<w:sz w:val="22"/><w:szCs w:val="22"/></w:rPr></w:rPrDefault>'
+    '<w:pPrDefault><w:pPr><w:spacing w:after="160" w:line="259" w:lineRule="auto"/></w:pPr></w:pPrDefault></w:docDefaults>'
+    '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/><w:qFormat/></w:style>'
+    + "".join(
+        f'<w:style w:type="paragraph" w:styleId="Heading{level}"><w:name w:val="heading {level}"/>'
+        '<w:basedOn w:val="Normal"/><w:next w:val="Normal"/><w:uiPriority w:val="9"/><w:qFormat/>'
+        f'<w:pPr><w:keepNext/><w:keepLines/><w:spacing w:before="240" w:after="80"/><w:outlineLvl w:val="{level - 1}"/></w:pPr>'
+        f'<w:rPr><w:b/><w:bCs/><w:sz w:val="{size}"/><w:szCs w:val="{size}"/></w:rPr></w:style>'
+        for level, size in _HEADING_SIZES.items()
+    )
+    + '</w:styles>'
+)
+_DOCUMENT_START = _XML_HEADER + f'<w:document xmlns:w="{_W}"><w:body>'
+_DOCUMENT_END = (
+    '<w:sectPr><w:pgSz w:w="11906" w:h="16838"/>'
+    '<w:pgMar w:top="1440" w:right="1440" w:bottom="1440" w:left="1440" w:header="708" w:footer="708" w:gutter="0"/>'
+    '</w:sectPr></w:body></w:document>'
+)
+_RULE = '<w:p><w:pPr><w:pBdr><w:bottom w:val="single" w:sz="6" w:space="1" w:color="auto"/></w:pBdr></w:pPr></w:p>'
+
+_HEADING = re.compile(r"(#{1,6})\s+(.*?)\s*#*\s*")
+_LIST_ITEM = re.compile(r"(?:\d+[.)]|[-*+])\s")
+_RULE_LINE = re.compile(r"(?:-\s*){3,}|(?:\*\s*){3,}|(?:_\s*){3,}")
+# Characters XML 1.0 does not allow; lone surrogates cannot be encoded as UTF-8 either
+_INVALID_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+# Paragraphs are gathered into writes of about this many characters
+WRITE_CHARS = 64 * 1024
+
+def _escape(text):
+    return _INVALID_XML.sub("", text).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def _runs(text):
+    # Runs for paragraph text: ** toggles bold (an unmatched one is kept as text) and \n is
+    # a line break
+    parts = text.split("**")
+    if len(parts) % 2 == 0:
+        parts[-2:] = ["**".join(parts[-2:])]
+    runs = []
+    for index, part in enumerate(parts):
+        properties = "<w:rPr><w:b/><w:bCs/></w:rPr>" if index % 2 else ""
+        for number, line in enumerate(part.split("\n")):
+            if number:
+                runs.append("<w:r><w:br/></w:r>")
+            if line:
+                runs.append(f'<w:r>{properties}<w:t xml:space="preserve">{_escape(line)}</w:t></w:r>')
+    return "".join(runs)
+
+def _paragraph(lines, style=None):
+    # Lines of one paragraph: a trailing double space keeps the line break, any other
+    # newline is a space
+    text = ""
+    for line in lines:
+        if text and not text.endswith("\n"):
+            text += " "
+        hard_break = line.endswith("  ")
+        text += line.strip() + ("\n" if hard_break else "")
+    properties = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    return f"<w:p>{properties}{_runs(text.rstrip(chr(10)))}</w:p>"
+
+def _lines(chunks):
+    # Lines of the text, read across chunk boundaries without joining the chunks
+    if isinstance(chunks, str):
+        chunks = (chunks,)
+    rest = ""
+    for chunk in chunks:
+        start = 0
+        end = chunk.find("\n")
+        while end != -1:
+            yield rest + chunk[start:end]
+            rest = ""
+            start = end + 1
+            end = chunk.find("\n", start)
+        rest += chunk[start:]
+    if rest:
+        yield rest
+
+def iter_paragraphs(chunks):
+    # WordprocessingML for each block of the Markdown, in order
+    lines = []
+    for line in _lines(chunks):
+        stripped = line.strip()
+        heading = _HEADING.fullmatch(stripped)
+        if not stripped or heading or _RULE_LINE.fullmatch(stripped) or _LIST_ITEM.match(stripped):
+            if lines:
+                yield _paragraph(lines)
+                lines = []
+            if heading:
+                yield _paragraph([heading.group(2)], f"Heading{len(heading.group(1))}")
+            elif stripped and not _LIST_ITEM.match(stripped):
+                yield _RULE
+            elif stripped:
+                lines.append(line)
+            continue
+        lines.append(line)
+    if lines:
+        yield _paragraph(lines)
+
+def _entry(name):
+    return zipfile.ZipInfo(name, date_time=_DATE_TIME)
+
+def write_docx(chunks, target):
+    # chunks: the Markdown as one string or an iterable of strings, such as rendered sections;
+    # target: a path or a writable binary file
+    with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(_entry("[Content_Types].xml"), _CONTENT_TYPES)
+        archive.writestr(_entry("_rels/.rels"), _PACKAGE_RELS)
+        archive.writestr(_entry("word/_rels/document.xml.rels"), _DOCUMENT_RELS)
+        archive.writestr(_entry("word/styles.xml"), _STYLES)
+        document = _entry("word/document.xml")
+        document.compress_type = zipfile.ZIP_DEFLATED
+        with archive.open(document, "w", force_zip64=True) as part:
+            pending = [_DOCUMENT_START]
+            size = len(_DOCUMENT_START)
+            for paragraph in iter_paragraphs(chunks):
+                pending.append(paragraph)
+                size += len(paragraph)
+                if size >= WRITE_CHARS:
+                    part.write("".join(pending).encode("utf-8"))
+                    pending = []
+                    size = 0
+            pending.append(_DOCUMENT_END)
+            part.write("".join(pending).encode("utf-8"))
+
+def docx_bytes(chunks):
+    buffer = BytesIO()
+    write_docx(chunks, buffer)
+    return buffer.getvalue()
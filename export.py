@@ -0,0 +1,105 @@
+import argparse
+import csv
+import sys
+import tempfile
+import time
+import zipfile
+from datetime import date
+
+import charter_store
+from batch import FORMATS, charter_filename, stream_to_zip
+from charter_model import parse_charter
+
+# Bulk export of saved charters: walks the store in id order through iter_charters, renders
+# each charter across a process pool with batch.render_charter and writes every file into
+# the zip as soon as it is ready, so memory stays bounded by the pool's in-flight limit
+# however large the history is. manifest.csv maps each file written back to its saved charter.
+
+MANIFEST_FILE = "manifest.csv"
+MANIFEST_COLUMNS = ["file", "charter_id", "template", "vessel_class", "vessel_name", "laydays"]
+
+def export_charters(db_path, output_path, filters=None, workers=None, formats=FORMATS, on_progress=None):
+    # filters as for charter_store.query_charters; on_progress(done, total) after each charter
+    total = charter_store.count_charters(db_path, filters)
+    with tempfile.TemporaryFile("w+", newline="") as manifest:
+        writer = csv.writer(manifest)
+        writer.writerow(MANIFEST_COLUMNS)
+
+        # Manifest rows of the jobs in flight, written once their files are in the zip
+        rows = {}
+
+        def jobs():
+            for index, charter in enumerate(charter_store.iter_charters(db_path, filters=filters)):
+                # The same boundary parse as the form, batch and service: stored terms may be
+                # legacy text, such as "Use Worldscale": "False"
+                parsed, _ = parse_charter(charter["terms"], charter["template"], charter["vessel_class"] or None)
+                terms = parsed.to_terms()
+                name = charter_filename(index, charter["template"], charter["vessel_class"], terms)
+                rows[name] = [name, charter["id"], charter["template"], charter["vessel_class"], terms.get("Vessel Name", ""), terms.get("Laydays", "")]
+                yield name, charter["template"], terms, tuple(formats)
+
+        start = time.perf_counter()
+        rendered = stream_to_zip(
+            jobs(),
+            output_path,
+            workers=workers,
+            on_progress=(lambda done: on_progress(done, total)) if on_progress else None,
+            on_written=lambda job: writer.writerow(rows.pop(job[0])),
+        )
+        manifest.seek(0)
+        with zipfile.ZipFile(output_path, "a", compression=zipfile.ZIP_DEFLATED) as archive:
+            with archive.open(MANIFEST_FILE, "w") as target:
+                for line in manifest:
+                    target.write(line.encode("utf-8"))
+    seconds = time.perf_counter() - start
+    return {
+        "matched": total,
+        "rendered": rendered,
+        "seconds": seconds,
+        "charters_per_second": rendered / seconds if seconds else 0.0,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export saved charters into a zip of charter parties.")
+    parser.add_argument("output", help="Path of the zip archive to write")
+    parser.add_argument("--db", default="charters.db", help="Saved charters database (default: charters.db)")
+    parser.add_argument("--template", help="Only charters on this form")
+    parser.add_argument("--vessel-class", help="Only charters for this vessel class")
+    parser.add_argument("--vessel", help="Only vessels whose name starts with this (case-insensitive)")
+    parser.add_argument("--laydays-from", type=date.fromisoformat, help="Laydays on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--laydays-to", type=date.fromisoformat, help="Laydays on or before this date (YYYY-MM-DD)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--formats", default=",".join(FORMATS), help="Comma-separated output formats (md, docx)")
+    args = parser.parse_args(argv)
+
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        parser.error(f"Unknown format(s): {', '.join(sorted(unknown))}")
+    filters = {
+        "template": args.template,
+        "vessel_class": args.vessel_class,
+        "vessel_name": args.vessel,
+        "laydays_from": args.laydays_from,
+        "laydays_to": args.laydays_to,
+    }
+
+    last_report = 0.0
+
+    def progress(done, total):
+        nonlocal last_report
+        if done == total or time.perf_counter() - last_report >= 1.0:
+            last_report = time.perf_counter()
+            print(f"\r{done}/{total} charters", end="", file=sys.stderr, flush=True)
+
+    report = export_charters(args.db, args.output, filters, workers=args.workers, formats=formats, on_progress=progress)
+    if report["rendered"]:
+        print(file=sys.stderr)
+    print(
+        f"Exported {report['rendered']} of {report['matched']} matching charters in {report['seconds']:.2f}s "
+        f"({report['charters_per_second']:.1f} charters/s) -> {args.output}"
+    )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+# Named timing spans aggregated into histograms. Off unless CHARTER_INSTRUMENTATION=1 is set
+# before the app starts: span() then hands back one shared no-op context manager and timed()
+# returns the function undecorated, so the disabled cost is a function call or nothing at all.
+#
+#   with span("docx.save"): ...
+#   @timed("templates.load_template")
+#
+# CHARTER_METRICS_FILE names a file that flush() rewrites (.prom for Prometheus text,
+# anything else for JSON); service.py also serves the Prometheus text at GET /metrics.
+
+ENABLED = os.environ.get("CHARTER_INSTRUMENTATION", "").lower() in ("1", "true", "yes", "on")
+METRICS_FILE = os.environ.get("CHARTER_METRICS_FILE", "")
+
+# Upper bucket bounds in seconds, from 10 µs to 10 s
+BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None or seconds < self.min else self.min
+        self.max = seconds if self.max is None or seconds > self.max else self.max
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation; coarse, but stable and cheap
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum_ms": self.total * 1000,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "min_ms": (self.min or 0.0) * 1000,
+            "max_ms": (self.max or 0.0) * 1000,
+            "p50_ms": (self.quantile(0.5) or 0.0) * 1000,
+            "p99_ms": (self.quantile(0.99) or 0.0) * 1000,
+            "buckets": {("+Inf" if i == len(BUCKETS) else repr(BUCKETS[i])): n for i, n in enumerate(self.counts)},
+        }
+
+_histograms = {}
+_lock = threading.Lock()
+
+def record(name, seconds):
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+class _Span:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.started)
+        return False
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+def span(name):
+    return _Span(name) if ENABLED else _NO_SPAN
+
+def timed(name):
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+def snapshot():
+    with _lock:
+        return {name: histogram.to_dict() for name, histogram in sorted(_histograms.items())}
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+def to_json():
+    return json.dumps({"enabled": ENABLED, "spans": snapshot()}, indent=2)
+
+def to_prometheus():
+    lines = [
+        "# HELP charter_span_seconds Time spent in instrumented charter generator phases.",
+        "# TYPE charter_span_seconds histogram",
+    ]
+    with _lock:
+        for name, histogram in sorted(_histograms.items()):
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram.counts):
+                cumulative += count
+                lines.append(f'charter_span_seconds_bucket{{span="{label}",le="{bound!r}"}} {cumulative}')
+            lines.append(f'charter_span_seconds_bucket{{span="{label}",le="+Inf"}} {histogram.count}')
+            lines.append(f'charter_span_seconds_sum{{span="{label}"}} {histogram.total!r}')
+            lines.append(f'charter_span_seconds_count{{span="{label}"}} {histogram.count}')
+    return "\n".join(lines) + "\n"
+
+def dump(path):
+    # Replaced atomically so a scraper or tail never reads half a file
+    text = to_prometheus() if path.endswith(".prom") else to_json()
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, scratch = tempfile.mkstemp(dir=directory, prefix=".metrics-")
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    os.replace(scratch, path)
+
+def flush():
+    if ENABLED and METRICS_FILE:
+        dump(METRICS_FILE)
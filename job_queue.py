@@ -0,0 +1,164 @@
+import hashlib
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Jobs run on a bounded thread pool: a .docx build rarely releases the GIL, but the
+# Streamlit script thread only submits and polls, so a rerun never waits on a render
+# and never throws one away.
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+class QueueFull(Exception):
+    pass
+
+def request_key(*parts):
+    # Stable hash of a generation request; identical in-flight requests share one job
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def result_bytes(result):
+    # Rough size of a result: the bytes and text it holds, which dominate (.docx files,
+    # rendered sections)
+    if isinstance(result, (bytes, bytearray, str)):
+        return len(result)
+    if isinstance(result, dict):
+        return sum(result_bytes(value) for value in result.values())
+    if isinstance(result, (list, tuple)):
+        return sum(result_bytes(value) for value in result)
+    return 0
+
+class GenerationQueue:
+    # Finished jobs are kept for polling sessions until more than keep_finished of them, or
+    # results of more than keep_finished_bytes in all, push the oldest out
+    def __init__(self, workers=2, max_pending=32, keep_finished=256, keep_finished_bytes=64 * 1024 * 1024):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self.keep_finished_bytes = keep_finished_bytes
+        self._finished_bytes = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="charter-generation")
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._jobs = OrderedDict()
+        self._in_flight = {}
+        self._counters = {"submitted": 0, "coalesced": 0, "rejected": 0, "completed": 0, "failed": 0}
+        self._wait_ms = 0.0
+        self._run_ms = 0.0
+
+    def submit(self, key, fn, *args):
+        # fn(report, *args) runs on a worker; report(stage, fraction) updates progress.
+        # Returns the job id, which is the id of the existing job if key is in flight.
+        with self._lock:
+            job_id = self._in_flight.get(key)
+            if job_id is not None:
+                self._counters["coalesced"] += 1
+                self._jobs[job_id]["coalesced"] += 1
+                return job_id
+            if len(self._in_flight) >= self.max_pending:
+                self._counters["rejected"] += 1
+                raise QueueFull(f"{len(self._in_flight)} generation jobs already pending")
+            job_id = f"job-{next(self._ids)}"
+            job = {
+                "id": job_id,
+                "key": key,
+                "status": QUEUED,
+                "stage": "queued",
+                "progress": 0.0,
+                "coalesced": 0,
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "timings": {},
+                "result": None,
+                "result_bytes": 0,
+                "error": None,
+            }
+            self._jobs[job_id] = job
+            self._in_flight[key] = job_id
+            self._counters["submitted"] += 1
+            self._evict_finished()
+        self._executor.submit(self._run, job, fn, args)
+        return job_id
+
+    def _run(self, job, fn, args):
+        stage_started = time.perf_counter()
+        job["started_at"] = time.time()
+        job["status"] = RUNNING
+        job["stage"] = "starting"
+
+        def report(stage, fraction):
+            nonlocal stage_started
+            now = time.perf_counter()
+            job["timings"][job["stage"]] = (now - stage_started) * 1000
+            stage_started = now
+            job["stage"] = stage
+            job["progress"] = fraction
+
+        try:
+            result = fn(report, *args)
+        except Exception as exc:
+            job["error"] = f"{type(exc).__name__}: {exc}"
+            status = FAILED
+        else:
+            job["result"] = result
+            job["result_bytes"] = result_bytes(result)
+            status = DONE
+        job["timings"][job["stage"]] = (time.perf_counter() - stage_started) * 1000
+        job["finished_at"] = time.time()
+        with self._lock:
+            job["status"] = status
+            job["progress"] = 1.0
+            self._in_flight.pop(job["key"], None)
+            self._counters["completed" if status == DONE else "failed"] += 1
+            self._wait_ms += (job["started_at"] - job["submitted_at"]) * 1000
+            self._run_ms += (job["finished_at"] - job["started_at"]) * 1000
+            self._finished_bytes += job["result_bytes"]
+            self._evict_finished()
+
+    def _evict_finished(self):
+        # Oldest first; the lock is held
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in (DONE, FAILED)]
+        count = len(finished)
+        for job_id in finished:
+            if count <= self.keep_finished and self._finished_bytes <= self.keep_finished_bytes:
+                break
+            self._finished_bytes -= self._jobs.pop(job_id)["result_bytes"]
+            count -= 1
+
+    def status(self, job_id):
+        # Snapshot without the (possibly large) result; None once the job has been evicted
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        snapshot = {k: v for k, v in job.items() if k != "result"}
+        snapshot["timings"] = dict(job["timings"])
+        return snapshot
+
+    def result(self, job_id):
+        job = self._jobs.get(job_id)
+        return job["result"] if job is not None and job["status"] == DONE else None
+
+    def stats(self):
+        with self._lock:
+            statuses = [job["status"] for job in self._jobs.values()]
+            finished = self._counters["completed"] + self._counters["failed"]
+            return {
+                "workers": self.workers,
+                "queued": statuses.count(QUEUED),
+                "running": statuses.count(RUNNING),
+                "depth": len(self._in_flight),
+                "finished_bytes": self._finished_bytes,
+                **self._counters,
+                "mean_wait_ms": self._wait_ms / finished if finished else 0.0,
+                "mean_run_ms": self._run_ms / finished if finished else 0.0,
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,208 @@
+import argparse
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Laytime and demurrage from statement-of-facts (SoF) event logs. One row per event:
+#
+#   Voyage, Port, Event, Start, End
+#
+# Point events (NOR tendered, all fast, hoses on/off) only need Start; exceptions such as
+# shifting or weather are intervals. Laytime at each port call runs from NOR + notice time
+# (or all fast, if earlier) to hoses off, less excepted time; laytime is reversible, so the
+# calls of a voyage are summed before allowed laytime is deducted and demurrage charged.
+# Every step is a column operation or groupby, so a month of voyages is one pass.
+
+EVENT_COLUMNS = ["Voyage", "Port", "Event", "Start", "End"]
+
+NOR_TENDERED = "NOR Tendered"
+ALL_FAST = "All Fast"
+HOSES_ON = "Hoses On"
+HOSES_OFF = "Hoses Off"
+
+# Share of an exception interval that does not count as laytime
+EXCEPTIONS = {
+    "Shifting": 1.0,
+    "Weather": 1.0,
+    "Breakdown": 1.0,
+    "Awaiting Cargo": 1.0,
+    "Strike": 0.5,
+}
+
+# Lowercased spellings seen in SoFs -> canonical event names
+EVENT_ALIASES = {
+    "nor": NOR_TENDERED,
+    "nor tendered": NOR_TENDERED,
+    "notice of readiness tendered": NOR_TENDERED,
+    "all fast": ALL_FAST,
+    "vessel all fast": ALL_FAST,
+    "hoses on": HOSES_ON,
+    "hoses connected": HOSES_ON,
+    "hoses off": HOSES_OFF,
+    "hoses disconnected": HOSES_OFF,
+    "shifting": "Shifting",
+    "shifting to berth": "Shifting",
+    "weather": "Weather",
+    "bad weather": "Weather",
+    "weather delay": "Weather",
+    "breakdown": "Breakdown",
+    "awaiting cargo": "Awaiting Cargo",
+    "strike": "Strike",
+}
+
+NOTICE_HOURS = 6
+DEFAULT_LAYTIME = "72 hours"
+CALL_KEYS = ["Voyage", "Port"]
+# Slash dates in SoFs are day first (01/03/2024 is 1 March); ISO dates are read as ISO
+DAYFIRST = True
+HOUR = pd.Timedelta(hours=1)
+
+def _parse_times(values):
+    # ISO timestamps in one vectorized pass, anything else per value with DAYFIRST; returns the
+    # times and a mask of the non-blank values that could not be read
+    values = values.replace("", None)
+    times = pd.to_datetime(values, format="ISO8601", errors="coerce")
+    retry = times.isna() & values.notna()
+    if retry.any():
+        retry[retry] = (values[retry].astype(str).str.strip() != "").to_numpy()
+        times[retry] = pd.to_datetime(values[retry], format="mixed", dayfirst=DAYFIRST, errors="coerce")
+    return times, retry & times.isna()
+
+def load_events(source):
+    events = source.copy() if isinstance(source, pd.DataFrame) else pd.read_csv(source, dtype=str, keep_default_na=False)
+    missing = {"Voyage", "Event", "Start"} - set(events.columns)
+    if missing:
+        raise ValueError(f"Statement of facts is missing column(s): {', '.join(sorted(missing))}")
+    if "Port" not in events:
+        events["Port"] = ""
+    if "End" not in events:
+        events["End"] = None
+    events["Voyage"] = events["Voyage"].astype(str)
+    events["Port"] = events["Port"].fillna("").astype(str)
+    names = events["Event"].astype(str).str.strip()
+    events["Event"] = names.str.lower().map(EVENT_ALIASES).fillna(names)
+    given = events[["Start", "End"]]
+    unparsed = pd.DataFrame(index=events.index)
+    for column in ("Start", "End"):
+        events[column], unparsed[column] = _parse_times(given[column])
+    if unparsed.to_numpy().any():
+        bad = [
+            f"{row} ({column} {given.at[row, column]!r})"
+            for row, flags in unparsed[unparsed.any(axis=1)].iterrows()
+            for column in ("Start", "End")
+            if flags[column]
+        ]
+        more = f" and {len(bad) - 10} more" if len(bad) > 10 else ""
+        raise ValueError(f"Statement of facts has times that could not be read in row(s): {', '.join(bad[:10])}{more}")
+    return events[EVENT_COLUMNS]
+
+def parse_hours(values):
+    # "72 hours", "3 days", "84 running hours", 72 -> hours; NaN when no number is given
+    text = pd.Series(values, dtype=object).astype(str)
+    parts = text.str.extract(r"(?P<number>\d[\d,]*(?:\.\d+)?)\s*(?P<unit>day|d\b)?", flags=re.IGNORECASE)
+    hours = pd.to_numeric(parts["number"].str.replace(",", "", regex=False), errors="coerce")
+    return hours.where(parts["unit"].isna(), hours * 24)
+
+def parse_rate(values):
+    # "$40,000/day", "USD 25000 pdpr", 40000 -> USD per day; NaN for "[To be specified] USD/day"
+    text = pd.Series(values, dtype=object).astype(str)
+    number = text.str.extract(r"(\d[\d,]*(?:\.\d+)?)", expand=False)
+    return pd.to_numeric(number.str.replace(",", "", regex=False), errors="coerce")
+
+def _first(events, name, how):
+    times = events.loc[events["Event"] == name, CALL_KEYS + ["Start"]]
+    return getattr(times.groupby(CALL_KEYS)["Start"], how)()
+
+def _excepted_hours(events, window, exceptions):
+    # Exception intervals clipped to each call's laytime window; overlaps are counted once by
+    # starting every interval no earlier than the latest end seen before it in the same call
+    spans = events[events["Event"].isin(list(exceptions)) & events["End"].notna()]
+    spans = spans.join(window, on=CALL_KEYS, how="inner")
+    if spans.empty:
+        # A clean SoF (no exceptions inside any window) has nothing to deduct
+        return pd.Series(0.0, index=window.index)
+    start = spans[["Start", "Commenced"]].max(axis=1)
+    end = spans[["End", "Completed"]].min(axis=1)
+    spans = spans.assign(start=start, end=end).sort_values(CALL_KEYS + ["start"])
+    previous_end = spans.groupby(CALL_KEYS, sort=False)["end"].cummax().groupby([spans[k] for k in CALL_KEYS], sort=False).shift()
+    effective_start = spans["start"].where(previous_end.isna() | (spans["start"] > previous_end), previous_end)
+    hours = ((spans["end"] - effective_start) / HOUR).clip(lower=0) * spans["Event"].map(exceptions)
+    return hours.groupby([spans[k] for k in CALL_KEYS]).sum()
+
+def compute_calls(events, notice_hours=NOTICE_HOURS, exceptions=EXCEPTIONS):
+    # One row per (Voyage, Port) call with its laytime window and time used, in hours
+    events = load_events(events)
+    nor = _first(events, NOR_TENDERED, "min")
+    all_fast = _first(events, ALL_FAST, "min")
+    hoses_on = _first(events, HOSES_ON, "min")
+    hoses_off = _first(events, HOSES_OFF, "max")
+    calls = pd.DataFrame(index=pd.MultiIndex.from_frame(events[CALL_KEYS].drop_duplicates()))
+    calls["NOR Tendered"] = nor
+    calls["All Fast"] = all_fast
+    # Reported only: loading or discharging starts here, but laytime runs from NOR or all fast
+    calls["Hoses On"] = hoses_on
+    calls["Commenced"] = pd.concat([nor + pd.Timedelta(hours=notice_hours), all_fast], axis=1).reindex(calls.index).min(axis=1)
+    calls["Completed"] = hoses_off
+    calls["Gross Hours"] = ((calls["Completed"] - calls["Commenced"]) / HOUR).clip(lower=0)
+    calls["Excepted Hours"] = _excepted_hours(events, calls[["Commenced", "Completed"]].dropna(), exceptions).reindex(calls.index).fillna(0.0)
+    calls["Laytime Used Hours"] = (calls["Gross Hours"] - calls["Excepted Hours"]).clip(lower=0)
+    return calls.sort_index()
+
+def compute_claims(events, voyages=None, laytime=DEFAULT_LAYTIME, demurrage=None, notice_hours=NOTICE_HOURS, exceptions=EXCEPTIONS):
+    # One row per voyage. voyages may give per-voyage "Laytime" and "Demurrage" terms (as in the
+    # charter, e.g. "72 hours" and "$40,000/day"); laytime and demurrage are the fallbacks.
+    calls = compute_calls(events, notice_hours, exceptions)
+    claims = calls.groupby(level="Voyage").agg(
+        **{
+            "Calls": ("Gross Hours", "size"),
+            "Commenced": ("Commenced", "min"),
+            "Completed": ("Completed", "max"),
+            "Gross Hours": ("Gross Hours", "sum"),
+            "Excepted Hours": ("Excepted Hours", "sum"),
+            "Laytime Used Hours": ("Laytime Used Hours", "sum"),
+        }
+    )
+    terms = pd.DataFrame(index=claims.index)
+    terms["Laytime"] = laytime
+    terms["Demurrage"] = demurrage
+    if voyages is not None:
+        voyages = voyages if isinstance(voyages, pd.DataFrame) else pd.read_csv(voyages, dtype=str, keep_default_na=False)
+        given = voyages.assign(Voyage=voyages["Voyage"].astype(str)).set_index("Voyage")
+        for column in ("Laytime", "Demurrage"):
+            if column in given:
+                override = given[column].reindex(terms.index)
+                terms[column] = override.where(override.notna() & (override.astype(str) != ""), terms[column])
+    claims["Allowed Hours"] = parse_hours(terms["Laytime"]).to_numpy()
+    claims["Demurrage Rate"] = parse_rate(terms["Demurrage"]).to_numpy()
+    claims["Demurrage Hours"] = (claims["Laytime Used Hours"] - claims["Allowed Hours"]).clip(lower=0)
+    claims["Demurrage Due"] = (claims["Demurrage Hours"] / 24 * claims["Demurrage Rate"]).round(2)
+    return claims
+
+def claims_for_terms(events, custom_terms):
+    # The charter being drafted supplies laytime and the demurrage rate
+    return compute_claims(events, laytime=custom_terms.get("Laytime") or DEFAULT_LAYTIME, demurrage=custom_terms.get("Demurrage"))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute laytime and demurrage claims from statement-of-facts events.")
+    parser.add_argument("events", help="CSV of SoF events: Voyage, Port, Event, Start, End")
+    parser.add_argument("--voyages", help="CSV of per-voyage terms: Voyage, Laytime, Demurrage")
+    parser.add_argument("--laytime", default=DEFAULT_LAYTIME, help=f"Allowed laytime when not given per voyage (default: {DEFAULT_LAYTIME})")
+    parser.add_argument("--demurrage", help="Demurrage rate when not given per voyage, e.g. '$25,000/day'")
+    parser.add_argument("--output", help="Write the claims to this CSV instead of stdout")
+    args = parser.parse_args(argv)
+
+    claims = compute_claims(args.events, args.voyages, args.laytime, args.demurrage)
+    claims.to_csv(args.output or sys.stdout)
+    unpriced = int(claims["Demurrage Rate"].isna().sum())
+    print(
+        f"{len(claims)} voyages, {claims['Demurrage Hours'].sum():.1f} hours on demurrage, "
+        f"USD {np.nansum(claims['Demurrage Due']):,.2f} due"
+        + (f" ({unpriced} voyages without a demurrage rate)" if unpriced else ""),
+        file=sys.stderr,
+    )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from urllib.parse import urlsplit
+
+# Load test for service.py using only asyncio sockets (HTTP/1.1 keep-alive), so it runs
+# anywhere the service does. Each concurrency level opens that many connections, each
+# sending requests back to back, and reports latency percentiles per endpoint.
+#
+#   uvicorn service:app --port 8000 &
+#   python load_test.py --url http://127.0.0.1:8000 --levels 50,100,250,500
+
+RENDER_TERMS = {
+    "Owners": "Acme Tankers Ltd",
+    "Charterers": "Global Energy Trading SA",
+    "Vessel Name": "MT Example",
+    "Loading Port": "Houston, USA (Key US oil export port)",
+    "Discharging Port": "Rotterdam, Netherlands (Major crude oil hub)",
+    "Laydays": "2026-11-01",
+    "Cancelling": "2026-11-05",
+    "Freight Rate": "125",
+}
+
+# (name, weight, method, path, body)
+def request_mix(rng):
+    vessel_name = f"MT Load {rng.randrange(50)}"
+    return [
+        ("templates", 3, "GET", "/templates", None),
+        ("adjust", 2, "GET", "/templates/Shellvoy%206?vessel_class=VLCC", None),
+        ("suggest", 3, "GET", "/routes/suggest?route=USG+to+ARA", None),
+        ("render_markdown", 4, "POST", "/render", {"template": "TANKERVOY 87", "vessel_class": "VLCC", "terms": {**RENDER_TERMS, "Vessel Name": vessel_name}}),
+        ("render_docx", 1, "POST", "/render", {"template": "Asbatankvoy 2025", "vessel_class": "Suezmax", "terms": {**RENDER_TERMS, "Vessel Name": vessel_name}, "format": "docx"}),
+    ]
+
+async def _send(reader, writer, host, method, path, body):
+    payload = json.dumps(body).encode() if body is not None else b""
+    head = f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(payload)}\r\n"
+    if body is not None:
+        head += "Content-Type: application/json\r\n"
+    writer.write(head.encode() + b"\r\n" + payload)
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return int(status_line.split()[1])
+
+async def _client(url, deadline, samples, errors, seed):
+    rng = random.Random(seed)
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    try:
+        while time.perf_counter() < deadline:
+            mix = request_mix(rng)
+            name, _, method, path, body = rng.choices(mix, weights=[m[1] for m in mix])[0]
+            start = time.perf_counter()
+            try:
+                status = await _send(reader, writer, parts.netloc, method, path, body)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                errors[name] = errors.get(name, 0) + 1
+                writer.close()
+                reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+                continue
+            elapsed = (time.perf_counter() - start) * 1000
+            if status >= 400:
+                errors[name] = errors.get(name, 0) + 1
+            else:
+                samples.setdefault(name, []).append(elapsed)
+    finally:
+        writer.close()
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+async def run_level(url, concurrency, duration):
+    samples, errors = {}, {}
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(url, deadline, samples, errors, seed) for seed in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    everything = [v for values in samples.values() for v in values]
+    report = {
+        "concurrency": concurrency,
+        "requests": len(everything),
+        "errors": sum(errors.values()),
+        "rps": len(everything) / elapsed,
+        "p50_ms": _percentile(everything, 0.50) if everything else None,
+        "p99_ms": _percentile(everything, 0.99) if everything else None,
+        "endpoints": {},
+    }
+    for name, values in sorted(samples.items()):
+        report["endpoints"][name] = {
+            "requests": len(values),
+            "errors": errors.get(name, 0),
+            "mean_ms": statistics.fmean(values),
+            "p50_ms": _percentile(values, 0.50),
+            "p99_ms": _percentile(values, 0.99),
+        }
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the charter rendering service.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--levels", default="50,100,250,500", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per level")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args(argv)
+
+    results = []
+    for level in [int(n) for n in args.levels.split(",")]:
+        report = asyncio.run(run_level(args.url, level, args.duration))
+        results.append(report)
+        if not args.json:
+            print(
+                f"c={level:<4} {report['requests']:>6} req  {report['rps']:8.1f} req/s  "
+                f"p50 {report['p50_ms'] or 0:7.1f} ms  p99 {report['p99_ms'] or 0:7.1f} ms  errors {report['errors']}"
+            )
+            for name, endpoint in report["endpoints"].items():
+                print(f"    {name:<16} p50 {endpoint['p50_ms']:7.1f} ms  p99 {endpoint['p99_ms']:7.1f} ms  ({endpoint['requests']} req, {endpoint['errors']} errors)")
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# Reference data for ports and trading ranges, shared by the UI, the route index and
+# the freight engine. Ports are keyed by UN/LOCODE.
+
+# Ports offered in the loading/discharging selectors
+PORTS = [
+    "Rotterdam, Netherlands (Major crude oil hub)",
+    "Houston, USA (Key US oil export port)",
+    "Singapore, Singapore (Asian bunkering hub)",
+    "Fujairah, UAE (Middle East bunkering)",
+    "Shanghai, China (Major import port)",
+    "Ras Tanura, Saudi Arabia (Crude export)",
+    "Antwerp, Belgium (European refining)",
+    "Port Said, Egypt (Suez Canal access)"
+]
+
+# UN/LOCODE -> names and abbreviations brokers use for the port
+PORT_ALIASES = {
+    "NLRTM": ["Rotterdam", "Rdam", "Rotterdam, Netherlands"],
+    "USHOU": ["Houston", "Hou", "Houston, USA"],
+    "SGSIN": ["Singapore", "Spore", "Sing"],
+    "AEFJR": ["Fujairah", "Fuj", "Fujairah, UAE"],
+    "CNSHA": ["Shanghai", "Shanghai, China"],
+    "SARTA": ["Ras Tanura", "RT", "Ras Tanura, Saudi Arabia"],
+    "BEANR": ["Antwerp", "Antwerpen", "Antwerp, Belgium"],
+    "EGPSD": ["Port Said", "Port Said, Egypt"],
+    "NLAMS": ["Amsterdam"],
+    "USNYC": ["New York", "NY", "NYC", "NYH", "New York Harbor"],
+    "USCRP": ["Corpus Christi", "CCH"],
+    "NGBON": ["Bonny", "Bonny, Nigeria"],
+    "CNNGB": ["Ningbo", "Ningbo-Zhoushan"],
+}
+
+# Trading ranges -> the ports they cover
+REGIONS = {
+    "US Gulf": {"names": ["USG", "USGC", "US Gulf Coast"], "ports": ["USHOU", "USCRP"]},
+    "ARA": {"names": ["Amsterdam-Rotterdam-Antwerp"], "ports": ["NLAMS", "NLRTM", "BEANR"]},
+    "Northwest Europe": {"names": ["NWE", "UKC", "UK Continent"], "ports": ["NLRTM", "BEANR", "NLAMS"]},
+    "Persian Gulf": {"names": ["PG", "AG", "MEG", "Arabian Gulf", "Middle East Gulf"], "ports": ["SARTA", "AEFJR"]},
+    "West Africa": {"names": ["WAF", "WAFR"], "ports": ["NGBON"]},
+    "China": {"names": ["CHN"], "ports": ["CNSHA", "CNNGB"]},
+    "Far East": {"names": ["FE", "East Asia"], "ports": ["CNSHA", "CNNGB", "SGSIN"]},
+    "US Atlantic Coast": {"names": ["USAC", "USEC", "US East Coast"], "ports": ["USNYC"]},
+    "Mediterranean": {"names": ["Med", "East Med"], "ports": ["EGPSD"]},
+}
+
+def port_code(port_label):
+    # Maps a PORTS label such as "Houston, USA (Key US oil export port)" to its UN/LOCODE
+    name = port_label.split(",")[0].strip().lower()
+    for code, aliases in PORT_ALIASES.items():
+        if any(alias.lower() == name for alias in aliases):
+            return code
+    return None
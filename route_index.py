@@ -0,0 +1,170 @@
+import re
+from collections import defaultdict
+
+from ports import PORTS, PORT_ALIASES, REGIONS, port_code
+
+# Common trades and the forms usually fixed on them; either end may be a port or a range
+KNOWN_ROUTES = [
+    ("Houston", "Rotterdam", ["TANKERVOY 87", "Asbatankvoy 2025", "Shellvoy 6", "BPVOY4", "ExxonMobil Voy2000", "INTERTANKVOY 76"]),
+    ("Persian Gulf", "Singapore", ["TANKERVOY 87", "Asbatankvoy 2025", "Shellvoy 6", "ExxonMobil Voy2000", "INTERTANKVOY 76"]),
+    ("West Africa", "China", ["TANKERVOY 87", "Asbatankvoy 2025", "Shellvoy 6", "BPVOY4", "INTERTANKVOY 76"]),
+    ("Rotterdam", "New York", ["TANKERVOY 87", "Asbatankvoy 2025", "Shellvoy 6", "BPVOY4", "ExxonMobil Voy2000"]),
+    ("Fujairah", "Shanghai", ["TANKERVOY 87", "Asbatankvoy 2025", "Shellvoy 6", "INTERTANKVOY 76"]),
+    ("Ras Tanura", "Antwerp", ["TANKERVOY 87", "Asbatankvoy 2025", "Shellvoy 6", "BPVOY4"]),
+]
+
+# "Houston to Rotterdam", "USG -> ARA", "RT – Singapore", "Bonny - Ningbo"
+_ROUTE_SEPARATOR = re.compile(r"\s+to\s+|\s*(?:->|→|–|—)\s*|\s+-\s+", re.IGNORECASE)
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+FUZZY_THRESHOLD = 0.6
+CACHE_SIZE = 4096
+
+def normalize(text):
+    return _NON_ALNUM.sub(" ", str(text).lower()).strip()
+
+def _trigrams(name):
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class RouteIndex:
+    # Resolves free-text route ends to sets of UN/LOCODEs through an alias table, a longest
+    # token-window match and a trigram index for misspellings, then intersects per-port
+    # posting sets of known routes, so lookups do not scan the route list.
+
+    def __init__(self):
+        self._aliases = {}
+        self._trigram_index = defaultdict(set)
+        self._routes = []
+        self._by_origin = defaultdict(set)
+        self._by_destination = defaultdict(set)
+        self._cache = {}
+        self._max_words = 1
+
+    def add_alias(self, name, codes):
+        key = normalize(name)
+        if not key:
+            return
+        self._aliases[key] = self._aliases.get(key, frozenset()) | frozenset(codes)
+        self._max_words = max(self._max_words, len(key.split()))
+        for trigram in _trigrams(key):
+            self._trigram_index[trigram].add(key)
+        self._cache.clear()
+
+    def resolve(self, text):
+        key = normalize(text)
+        if not key:
+            return frozenset()
+        if key in self._aliases:
+            return self._aliases[key]
+
+        # Longest alias found in a window of words, e.g. "houston usa" -> "houston"
+        words = key.split()
+        codes = set()
+        covered = [False] * len(words)
+        for size in range(min(self._max_words, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                if any(covered[start:start + size]):
+                    continue
+                window = " ".join(words[start:start + size])
+                if window in self._aliases:
+                    codes |= self._aliases[window]
+                    covered[start:start + size] = [True] * size
+        if codes:
+            return frozenset(codes)
+
+        # Misspellings: Dice similarity over shared trigrams
+        if len(key) < 4:
+            return frozenset()
+        query = _trigrams(key)
+        hits = defaultdict(int)
+        for trigram in query:
+            for name in self._trigram_index.get(trigram, ()):
+                hits[name] += 1
+        best, best_score = None, FUZZY_THRESHOLD
+        for name, shared in hits.items():
+            score = 2 * shared / (len(query) + len(_trigrams(name)))
+            if score > best_score:
+                best, best_score = name, score
+        return self._aliases[best] if best else frozenset()
+
+    def add_route(self, origin, destination, templates):
+        origins = self.resolve(origin)
+        destinations = self.resolve(destination)
+        if not origins or not destinations:
+            raise ValueError(f"Cannot resolve route {origin!r} to {destination!r}")
+        route_id = len(self._routes)
+        self._routes.append((origins, destinations, list(templates)))
+        for code in origins:
+            self._by_origin[code].add(route_id)
+        for code in destinations:
+            self._by_destination[code].add(route_id)
+        self._cache.clear()
+        return route_id
+
+    def _candidates(self, postings, codes):
+        found = set()
+        for code in codes:
+            found |= postings.get(code, set())
+        return found
+
+    def lookup(self, route):
+        # Templates for the best matching known route, or [] when nothing matches
+        # Cached on the raw text: normalising would drop the separator between the two ends
+        key = str(route).strip().lower()
+        if key in self._cache:
+            return self._cache[key]
+        ends = [end for end in _ROUTE_SEPARATOR.split(str(route).strip()) if normalize(end)]
+        if len(ends) >= 2:
+            origins, destinations = self.resolve(ends[0]), self.resolve(ends[-1])
+            candidates = self._candidates(self._by_origin, origins) & self._candidates(self._by_destination, destinations)
+        elif ends:
+            origins = destinations = self.resolve(ends[0])
+            candidates = self._candidates(self._by_origin, origins) | self._candidates(self._by_destination, destinations)
+        else:
+            candidates = set()
+
+        result = []
+        if candidates:
+            # Prefer the route whose ends are covered most exactly by the query, then the oldest
+            def score(route_id):
+                route_origins, route_destinations, _ = self._routes[route_id]
+                return (
+                    len(route_origins & origins) / len(route_origins | origins)
+                    + len(route_destinations & destinations) / len(route_destinations | destinations),
+                    -route_id,
+                )
+            result = self._routes[max(candidates, key=score)][2]
+        if len(self._cache) >= CACHE_SIZE:
+            self._cache.clear()
+        self._cache[key] = result
+        return result
+
+    def lookup_many(self, routes):
+        # Batch form for whole fixture columns; repeated route strings are resolved once
+        resolved = {}
+        results = []
+        for route in routes:
+            if route not in resolved:
+                resolved[route] = self.lookup(route)
+            results.append(resolved[route])
+        return results
+
+def build_default_index():
+    index = RouteIndex()
+    for code, aliases in PORT_ALIASES.items():
+        index.add_alias(code, [code])
+        for alias in aliases:
+            index.add_alias(alias, [code])
+    for label in PORTS:
+        code = port_code(label)
+        if code:
+            index.add_alias(label, [code])
+    for region, data in REGIONS.items():
+        for name in [region, *data["names"]]:
+            index.add_alias(name, data["ports"])
+    for origin, destination, templates in KNOWN_ROUTES:
+        index.add_route(origin, destination, templates)
+    return index
+
+default_index = build_default_index()
@@ -0,0 +1,192 @@
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, unquote
+
+from templates import get_adjusted_template, get_template_names, get_vessel_class_names, suggest_templates_by_route, suggest_templates_for_routes
+from document_generator import generate_document, generate_docx_bytes
+from artifact_cache import ArtifactCache, charter_key
+from batch import TEMPLATE_COLUMN, VESSEL_CLASS_COLUMN, fixture_to_terms
+import instrumentation
+
+# Headless HTTP API over the generator, as a plain ASGI app:
+#
+#   GET  /health                                   liveness and limiter state
+#   GET  /metrics                                  span histograms, Prometheus text
+#   GET  /templates                                template names
+#   GET  /templates/{name}?vessel_class=VLCC       default terms, adjusted for the class
+#   GET  /routes/suggest?route=USG+to+ARA          suggested templates for one route
+#   POST /routes/suggest  {"routes": [...]}        suggested templates for many routes
+#   POST /render  {"template", "vessel_class", "terms", "format": "markdown" | "docx"}
+#
+# Run with: uvicorn service:app --port 8000  (or python service.py)
+
+MAX_CONCURRENT_RENDERS = int(os.environ.get("CHARTER_SERVICE_MAX_RENDERS", "16"))
+MAX_QUEUED_RENDERS = int(os.environ.get("CHARTER_SERVICE_MAX_QUEUED", "512"))
+RENDER_WORKERS = int(os.environ.get("CHARTER_SERVICE_WORKERS", "0")) or os.cpu_count() or 1
+MAX_BODY_BYTES = 1024 * 1024
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=()):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = list(headers)
+
+def render_docx(template_name, custom_terms):
+    # Runs in the worker process pool, off the event loop
+    return generate_docx_bytes(generate_document(template_name, custom_terms))
+
+class CharterService:
+    def __init__(self):
+        self._pool = None
+        self._renders = None
+        self._waiting = 0
+        self.cache = ArtifactCache(max_bytes=int(os.environ.get("CHARTER_ARTIFACT_CACHE_MB", "64")) * 1024 * 1024)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        try:
+            status, headers, body = await self._dispatch(scope, receive)
+        except HTTPError as exc:
+            status, headers, body = _json({"error": exc.message}, status=exc.status)
+            headers = exc.headers + headers
+        await send({"type": "http.response.start", "status": status, "headers": headers + [(b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.startup()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def startup(self):
+        self._pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS)
+        self._renders = asyncio.Semaphore(MAX_CONCURRENT_RENDERS)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    async def _dispatch(self, scope, receive):
+        method = scope["method"]
+        path = scope["path"].rstrip("/") or "/"
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+
+        if path == "/health" and method == "GET":
+            return _json({"status": "ok", "renders_waiting": self._waiting, "cache": self.cache.stats()})
+        if path == "/metrics" and method == "GET":
+            return 200, [(b"content-type", b"text/plain; version=0.0.4")], instrumentation.to_prometheus().encode("utf-8")
+        if path == "/templates" and method == "GET":
+            return _json({"templates": get_template_names()})
+        if path.startswith("/templates/") and method == "GET":
+            template_name = unquote(path[len("/templates/"):])
+            vessel_class = query.get("vessel_class", [""])[0]
+            if template_name not in get_template_names():
+                raise HTTPError(404, f"Unknown template '{template_name}'")
+            if vessel_class and vessel_class not in get_vessel_class_names():
+                raise HTTPError(422, f"Unknown vessel class '{vessel_class}'")
+            return _json({"template": template_name, "vessel_class": vessel_class or None, "terms": dict(get_adjusted_template(template_name, vessel_class))})
+        if path == "/routes/suggest" and method == "GET":
+            route = query.get("route", [""])[0]
+            return _json({"route": route, "templates": suggest_templates_by_route(route)})
+        if path == "/routes/suggest" and method == "POST":
+            routes = (await _read_json(receive)).get("routes")
+            if not isinstance(routes, list):
+                raise HTTPError(422, "Expected {\"routes\": [...]}")
+            invalid = [index for index, route in enumerate(routes) if not isinstance(route, str)]
+            if invalid:
+                raise HTTPError(422, f"Every route must be a string; not {', '.join(f'routes[{index}]' for index in invalid)}")
+            return _json({"suggestions": suggest_templates_for_routes(routes)})
+        if path == "/render" and method == "POST":
+            return await self._render(await _read_json(receive))
+        if path in ("/health", "/metrics", "/templates", "/routes/suggest", "/render") or path.startswith("/templates/"):
+            raise HTTPError(405, f"{method} not allowed on {path}")
+        raise HTTPError(404, f"No route for {path}")
+
+    async def _render(self, request):
+        output_format = request.get("format", "markdown")
+        if output_format not in ("markdown", "docx"):
+            raise HTTPError(422, "format must be 'markdown' or 'docx'")
+        terms = request.get("terms") or {}
+        if not isinstance(terms, dict):
+            raise HTTPError(422, "terms must be an object")
+        # Terms are form fields: text (dates as ISO text), numbers, booleans or null
+        invalid = {key: "Must be a string, number, boolean or null" for key, value in terms.items() if not _is_term_value(value)}
+        if invalid:
+            return _json({"errors": invalid}, status=422)
+        fixture = {**terms, TEMPLATE_COLUMN: request.get("template", ""), VESSEL_CLASS_COLUMN: request.get("vessel_class", "")}
+        template_name, vessel_class, custom_terms, errors = fixture_to_terms(fixture)
+        if errors:
+            return _json({"errors": errors}, status=422)
+
+        if output_format == "markdown":
+            # Rendering a compiled plan takes microseconds, so it stays on the loop
+            return 200, [(b"content-type", b"text/markdown; charset=utf-8")], generate_document(template_name, custom_terms).encode("utf-8")
+
+        key = charter_key(template_name, vessel_class, custom_terms)
+        cached = self.cache.get(key)
+        if cached is None:
+            if self._waiting >= MAX_QUEUED_RENDERS:
+                raise HTTPError(503, "Too many renders in progress", [(b"retry-after", b"1")])
+            self._waiting += 1
+            try:
+                async with self._renders:
+                    loop = asyncio.get_running_loop()
+                    docx = await loop.run_in_executor(self._pool, render_docx, template_name, custom_terms)
+            finally:
+                self._waiting -= 1
+            cached = {"charter.docx": docx}
+            self.cache.put(key, cached)
+        filename = f"{template_name}_Charter_{vessel_class}.docx".replace('"', "")
+        headers = [(b"content-type", DOCX_MIME.encode()), (b"content-disposition", f'attachment; filename="{filename}"'.encode())]
+        return 200, headers, cached["charter.docx"]
+
+def _is_term_value(value):
+    return value is None or isinstance(value, (str, int, float, bool))
+
+def _json(payload, status=200):
+    return status, [(b"content-type", b"application/json")], json.dumps(payload, default=str).encode("utf-8")
+
+async def _read_json(receive):
+    chunks = []
+    size = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large")
+        chunks.append(chunk)
+        more_body = message.get("more_body", False)
+    try:
+        payload = json.loads(b"".join(chunks) or b"{}")
+    except ValueError:
+        raise HTTPError(400, "Request body is not valid JSON")
+    if not isinstance(payload, dict):
+        raise HTTPError(422, "Request body must be a JSON object")
+    return payload
+
+app = CharterService()
+
+if __name__ == "__main__":
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("uvicorn is required to serve the API: pip install uvicorn")
+    uvicorn.run("service:app", host=os.environ.get("HOST", "127.0.0.1"), port=int(os.environ.get("PORT", "8000")))
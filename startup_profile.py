@@ -0,0 +1,124 @@
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+# Cold-start profile of the Streamlit app: imports everything app.py imports at module level
+# in a fresh interpreter under -X importtime, and reports the wall time, the slowest modules
+# and which app import pulled in any heavy dependency. --check exits 1 when the import time
+# is over budget or a heavy dependency is imported at startup, for CI or a deploy gate:
+#
+#   python startup_profile.py            # report
+#   python startup_profile.py --check    # budget from CHARTER_IMPORT_BUDGET_MS (default 600)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(BASE_DIR, "app.py")
+
+IMPORT_BUDGET_MS = float(os.environ.get("CHARTER_IMPORT_BUDGET_MS", "600"))
+
+# Only ever imported on first use: the freight calculator, laytime, batch export and .docx builds
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "docx", "lxml")
+
+def app_imports(path=APP_PATH):
+    # Modules imported at the top level of the script, in order
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+def parse_importtime(stderr):
+    # [(module, depth, self_us, cumulative_us)] in the order -X importtime prints them:
+    # every module after the modules it imported
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+def _importer(rows, index):
+    # The top-level import that pulled in rows[index]: the next row at depth 0
+    for name, depth, _, _ in rows[index:]:
+        if depth == 0:
+            return name
+    return rows[index][0]
+
+def profile_imports(modules=None, python=sys.executable):
+    modules = modules or app_imports()
+    code = (
+        "import time\n"
+        "started = time.perf_counter()\n"
+        + "".join(f"import {module}\n" for module in modules)
+        + "print((time.perf_counter() - started) * 1000)\n"
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [BASE_DIR, os.environ.get("PYTHONPATH")])))
+    done = subprocess.run([python, "-X", "importtime", "-c", code], cwd=BASE_DIR, env=env, capture_output=True, text=True)
+    if done.returncode:
+        raise RuntimeError(f"Importing the app's modules failed:\n{done.stderr[-2000:]}")
+    rows = parse_importtime(done.stderr)
+    imported = {name for name, _, _, _ in rows}
+    # Cumulative time of each module the app imports directly, not counting interpreter startup
+    top_level = {}
+    for name, depth, _, cumulative_us in rows:
+        if depth == 0 and name.split(".")[0] in {module.split(".")[0] for module in modules}:
+            top_level[name] = cumulative_us / 1000
+    heavy = {}
+    for index, (name, _, _, _) in enumerate(rows):
+        if name in HEAVY_MODULES and name not in heavy:
+            heavy[name] = _importer(rows, index)
+    return {
+        "import_ms": float(done.stdout.strip().splitlines()[-1]),
+        "modules": len(imported),
+        "top_level_ms": dict(sorted(top_level.items(), key=lambda item: -item[1])),
+        "slowest_self_ms": {name: self_us / 1000 for name, _, self_us, _ in sorted(rows, key=lambda row: -row[2])[:15]},
+        "heavy": heavy,
+    }
+
+def best_of(repeat, modules=None):
+    # Fresh interpreters are noisy; keep the fastest run, whose module list is the same
+    runs = [profile_imports(modules) for _ in range(repeat)]
+    return min(runs, key=lambda run: run["import_ms"])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile the app's cold-start imports.")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters to run; the fastest is reported (default 3)")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS, help=f"Import time budget (default {IMPORT_BUDGET_MS:g}, or CHARTER_IMPORT_BUDGET_MS)")
+    parser.add_argument("--check", action="store_true", help="Exit 1 when over budget or a heavy module is imported at startup")
+    parser.add_argument("--json", action="store_true", help="Print the profile as JSON")
+    args = parser.parse_args(argv)
+
+    profile = best_of(args.repeat)
+    if args.json:
+        print(json.dumps(profile, indent=2))
+    else:
+        print(f"app imports: {profile['import_ms']:.0f} ms, {profile['modules']} modules (budget {args.budget_ms:g} ms)")
+        print("\nby app import (cumulative):")
+        for name, ms in profile["top_level_ms"].items():
+            print(f"  {ms:8.1f} ms  {name}")
+        print("\nslowest modules (self):")
+        for name, ms in profile["slowest_self_ms"].items():
+            print(f"  {ms:8.1f} ms  {name}")
+        for name, importer in profile["heavy"].items():
+            print(f"\nheavy dependency {name} imported at startup via {importer}")
+
+    failures = []
+    if profile["import_ms"] > args.budget_ms:
+        failures.append(f"import time {profile['import_ms']:.0f} ms is over the {args.budget_ms:g} ms budget")
+    failures.extend(f"{name} is imported at startup (via {importer})" for name, importer in profile["heavy"].items())
+    if args.check and failures:
+        for failure in failures:
+            print(f"FAIL: {failure}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,269 +1,467 @@
-def load_template(template_name):
-    templates = {
-        "TANKERVOY 87": {
-            "Owners": "[Owners Name]",
-            "Charterers": "[Charterer Name]",
-            "Vessel Name": "TBN",
-            "Vessel Description": "Description of the vessel including class, tonnage, and specifications",
-            "Loading Port": "[To be specified]",
-            "Discharging Port": "[To be specified]",
-            "Laydays": "[Date]",
-            "Cancelling": "[Date]",
-            "Freight Rate": "[To be specified] Worldscale points",
-            "Use Worldscale": "True",
-            "Standard Clauses": """
-                1. Freight payable upon completion of discharge.
-                2. Laytime not to commence before 0600 on ETA unless agreed.
-                3. Owners to provide safe berth.
-                4. Arbitration in New York, London, Singapore, or Hong Kong (New York default).
-            """,
-            "Modern Clauses": """
-                1. Compliance with IMO 2020 sulfur limits.
-                2. Support for electronic Bills of Lading (e-BL).
-                3. Sanctions compliance with U.S., EU, and UN regulations.
-                4. Force majeure includes pandemics and port disruptions.
-                5. TOVALOP compliance for pollution liability.
-            """,
-            "Additional Clauses": ""
-        },
-        "Shell Time 4": {
-            "Vessel Name": "TBN",
-            "Charterers": "[Charterer Name]",
-            "Period": "12 months +/- 1 month",
-            "Hire Rate": "[To be specified] USD/day",
-            "Delivery Port": "[To be specified]",
-            "Redelivery Port": "[To be specified]",
-            "Loading Port": "[To be specified]",
-            "Discharging Port": "[To be specified]",
-            "Laydays": "[Date]",
-            "Cancelling": "[Date]",
-            "Route": "Any",
-            "Standard Clauses": """
-                1. Vessel to comply with ISM and ISPS codes.
-                2. Charterer to pay port costs and bunkers.
-                3. Owners to maintain vessel insurance and class certification.
-                4. Hire payment due monthly in advance.
-            """,
-            "Modern Clauses": """
-                1. Compliance with IMO 2020 sulfur limits.
-                2. Sanctions compliance with U.S., EU, and UN regulations.
-                3. Force majeure includes pandemics and geopolitical disruptions.
-                4. Support for electronic Bills of Lading (e-BL).
-                5. TOVALOP compliance for pollution liability.
-            """,
-            "Additional Clauses": ""
-        },
-        "Asbatankvoy 2025": {
-            "Vessel Name": "TBN",
-            "Charterers": "[Charterer Name]",
-            "Cargo": "Crude Oil",
-            "Cargo Capacity": "[To be specified] tons",
-            "Loading Port": "[To be specified]",
-            "Discharging Port": "[To be specified]",
-            "Laydays": "[Date]",
-            "Cancelling": "[Date]",
-            "Laytime": "72 hours",
-            "Demurrage": "[To be specified] USD/day",
-            "Freight Rate": "[To be specified] Worldscale points",
-            "Use Worldscale": "True",
-            "Route": "Any",
-            "Standard Clauses": """
-                1. Freight payable upon completion of discharge.
-                2. Laytime not to commence before 0600 on ETA unless agreed.
-                3. Owners to provide safe berth.
-                4. Arbitration in New York, London, Singapore, or Hong Kong (New York default).
-            """,
-            "Modern Clauses": """
-                1. Compliance with ESG and carbon intensity reporting.
-                2. Support for electronic Bills of Lading (e-BL).
-                3. Sanctions compliance with U.S., EU, and UN regulations.
-                4. Force majeure includes pandemics and port disruptions.
-                5. TOVALOP compliance for pollution liability.
-            """,
-            "Additional Clauses": ""
-        },
-        "Shellvoy 6": {
-            "Vessel Name": "TBN",
-            "Charterers": "[Charterer Name]",
-            "Cargo": "Crude Oil or Products",
-            "Cargo Capacity": "[To be specified] tons",
-            "Loading Port": "[To be specified]",
-            "Discharging Port": "[To be specified]",
-            "Laydays": "[Date]",
-            "Cancelling": "[Date]",
-            "Laytime": "72 hours",
-            "Demurrage": "[To be specified] USD/day",
-            "Freight Rate": "[To be specified] Worldscale points",
-            "Use Worldscale": "True",
-            "Route": "Any",
-            "Standard Clauses": """
-                1. NOR invalid if free pratique not granted within 6 hours of tendering.
-                2. Charterer responsible for port costs.
-                3. Vessel to comply with ship-to-ship transfer protocols.
-                4. Time lost due to vessel condition not to count as laytime.
-            """,
-            "Modern Clauses": """
-                1. Compliance with IMO 2020 sulfur limits.
-                2. Sanctions compliance with U.S., EU, and UN regulations.
-                3. Force majeure includes geopolitical disruptions.
-                4. Support for electronic Bills of Lading (e-BL).
-                5. TOVALOP compliance for pollution liability.
-            """,
-            "Additional Clauses": ""
-        },
-        "BPVOY4": {
-            "Vessel Name": "TBN",
-            "Charterers": "[Charterer Name]",
-            "Cargo": "Crude Oil or Products",
-            "Cargo Capacity": "[To be specified] tons",
-            "Loading Port": "[To be specified]",
-            "Discharging Port": "[To be specified]",
-            "Laydays": "[Date]",
-            "Cancelling": "[Date]",
-            "Laytime": "72 hours",
-            "Demurrage": "[To be specified] USD/day",
-            "Freight Rate": "[To be specified] Worldscale points",
-            "Use Worldscale": "True",
-            "Route": "Any",
-            "Standard Clauses": """
-                1. Balanced terms for owners and charterers.
-                2. Freight payable upon completion of discharge.
-                3. Vessel to comply with modern safety and environmental regulations.
-                4. Reduced need for rider clauses due to comprehensive terms.
-            """,
-            "Modern Clauses": """
-                1. Compliance with IMO 2020 sulfur limits.
-                2. Support for digital reporting and e-BL.
-                3. Sanctions compliance with U.S., EU, and UN regulations.
-                4. Force majeure includes pandemics and port disruptions.
-                5. TOVALOP compliance for pollution liability.
-            """,
-            "Additional Clauses": ""
-        },
-        "ExxonMobil Voy2000": {
-            "Vessel Name": "TBN",
-            "Charterers": "[Charterer Name]",
-            "Cargo": "Crude Oil or Products",
-            "Cargo Capacity": "[To be specified] tons",
-            "Loading Port": "[To be specified]",
-            "Discharging Port": "[To be specified]",
-            "Laydays": "[Date]",
-            "Cancelling": "[Date]",
-            "Laytime": "72 hours",
-            "Demurrage": "[To be specified] USD/day",
-            "Freight Rate": "[To be specified] Worldscale points",
-            "Use Worldscale": "True",
-            "Route": "Any",
-            "Standard Clauses": """
-                1. Clear and concise terms for loading and discharge.
-                2. Charterer to provide safe port/berth.
-                3. Freight payable upon completion of discharge.
-                4. Vessel to maintain class and regulatory compliance.
-            """,
-            "Modern Clauses": """
-                1. Compliance with IMO 2020 sulfur limits.
-                2. Sanctions compliance with U.S., EU, and UN regulations.
-                3. Force majeure includes geopolitical disruptions.
-                4. Support for electronic Bills of Lading (e-BL).
-                5. TOVALOP compliance for pollution liability.
-            """,
-            "Additional Clauses": ""
-        },
-        "INTERTANKVOY 76": {
-            "Vessel Name": "TBN",
-            "Charterers": "[Charterer Name]",
-            "Cargo": "Crude Oil or Products",
-            "Cargo Capacity": "[To be specified] tons",
-            "Loading Port": "[To be specified]",
-            "Discharging Port": "[To be specified]",
-            "Laydays": "[Date]",
-            "Cancelling": "[Date]",
-            "Laytime": "72 hours",
-            "Demurrage": "[To be specified] USD/day",
-            "Freight Rate": "[To be specified] Worldscale points",
-            "Use Worldscale": "True",
-            "Route": "Any",
-            "Standard Clauses": """
-                1. Freight payable upon completion of loading.
-                2. Laytime to commence 6 hours after NOR unless otherwise agreed.
-                3. Owners to ensure vessel suitability for cargo.
-                4. Charterer to nominate safe port/berth.
-            """,
-            "Modern Clauses": """
-                1. Compliance with IMO 2020 sulfur limits.
-                2. Support for electronic Bills of Lading (e-BL).
-                3. Sanctions compliance with U.S., EU, and UN regulations.
-                4. Force majeure includes pandemics and port disruptions.
-                5. TOVALOP compliance for pollution liability.
-            """,
-            "Additional Clauses": ""
-        }
+import hashlib
+import json
+import os
+import sys
+import threading
+from functools import lru_cache
+from types import MappingProxyType
+
+import route_index
+from instrumentation import timed
+
+# Directory of extra *.json template files ({"Template Name": {term: default, ...}});
+# they are loaded on top of the built-in forms and reloaded when they change on disk.
+TEMPLATES_DIR = os.environ.get("CHARTER_TEMPLATES_DIR", "")
+
+# Clause fragments: every clause of the built-in forms is written once, here, and a form's
+# clause block is the list of fragment names it is composed of. Template files may list
+# fragment names for a clause term too. A fragment version is identified by the hash of its
+# text, so rewording a clause with register_clause_fragment gives it a new id in every form
+# that lists it, and caches keyed on fragment text or id (composed blocks, the compliance
+# scan) hold one entry per distinct clause rather than per form and vessel class.
+CLAUSE_FRAGMENTS = {
+    "freight_on_discharge": "Freight payable upon completion of discharge.",
+    "laytime_after_0600_eta": "Laytime not to commence before 0600 on ETA unless agreed.",
+    "owners_safe_berth": "Owners to provide safe berth.",
+    "arbitration_venues": "Arbitration in New York, London, Singapore, or Hong Kong (New York default).",
+    "imo_2020_sulfur": "Compliance with IMO 2020 sulfur limits.",
+    "electronic_bills_of_lading": "Support for electronic Bills of Lading (e-BL).",
+    "sanctions": "Sanctions compliance with U.S., EU, and UN regulations.",
+    "force_majeure_pandemics_ports": "Force majeure includes pandemics and port disruptions.",
+    "tovalop": "TOVALOP compliance for pollution liability.",
+    "ism_isps": "Vessel to comply with ISM and ISPS codes.",
+    "charterers_pay_port_costs_bunkers": "Charterer to pay port costs and bunkers.",
+    "owners_insurance_class": "Owners to maintain vessel insurance and class certification.",
+    "hire_monthly_in_advance": "Hire payment due monthly in advance.",
+    "force_majeure_pandemics_geopolitical": "Force majeure includes pandemics and geopolitical disruptions.",
+    "esg_carbon_reporting": "Compliance with ESG and carbon intensity reporting.",
+    "nor_free_pratique": "NOR invalid if free pratique not granted within 6 hours of tendering.",
+    "charterers_port_costs": "Charterer responsible for port costs.",
+    "sts_transfers": "Vessel to comply with ship-to-ship transfer protocols.",
+    "vessel_condition_laytime": "Time lost due to vessel condition not to count as laytime.",
+    "force_majeure_geopolitical": "Force majeure includes geopolitical disruptions.",
+    "balanced_terms": "Balanced terms for owners and charterers.",
+    "safety_environmental_regulations": "Vessel to comply with modern safety and environmental regulations.",
+    "comprehensive_terms": "Reduced need for rider clauses due to comprehensive terms.",
+    "digital_reporting_ebl": "Support for digital reporting and e-BL.",
+    "clear_cargo_terms": "Clear and concise terms for loading and discharge.",
+    "charterers_provide_safe_berth": "Charterer to provide safe port/berth.",
+    "vessel_class_compliance": "Vessel to maintain class and regulatory compliance.",
+    "freight_on_loading": "Freight payable upon completion of loading.",
+    "laytime_six_hours_after_nor": "Laytime to commence 6 hours after NOR unless otherwise agreed.",
+    "owners_vessel_suitability": "Owners to ensure vessel suitability for cargo.",
+    "charterers_nominate_safe_berth": "Charterer to nominate safe port/berth.",
+}
+
+_BUILTIN_TEMPLATES = {
+    "TANKERVOY 87": {
+        "Owners": "[Owners Name]",
+        "Charterers": "[Charterer Name]",
+        "Vessel Name": "TBN",
+        "Vessel Description": "Description of the vessel including class, tonnage, and specifications",
+        "Loading Port": "[To be specified]",
+        "Discharging Port": "[To be specified]",
+        "Laydays": "[Date]",
+        "Cancelling": "[Date]",
+        "Freight Rate": "[To be specified] Worldscale points",
+        "Use Worldscale": "True",
+        "Standard Clauses": (
+            "freight_on_discharge",
+            "laytime_after_0600_eta",
+            "owners_safe_berth",
+            "arbitration_venues",
+        ),
+        "Modern Clauses": (
+            "imo_2020_sulfur",
+            "electronic_bills_of_lading",
+            "sanctions",
+            "force_majeure_pandemics_ports",
+            "tovalop",
+        ),
+        "Additional Clauses": ""
+    },
+    "Shell Time 4": {
+        "Vessel Name": "TBN",
+        "Charterers": "[Charterer Name]",
+        "Period": "12 months +/- 1 month",
+        "Hire Rate": "[To be specified] USD/day",
+        "Delivery Port": "[To be specified]",
+        "Redelivery Port": "[To be specified]",
+        "Loading Port": "[To be specified]",
+        "Discharging Port": "[To be specified]",
+        "Laydays": "[Date]",
+        "Cancelling": "[Date]",
+        "Route": "Any",
+        "Standard Clauses": (
+            "ism_isps",
+            "charterers_pay_port_costs_bunkers",
+            "owners_insurance_class",
+            "hire_monthly_in_advance",
+        ),
+        "Modern Clauses": (
+            "imo_2020_sulfur",
+            "sanctions",
+            "force_majeure_pandemics_geopolitical",
+            "electronic_bills_of_lading",
+            "tovalop",
+        ),
+        "Additional Clauses": ""
+    },
+    "Asbatankvoy 2025": {
+        "Vessel Name": "TBN",
+        "Charterers": "[Charterer Name]",
+        "Cargo": "Crude Oil",
+        "Cargo Capacity": "[To be specified] tons",
+        "Loading Port": "[To be specified]",
+        "Discharging Port": "[To be specified]",
+        "Laydays": "[Date]",
+        "Cancelling": "[Date]",
+        "Laytime": "72 hours",
+        "Demurrage": "[To be specified] USD/day",
+        "Freight Rate": "[To be specified] Worldscale points",
+        "Use Worldscale": "True",
+        "Route": "Any",
+        "Standard Clauses": (
+            "freight_on_discharge",
+            "laytime_after_0600_eta",
+            "owners_safe_berth",
+            "arbitration_venues",
+        ),
+        "Modern Clauses": (
+            "esg_carbon_reporting",
+            "electronic_bills_of_lading",
+            "sanctions",
+            "force_majeure_pandemics_ports",
+            "tovalop",
+        ),
+        "Additional Clauses": ""
+    },
+    "Shellvoy 6": {
+        "Vessel Name": "TBN",
+        "Charterers": "[Charterer Name]",
+        "Cargo": "Crude Oil or Products",
+        "Cargo Capacity": "[To be specified] tons",
+        "Loading Port": "[To be specified]",
+        "Discharging Port": "[To be specified]",
+        "Laydays": "[Date]",
+        "Cancelling": "[Date]",
+        "Laytime": "72 hours",
+        "Demurrage": "[To be specified] USD/day",
+        "Freight Rate": "[To be specified] Worldscale points",
+        "Use Worldscale": "True",
+        "Route": "Any",
+        "Standard Clauses": (
+            "nor_free_pratique",
+            "charterers_port_costs",
+            "sts_transfers",
+            "vessel_condition_laytime",
+        ),
+        "Modern Clauses": (
+            "imo_2020_sulfur",
+            "sanctions",
+            "force_majeure_geopolitical",
+            "electronic_bills_of_lading",
+            "tovalop",
+        ),
+        "Additional Clauses": ""
+    },
+    "BPVOY4": {
+        "Vessel Name": "TBN",
+        "Charterers": "[Charterer Name]",
+        "Cargo": "Crude Oil or Products",
+        "Cargo Capacity": "[To be specified] tons",
+        "Loading Port": "[To be specified]",
+        "Discharging Port": "[To be specified]",
+        "Laydays": "[Date]",
+        "Cancelling": "[Date]",
+        "Laytime": "72 hours",
+        "Demurrage": "[To be specified] USD/day",
+        "Freight Rate": "[To be specified] Worldscale points",
+        "Use Worldscale": "True",
+        "Route": "Any",
+        "Standard Clauses": (
+            "balanced_terms",
+            "freight_on_discharge",
+            "safety_environmental_regulations",
+            "comprehensive_terms",
+        ),
+        "Modern Clauses": (
+            "imo_2020_sulfur",
+            "digital_reporting_ebl",
+            "sanctions",
+            "force_majeure_pandemics_ports",
+            "tovalop",
+        ),
+        "Additional Clauses": ""
+    },
+    "ExxonMobil Voy2000": {
+        "Vessel Name": "TBN",
+        "Charterers": "[Charterer Name]",
+        "Cargo": "Crude Oil or Products",
+        "Cargo Capacity": "[To be specified] tons",
+        "Loading Port": "[To be specified]",
+        "Discharging Port": "[To be specified]",
+        "Laydays": "[Date]",
+        "Cancelling": "[Date]",
+        "Laytime": "72 hours",
+        "Demurrage": "[To be specified] USD/day",
+        "Freight Rate": "[To be specified] Worldscale points",
+        "Use Worldscale": "True",
+        "Route": "Any",
+        "Standard Clauses": (
+            "clear_cargo_terms",
+            "charterers_provide_safe_berth",
+            "freight_on_discharge",
+            "vessel_class_compliance",
+        ),
+        "Modern Clauses": (
+            "imo_2020_sulfur",
+            "sanctions",
+            "force_majeure_geopolitical",
+            "electronic_bills_of_lading",
+            "tovalop",
+        ),
+        "Additional Clauses": ""
+    },
+    "INTERTANKVOY 76": {
+        "Vessel Name": "TBN",
+        "Charterers": "[Charterer Name]",
+        "Cargo": "Crude Oil or Products",
+        "Cargo Capacity": "[To be specified] tons",
+        "Loading Port": "[To be specified]",
+        "Discharging Port": "[To be specified]",
+        "Laydays": "[Date]",
+        "Cancelling": "[Date]",
+        "Laytime": "72 hours",
+        "Demurrage": "[To be specified] USD/day",
+        "Freight Rate": "[To be specified] Worldscale points",
+        "Use Worldscale": "True",
+        "Route": "Any",
+        "Standard Clauses": (
+            "freight_on_loading",
+            "laytime_six_hours_after_nor",
+            "owners_vessel_suitability",
+            "charterers_nominate_safe_berth",
+        ),
+        "Modern Clauses": (
+            "imo_2020_sulfur",
+            "electronic_bills_of_lading",
+            "sanctions",
+            "force_majeure_pandemics_ports",
+            "tovalop",
+        ),
+        "Additional Clauses": ""
     }
-    return templates.get(template_name, {})
+}
+
+_VESSEL_CLASSES = {
+    "Panamax": {
+        "Cargo Capacity": "60,000 tons",
+        "Freight Rate": "WS100–WS150",
+        "Demurrage": "$20,000/day",
+        "Recommended Ports": "Rotterdam, Houston, Singapore"
+    },
+    "Aframax": {
+        "Cargo Capacity": "80,000–100,000 tons",
+        "Freight Rate": "WS90–WS140",
+        "Demurrage": "$25,000/day",
+        "Recommended Ports": "Houston, Fujairah, Antwerp"
+    },
+    "Suezmax": {
+        "Cargo Capacity": "120,000–150,000 tons",
+        "Freight Rate": "WS80–WS130",
+        "Demurrage": "$30,000/day",
+        "Recommended Ports": "Ras Tanura, Port Said, Shanghai"
+    },
+    "VLCC": {
+        "Cargo Capacity": "200,000–250,000 tons",
+        "Freight Rate": "WS50–WS100",
+        "Demurrage": "$40,000/day",
+        "Recommended Ports": "Ras Tanura, Singapore, Shanghai"
+    },
+    "ULCC": {
+        "Cargo Capacity": "300,000+ tons",
+        "Freight Rate": "WS40–WS90",
+        "Demurrage": "$50,000/day",
+        "Recommended Ports": "Ras Tanura, Fujairah, Singapore"
+    }
+}
+
+CLAUSE_TERMS = ("Standard Clauses", "Modern Clauses", "Additional Clauses")
+# Layout of a composed block, as the forms have always written their clauses
+_CLAUSE_INDENT = " " * 16
+_BLOCK_END = " " * 12
+
+_EMPTY_TEMPLATE = MappingProxyType({})
+_templates = _EMPTY_TEMPLATE
+_templates_lock = threading.Lock()
+# Bumped on every publish; part of the adjusted-template cache key, so an adjustment computed
+# from an older registry is never served once a newer one is published
+_templates_version = 0
+_templates_dir_state = None
+# Last good templates read from each *.json file, kept while a newer version fails to load
+_file_templates = {}
+_template_warnings = []
+# Terms as written, with clause blocks as fragment names, to recompose after a fragment changes
+_sources = {}
+
+_fragment_texts = {}
+_fragment_ids = {}
+_blocks = {}
+
+def fragment_id(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+def _add_fragment(name, text):
+    _fragment_texts.setdefault(fragment_id(text), text)
+    _fragment_ids[name] = fragment_id(text)
+
+@lru_cache(maxsize=None)
+def _compose(ids):
+    # One string per distinct composition, shared by every form and vessel class using it
+    texts = tuple(_fragment_texts[i] for i in ids)
+    block = "\n" + "".join(f"{_CLAUSE_INDENT}{number}. {text}\n" for number, text in enumerate(texts, 1)) + _BLOCK_END
+    _blocks[block] = texts
+    return block
+
+def _clause_block(names):
+    unknown = [name for name in names if name not in _fragment_ids]
+    if unknown:
+        raise ValueError(f"Unknown clause fragment(s): {', '.join(unknown)}")
+    return _compose(tuple(_fragment_ids[name] for name in names))
+
+def _freeze(terms):
+    return MappingProxyType({
+        term: _clause_block(value) if term in CLAUSE_TERMS and isinstance(value, (list, tuple)) else value
+        for term, value in terms.items()
+    })
+
+def _publish(templates):
+    # Callers hold _templates_lock. Readers never lock: the registry is swapped in whole
+    # before the version moves on, so a reader seeing the new version sees the new registry
+    global _templates, _templates_version
+    _templates = MappingProxyType(templates)
+    _templates_version += 1
+    _adjusted_template.cache_clear()
+
+def register_template(template_name, terms):
+    with _templates_lock:
+        templates = dict(_templates)
+        templates[template_name] = _freeze(terms)
+        _sources[template_name] = dict(terms)
+        _publish(templates)
+
+def register_clause_fragment(name, text):
+    # Adds a fragment or rewords one, recomposing only the blocks that list it; returns the
+    # new version's id. Earlier versions stay resolvable by id.
+    with _templates_lock:
+        _add_fragment(name, text)
+        _publish({template_name: _freeze(terms) for template_name, terms in _sources.items()})
+    return _fragment_ids[name]
+
+def get_clause_fragments():
+    # Current text of every fragment, by name
+    return {name: _fragment_texts[i] for name, i in _fragment_ids.items()}
+
+def clause_fragments(text):
+    # The fragment texts a clause block was composed from, in order; None for any other text,
+    # such as a block edited in the form
+    return _blocks.get(text)
+
+def _read_templates_dir(directory):
+    # {name: terms} from every *.json file. A file that cannot be read or composed keeps the
+    # templates it last loaded with, and a warning says why.
+    templates = {}
+    warnings = []
+    loaded = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, filename), "r") as f:
+                file_templates = json.load(f)
+            if not isinstance(file_templates, dict) or not all(isinstance(terms, dict) for terms in file_templates.values()):
+                raise ValueError("expected {\"Template Name\": {term: default, ...}}")
+            for terms in file_templates.values():
+                _freeze(terms)
+        except (OSError, TypeError, ValueError) as exc:
+            file_templates = _file_templates.get(filename, {})
+            kept = " (keeping the last version that loaded)" if file_templates else ""
+            warnings.append(f"Template file {filename} was not loaded{kept}: {exc}")
+        loaded[filename] = file_templates
+        templates.update(file_templates)
+    _file_templates.clear()
+    _file_templates.update(loaded)
+    return templates, warnings
+
+def _dir_state(directory):
+    if not directory or not os.path.isdir(directory):
+        return None
+    return tuple(
+        (entry.name, entry.stat().st_mtime_ns)
+        for entry in sorted(os.scandir(directory), key=lambda e: e.name)
+        if entry.name.endswith(".json")
+    )
+
+def reload_templates(directory=None):
+    # Rebuilds the registry from the built-in forms plus any *.json files in directory
+    global _templates_dir_state
+    directory = directory if directory is not None else TEMPLATES_DIR
+    with _templates_lock:
+        sources = dict(_BUILTIN_TEMPLATES)
+        state = _dir_state(directory)
+        warnings = []
+        if state is not None:
+            file_templates, warnings = _read_templates_dir(directory)
+            sources.update(file_templates)
+        for warning in warnings:
+            print(f"templates: {warning}", file=sys.stderr)
+        _template_warnings[:] = warnings
+        templates = {name: _freeze(terms) for name, terms in sources.items()}
+        _sources.clear()
+        _sources.update(sources)
+        _templates_dir_state = state
+        _publish(templates)
+    return list(templates)
+
+def refresh_templates(directory=None):
+    # Cheap enough to call on every rerun: only stats the directory unless a file changed
+    directory = directory if directory is not None else TEMPLATES_DIR
+    if _dir_state(directory) != _templates_dir_state:
+        reload_templates(directory)
+        return True
+    return False
+
+def get_template_warnings():
+    # Problems with the template files found by the last reload
+    return list(_template_warnings)
+
+@timed("templates.load_template")
+def load_template(template_name):
+    return _templates.get(template_name, _EMPTY_TEMPLATE)
 
 def get_template_names():
-    return [
-        "TANKERVOY 87",
-        "Shell Time 4",
-        "Asbatankvoy 2025",
-        "Shellvoy 6",
-        "BPVOY4",
-        "ExxonMobil Voy2000",
-        "INTERTANKVOY 76"
-    ]
+    return list(_templates)
+
+def get_vessel_class_names():
+    return list(_VESSEL_CLASSES)
+
+def get_vessel_class(vessel_class):
+    return MappingProxyType(_VESSEL_CLASSES.get(vessel_class, {}))
 
 def suggest_templates_by_route(route):
-    common_routes = {
-        "houston to rotterdam": ["TANKERVOY 87", "Asbatankvoy 2025", "Shellvoy 6", "BPVOY4", "ExxonMobil Voy2000", "INTERTANKVOY 76"],
-        "persian gulf to singapore": ["TANKERVOY 87", "Asbatankvoy 2025", "Shellvoy 6", "ExxonMobil Voy2000", "INTERTANKVOY 76"],
-        "west africa to china": ["TANKERVOY 87", "Asbatankvoy 2025", "Shellvoy 6", "BPVOY4", "INTERTANKVOY 76"],
-        "rotterdam to new york": ["TANKERVOY 87", "Asbatankvoy 2025", "Shellvoy 6", "BPVOY4", "ExxonMobil Voy2000"],
-        "fujairah to shanghai": ["TANKERVOY 87", "Asbatankvoy 2025", "Shellvoy 6", "INTERTANKVOY 76"],
-        "ras tanura to antwerp": ["TANKERVOY 87", "Asbatankvoy 2025", "Shellvoy 6", "BPVOY4"],
-        "any": ["TANKERVOY 87", "Shell Time 4", "Asbatankvoy 2025", "Shellvoy 6", "BPVOY4", "ExxonMobil Voy2000", "INTERTANKVOY 76"]
-    }
-    route = route.lower() if route else "any"
-    for key in common_routes:
-        if key.lower() in route or route in key.lower():
-            return common_routes[key]
-    return common_routes["any"]
+    # Falls back to every template when the route is empty or not a known trade
+    return list(route_index.default_index.lookup(route or "")) or get_template_names()
 
+def suggest_templates_for_routes(routes):
+    all_templates = get_template_names()
+    return [list(found) or all_templates for found in route_index.default_index.lookup_many(route or "" for route in routes)]
+
+@timed("templates.adjust_terms_by_vessel_class")
 def adjust_terms_by_vessel_class(template, vessel_class):
-    vessel_classes = {
-        "Panamax": {
-            "Cargo Capacity": "60,000 tons",
-            "Freight Rate": "WS100–WS150",
-            "Demurrage": "$20,000/day",
-            "Recommended Ports": "Rotterdam, Houston, Singapore"
-        },
-        "Aframax": {
-            "Cargo Capacity": "80,000–100,000 tons",
-            "Freight Rate": "WS90–WS140",
-            "Demurrage": "$25,000/day",
-            "Recommended Ports": "Houston, Fujairah, Antwerp"
-        },
-        "Suezmax": {
-            "Cargo Capacity": "120,000–150,000 tons",
-            "Freight Rate": "WS80–WS130",
-            "Demurrage": "$30,000/day",
-            "Recommended Ports": "Ras Tanura, Port Said, Shanghai"
-        },
-        "VLCC": {
-            "Cargo Capacity": "200,000–250,000 tons",
-            "Freight Rate": "WS50–WS100",
-            "Demurrage": "$40,000/day",
-            "Recommended Ports": "Ras Tanura, Singapore, Shanghai"
-        },
-        "ULCC": {
-            "Cargo Capacity": "300,000+ tons",
-            "Freight Rate": "WS40–WS90",
-            "Demurrage": "$50,000/day",
-            "Recommended Ports": "Ras Tanura, Fujairah, Singapore"
-        }
-    }
-    adjusted_template = template.copy()
-    if vessel_class in vessel_classes:
-        class_data = vessel_classes[vessel_class]
+    adjusted_template = dict(template)
+    if vessel_class in _VESSEL_CLASSES:
+        class_data = _VESSEL_CLASSES[vessel_class]
         if "Cargo Capacity" in adjusted_template:
             adjusted_template["Cargo Capacity"] = class_data["Cargo Capacity"]
         if "Freight Rate" in adjusted_template:
@@ -275,3 +473,16 @@ def adjust_terms_by_vessel_class(template, vessel_class):
         if "Discharging Port" in adjusted_template and adjusted_template["Discharging Port"] == "[To be specified]":
             adjusted_template["Discharging Port"] = class_data["Recommended Ports"]
     return adjusted_template
+
+@lru_cache(maxsize=256)
+def _adjusted_template(version, template_name, vessel_class):
+    return _freeze(adjust_terms_by_vessel_class(load_template(template_name), vessel_class))
+
+def get_adjusted_template(template_name, vessel_class):
+    return _adjusted_template(_templates_version, template_name, vessel_class)
+
+get_adjusted_template.cache_clear = _adjusted_template.cache_clear
+
+for _name, _text in CLAUSE_FRAGMENTS.items():
+    _add_fragment(_name, _text)
+reload_templates()
@@ -0,0 +1,91 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+
+from batch import fixture_to_terms, validate_fixtures
+from charter_model import Rate, RateKind, parse_charter, parse_date, parse_rate
+
+@pytest.mark.parametrize("text, expected", [
+    ("WS65", Rate("WS65", RateKind.WORLDSCALE, Decimal("65"))),
+    ("WS100–WS150", Rate("WS100–WS150", RateKind.WORLDSCALE, Decimal("100"), Decimal("150"))),
+    ("Worldscale 80 points", Rate("Worldscale 80 points", RateKind.WORLDSCALE, Decimal("80"))),
+    ("$40,000/day", Rate("$40,000/day", RateKind.USD, Decimal("40000"), unit="/day")),
+    ("USD 12.50/t", Rate("USD 12.50/t", RateKind.USD, Decimal("12.50"), unit="/t")),
+])
+def test_parse_rate(text, expected):
+    rate = parse_rate(text)
+    assert rate == expected
+    assert str(rate) == text
+
+def test_bare_number_follows_worldscale():
+    assert parse_rate("65", worldscale=True).kind is RateKind.WORLDSCALE
+    assert parse_rate("65").kind is RateKind.USD
+    assert parse_rate(65).low == Decimal("65")
+
+@pytest.mark.parametrize("value", ["market", "", "[To be specified]", None, True])
+def test_parse_rate_rejects_other_values(value):
+    assert parse_rate(value) is None
+
+def test_parse_date_is_strict():
+    assert parse_date("2024-03-01") == date(2024, 3, 1)
+    assert parse_date(" 2024-03-01 ") == date(2024, 3, 1)
+    assert parse_date(datetime(2024, 3, 1, 6, 0)) == date(2024, 3, 1)
+    for value in ("2024-02-30", "01/03/2024", "2024-3-1", "next week", 20240301):
+        assert parse_date(value) is None
+
+def test_placeholders_pass_through():
+    charter, errors = parse_charter(
+        {"Freight Rate": "[To be specified]", "Laydays": "[Date]", "Loading Port": "Ras Tanura", "Discharging Port": "Rotterdam"},
+        "TANKERVOY 87",
+        "VLCC",
+    )
+    assert errors == {}
+    assert charter.get("Freight Rate") == "[To be specified]"
+    assert charter.get("Laydays") == "[Date]"
+
+def test_invalid_terms_are_reported():
+    charter, errors = parse_charter(
+        {"Laydays": "2024-03-10", "Cancelling": "2024-03-01", "Freight Rate": "market", "Loading Port": "Select a port", "Discharging Port": "Rotterdam"},
+        "GENCON 1922",
+        "Canoe",
+    )
+    assert errors == {
+        "Template": "Unknown template 'GENCON 1922'",
+        "Vessel Class": "Unknown vessel class 'Canoe'",
+        "Loading Port": "Please select a loading port",
+        "Cancelling": "Cancelling date must be after laydays",
+        "Freight Rate": "Freight rate must be Worldscale points (e.g. WS65 or WS100–WS150) or an amount",
+    }
+    assert charter.laydays == date(2024, 3, 10)
+
+def test_batch_and_scalar_validation_agree():
+    base = {
+        "Template": "TANKERVOY 87", "Vessel Class": "VLCC", "Owners": "Nordic Tankers AS", "Charterers": "Gulf Trading",
+        "Vessel Name": "Nordic Star", "Loading Port": "Ras Tanura", "Discharging Port": "Rotterdam",
+        "Laydays": "2026-05-01", "Cancelling": "2026-05-05", "Freight Rate": "WS65",
+    }
+    breakages = [
+        {},
+        {"Laydays": "2026-02-30"},
+        {"Cancelling": "next week"},
+        {"Owners": " "},
+        {"Loading Port": "Select a port"},
+        {"Freight Rate": "market"},
+        {"Freight Rate": "$20,000/day", "Template": "Shell Time 4"},
+        {"Laydays": "2026-05-10", "Cancelling": "2026-05-01"},
+        {"Template": "GENCON 1922"},
+        {"Vessel Class": "Canoe"},
+        {"Freight Rate": "[Rate]", "Laydays": "[Date]"},
+        {"Discharging Port": None, "Cancelling": None},
+    ]
+    frame = pd.DataFrame([{**base, **breakage} for breakage in breakages], dtype=object)
+    scalar = {
+        (index + 1, field): error
+        for index, fixture in enumerate(frame.to_dict("records"))
+        for field, error in fixture_to_terms(fixture)[3].items()
+    }
+    vector = {(row, field): error for row, field, error in validate_fixtures(frame).itertuples(index=False)}
+    assert scalar
+    assert vector == scalar
@@ -0,0 +1,80 @@
+import json
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+import charter_store
+from templates import get_adjusted_template
+
+TEMPLATE = "TANKERVOY 87"
+VESSEL_CLASS = "VLCC"
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "charters.db")
+    yield path
+    charter_store.close(path)
+
+def _typed(terms):
+    return [(key, type(value), value) for key, value in terms.items()]
+
+def _terms():
+    defaults = dict(get_adjusted_template(TEMPLATE, VESSEL_CLASS))
+    removed = next(key for key in defaults if key != "Owners")
+    terms = {key: value for key, value in defaults.items() if key != removed}
+    terms.update({
+        "Owners": "Nordic Tankers AS",
+        "Laydays": date(2024, 3, 1),
+        "Cancelling": date(2024, 3, 5),
+        "Quantity": Decimal("280000.50"),
+        "Use Worldscale": False,
+        "Berths": 2,
+        "Signed At": datetime(2024, 2, 20, 14, 30),
+        "Additional Clauses": "1. Owners shall comply with all applicable sanctions laws and regulations. " * 3,
+    })
+    # Not in snapshot order: the last default first
+    last = list(terms)[-1]
+    return {last: terms[last], **{key: value for key, value in terms.items() if key != last}}
+
+def test_round_trip_keeps_values_types_and_order(db_path):
+    terms = _terms()
+    charter_id = charter_store.save_charter(db_path, TEMPLATE, VESSEL_CLASS, terms)
+    charter = charter_store.get_charter(db_path, charter_id)
+    assert charter["template"] == TEMPLATE and charter["vessel_class"] == VESSEL_CLASS
+    assert _typed(charter["terms"]) == _typed(terms)
+    assert [charter["terms"]] == [c["terms"] for c in charter_store.iter_charters(db_path)]
+
+def test_long_texts_are_shared(db_path):
+    terms = _terms()
+    charter_store.save_charters(db_path, [(TEMPLATE, VESSEL_CLASS, terms)] * 3)
+    conn = charter_store.connect(db_path)
+    rider = terms["Additional Clauses"]
+    assert conn.execute("SELECT COUNT(*) FROM texts WHERE text = ?", (rider,)).fetchone()[0] == 1
+    assert all(_typed(c["terms"]) == _typed(terms) for c in charter_store.iter_charters(db_path))
+
+def test_legacy_rows_load_unchanged_before_and_after_compact(db_path):
+    # Rows saved before deltas hold the full terms as JSON strings
+    legacy = {"Owners": "Legacy Owners", "Use Worldscale": "False", "Laydays": "2023-11-01", "Freight Rate": "WS85"}
+    conn = charter_store.connect(db_path)
+    conn.execute(
+        "INSERT INTO charters (created_at, template, vessel_class, vessel_name, laydays, terms) VALUES (?, ?, ?, ?, ?, ?)",
+        (time.time(), TEMPLATE, VESSEL_CLASS, None, "2023-11-01", json.dumps(legacy)),
+    )
+    charter_id = conn.execute("SELECT MAX(id) FROM charters").fetchone()[0]
+    assert _typed(charter_store.get_charter(db_path, charter_id)["terms"]) == _typed(legacy)
+
+    assert charter_store.compact(db_path) == 1
+    assert conn.execute("SELECT snapshot FROM charters WHERE id = ?", (charter_id,)).fetchone()[0] is not None
+    assert _typed(charter_store.get_charter(db_path, charter_id)["terms"]) == _typed(legacy)
+
+def test_missing_json_is_migrated_once_it_exists(db_path, tmp_path):
+    json_path = tmp_path / "charters.json"
+    assert charter_store.migrate_json(db_path, str(json_path)) == 0
+    assert charter_store.connect(db_path).execute("SELECT COUNT(*) FROM migrations").fetchone()[0] == 0
+
+    json_path.write_text(json.dumps([{"template": TEMPLATE, "vessel_class": VESSEL_CLASS, "terms": {"Owners": "Legacy Owners"}}]))
+    assert charter_store.migrate_json(db_path, str(json_path)) == 1
+    assert charter_store.migrate_json(db_path, str(json_path)) == 0
+    assert [c["terms"] for c in charter_store.iter_charters(db_path)] == [{"Owners": "Legacy Owners"}]
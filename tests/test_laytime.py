@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+from laytime import compute_calls, compute_claims, load_events, parse_hours
+
+def _events(rows):
+    return pd.DataFrame(rows, columns=["Voyage", "Port", "Event", "Start", "End"])
+
+def test_sof_without_exceptions():
+    events = _events([
+        ["V1", "Ras Tanura", "NOR Tendered", "2024-03-01 06:00", ""],
+        ["V1", "Ras Tanura", "hoses connected", "2024-03-01 14:00", ""],
+        ["V1", "Ras Tanura", "Hoses Off", "2024-03-05 06:00", ""],
+    ])
+    calls = compute_calls(events)
+    assert calls["Hoses On"].tolist() == [pd.Timestamp("2024-03-01 14:00")]
+    assert calls["Excepted Hours"].tolist() == [0.0]
+    assert calls["Laytime Used Hours"].tolist() == [90.0]
+    claims = compute_claims(events, demurrage="$10,000/day")
+    assert claims.loc["V1", "Demurrage Hours"] == 18.0
+    assert claims.loc["V1", "Demurrage Due"] == 7500.0
+
+def test_laytime_units():
+    hours = parse_hours(["72 hours", "3 Days", "2 D", "84 running hours", 72, "reversible"])
+    assert hours[:5].tolist() == [72.0, 72.0, 48.0, 84.0, 72.0]
+    assert pd.isna(hours[5])
+
+def test_exception_outside_window_deducts_nothing():
+    events = _events([
+        ["V1", "Ras Tanura", "Weather", "2024-02-28 00:00", "2024-02-28 12:00"],
+        ["V1", "Ras Tanura", "NOR Tendered", "2024-03-01 06:00", ""],
+        ["V1", "Ras Tanura", "Hoses Off", "2024-03-05 06:00", ""],
+    ])
+    assert compute_calls(events)["Excepted Hours"].tolist() == [0.0]
+
+def test_mixed_time_formats():
+    events = _events([
+        ["V1", "Ras Tanura", "NOR Tendered", "2024-03-01 06:00", ""],
+        ["V1", "Ras Tanura", "Weather", "02/03/2024 00:00", "2024-03-02T12:00"],
+        ["V1", "Ras Tanura", "Hoses Off", "05/03/2024 06:00", ""],
+    ])
+    calls = compute_calls(events)
+    assert calls["Completed"].tolist() == [pd.Timestamp("2024-03-05 06:00")]
+    assert calls["Excepted Hours"].tolist() == [12.0]
+
+def test_unreadable_times_are_reported():
+    events = _events([
+        ["V1", "Ras Tanura", "NOR Tendered", "2024-03-01 06:00", ""],
+        ["V1", "Ras Tanura", "Weather", "2024-03-02 00:00", "32/03/2024"],
+        ["V1", "Ras Tanura", "Hoses Off", "tbc", ""],
+    ])
+    with pytest.raises(ValueError, match=r"1 \(End '32/03/2024'\), 2 \(Start 'tbc'\)"):
+        load_events(events)
@@ -0,0 +1,39 @@
+import pytest
+
+from route_index import RouteIndex, default_index
+
+HOUSTON_ROTTERDAM = ["TANKERVOY 87", "Asbatankvoy 2025", "Shellvoy 6", "BPVOY4", "ExxonMobil Voy2000", "INTERTANKVOY 76"]
+
+@pytest.mark.parametrize("text, codes", [
+    ("USHOU", {"USHOU"}),
+    ("nlrtm", {"NLRTM"}),
+    ("Rdam", {"NLRTM"}),
+    ("Houston, USA", {"USHOU"}),
+    ("USG", {"USHOU", "USCRP"}),
+    ("Rotterdm", {"NLRTM"}),
+    ("Houstn", {"USHOU"}),
+    ("Atlantis", set()),
+    ("", set()),
+])
+def test_resolve(text, codes):
+    assert default_index.resolve(text) == codes
+
+@pytest.mark.parametrize("route", [
+    "USHOU to NLRTM",
+    "Hou -> Rdam",
+    "Houstn to Roterdam",
+    "Houston, USA – Rotterdam, Netherlands",
+])
+def test_lookup_resolves_locodes_aliases_and_typos(route):
+    assert default_index.lookup(route) == HOUSTON_ROTTERDAM
+
+def test_lookup_unresolvable_route():
+    assert default_index.lookup("Atlantis to Rotterdam") == []
+    assert default_index.lookup("") == []
+    assert default_index.lookup_many(["Atlantis to Rotterdam", "USHOU to NLRTM"]) == [[], HOUSTON_ROTTERDAM]
+
+def test_add_route_rejects_unresolvable_end():
+    index = RouteIndex()
+    index.add_alias("Houston", ["USHOU"])
+    with pytest.raises(ValueError):
+        index.add_route("Houston", "Atlantis", ["TANKERVOY 87"])
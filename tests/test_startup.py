@@ -0,0 +1,11 @@
+from startup_profile import HEAVY_MODULES, IMPORT_BUDGET_MS, app_imports, best_of
+
+def test_app_imports_stay_within_budget():
+    # Best of three fresh interpreters, as the --check gate runs it
+    profile = best_of(3)
+    assert profile["import_ms"] <= IMPORT_BUDGET_MS, profile["top_level_ms"]
+
+def test_no_heavy_modules_at_startup():
+    profile = best_of(1)
+    assert profile["heavy"] == {}, f"imported at startup: {profile['heavy']}"
+    assert not set(app_imports()) & set(HEAVY_MODULES)
@@ -0,0 +1,8 @@
+from charter_model import PORT_PLACEHOLDER, REQUIRED_FIELDS, parse_charter
+from instrumentation import timed
+
+@timed("validation.validate_terms")
+def validate_terms(custom_terms):
+    # Same rules for the Streamlit form and the batch pipeline; returns {field: message}.
+    # Callers that go on to use the values should call parse_charter once instead.
+    return parse_charter(custom_terms)[1]
@@ -0,0 +1,179 @@
+import csv
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from ports import PORTS, PORT_ALIASES, port_code
+from templates import get_vessel_class, get_vessel_class_names
+
+# Freight from Worldscale points: USD/ton = flat rate (the WS100 rate for the route) x WS / 100,
+# and the lump sum is USD/ton x cargo. Distances and flat rates sit in square port x port
+# arrays so a whole route x vessel class x WS grid is priced with array broadcasting.
+#
+# The built-in legs are indicative shortest sea distances between the ports offered in the
+# UI. Flat rates are estimated from distance unless given; a CSV named by
+# CHARTER_DISTANCES_CSV (origin,destination,distance_nm[,flat_rate]) adds ports and legs
+# or replaces them with published figures.
+
+DISTANCES_CSV = os.environ.get("CHARTER_DISTANCES_CSV", "")
+
+# Estimated flat rate: a fixed port-cost component plus a per-mile component, USD/ton
+FLAT_RATE_BASE = 1.5
+FLAT_RATE_PER_NM = 0.0029
+
+WS_STEP = 5
+
+# (origin, destination, nautical miles) by UN/LOCODE; legs are symmetric
+LEGS = [
+    ("NLRTM", "USHOU", 5000), ("NLRTM", "SGSIN", 8300), ("NLRTM", "AEFJR", 6300), ("NLRTM", "CNSHA", 10500),
+    ("NLRTM", "SARTA", 6500), ("NLRTM", "BEANR", 120), ("NLRTM", "EGPSD", 3300),
+    ("USHOU", "SGSIN", 11900), ("USHOU", "AEFJR", 9700), ("USHOU", "CNSHA", 10600), ("USHOU", "SARTA", 9900),
+    ("USHOU", "BEANR", 5050), ("USHOU", "EGPSD", 6300),
+    ("SGSIN", "AEFJR", 3300), ("SGSIN", "CNSHA", 2200), ("SGSIN", "SARTA", 3600), ("SGSIN", "BEANR", 8400),
+    ("SGSIN", "EGPSD", 5000),
+    ("AEFJR", "CNSHA", 5400), ("AEFJR", "SARTA", 400), ("AEFJR", "BEANR", 6400), ("AEFJR", "EGPSD", 3000),
+    ("CNSHA", "SARTA", 5800), ("CNSHA", "BEANR", 10600), ("CNSHA", "EGPSD", 7200),
+    ("SARTA", "BEANR", 6600), ("SARTA", "EGPSD", 3200),
+    ("BEANR", "EGPSD", 3350),
+]
+
+def estimate_flat_rate(distance_nm):
+    return FLAT_RATE_BASE + FLAT_RATE_PER_NM * np.asarray(distance_nm, dtype=float)
+
+def resolve_port(port):
+    # A UN/LOCODE, an alias such as "Houston", or a UI label such as "Houston, USA (...)"
+    text = str(port).strip()
+    if text.upper() in PORT_ALIASES:
+        return text.upper()
+    return port_code(text) or (text.upper() if re.fullmatch(r"[A-Za-z]{2}[A-Za-z0-9]{3}", text) else None)
+
+def _numbers(text):
+    return [float(n.replace(",", "")) for n in re.findall(r"\d[\d,]*(?:\.\d+)?", str(text))]
+
+def class_cargo_tons(vessel_class):
+    # Representative cargo: the middle of "80,000–100,000 tons", or the figure in "300,000+ tons"
+    numbers = _numbers(get_vessel_class(vessel_class).get("Cargo Capacity", ""))
+    return sum(numbers[:2]) / len(numbers[:2]) if numbers else 0.0
+
+def class_ws_range(vessel_class):
+    # "WS100–WS150" -> (100.0, 150.0)
+    numbers = _numbers(get_vessel_class(vessel_class).get("Freight Rate", ""))
+    if not numbers:
+        return (0.0, 0.0)
+    return (numbers[0], numbers[1] if len(numbers) > 1 else numbers[0])
+
+class FreightMatrix:
+    def __init__(self):
+        self.codes = []
+        self._index = {}
+        self.distance = np.full((0, 0), np.nan)
+        self.flat_rate = np.full((0, 0), np.nan)
+
+    def add_port(self, code):
+        index = self._index.get(code)
+        if index is None:
+            index = self._index[code] = len(self.codes)
+            self.codes.append(code)
+            size = len(self.codes)
+            for name in ("distance", "flat_rate"):
+                grown = np.full((size, size), np.nan)
+                grown[:size - 1, :size - 1] = getattr(self, name)
+                grown[index, index] = 0.0
+                setattr(self, name, grown)
+        return index
+
+    def add_leg(self, origin, destination, distance_nm, flat_rate=None):
+        codes = resolve_port(origin), resolve_port(destination)
+        if None in codes:
+            raise ValueError(f"Unknown port in leg {origin!r} to {destination!r}")
+        i, j = (self.add_port(code) for code in codes)
+        flat = estimate_flat_rate(distance_nm) if flat_rate in (None, "") else float(flat_rate)
+        self.distance[i, j] = self.distance[j, i] = float(distance_nm)
+        self.flat_rate[i, j] = self.flat_rate[j, i] = flat
+
+    def load_csv(self, path):
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                self.add_leg(row["origin"], row["destination"], row["distance_nm"], row.get("flat_rate"))
+
+    def routes(self, origins=None, destinations=None):
+        # Every known (origin, destination) pair between two distinct ports, as index arrays
+        origin_idx = np.array([self._index[resolve_port(p)] for p in origins] if origins else range(len(self.codes)), dtype=int)
+        destination_idx = np.array([self._index[resolve_port(p)] for p in destinations] if destinations else range(len(self.codes)), dtype=int)
+        o, d = np.meshgrid(origin_idx, destination_idx, indexing="ij")
+        o, d = o.ravel(), d.ravel()
+        keep = (o != d) & ~np.isnan(self.flat_rate[o, d])
+        return o[keep], d[keep]
+
+    def price(self, origins=None, destinations=None, vessel_classes=None, ws_points=None):
+        # Prices every route x vessel class x WS point in one broadcast:
+        #   usd_per_ton[route, ws]         flat rate x WS / 100
+        #   lump_sum[route, class, ws]     usd_per_ton x representative cargo of the class
+        #   in_range[class, ws]            WS point within the class's usual range
+        vessel_classes = list(vessel_classes or get_vessel_class_names())
+        ranges = np.array([class_ws_range(c) for c in vessel_classes], dtype=float).reshape(-1, 2)
+        if ws_points is None:
+            low, high = ranges[:, 0].min(), ranges[:, 1].max()
+            ws_points = np.arange(low, high + WS_STEP, WS_STEP)
+        ws_points = np.asarray(ws_points, dtype=float)
+        cargo = np.array([class_cargo_tons(c) for c in vessel_classes], dtype=float)
+
+        o, d = self.routes(origins, destinations)
+        flat = self.flat_rate[o, d]
+        usd_per_ton = flat[:, None] * ws_points[None, :] / 100.0
+        return {
+            "routes": [(self.codes[i], self.codes[j]) for i, j in zip(o, d)],
+            "vessel_classes": vessel_classes,
+            "ws_points": ws_points,
+            "distance_nm": self.distance[o, d],
+            "flat_rate": flat,
+            "cargo_tons": cargo,
+            "usd_per_ton": usd_per_ton,
+            "lump_sum": usd_per_ton[:, None, :] * cargo[None, :, None],
+            "in_range": (ws_points[None, :] >= ranges[:, :1]) & (ws_points[None, :] <= ranges[:, 1:]),
+        }
+
+    def quote(self, origin, destination, vessel_class, ws, cargo_tons=None):
+        # A single fixture: {"distance_nm", "flat_rate", "usd_per_ton", "lump_sum"}
+        i, j = self._index[resolve_port(origin)], self._index[resolve_port(destination)]
+        flat = float(self.flat_rate[i, j])
+        cargo = class_cargo_tons(vessel_class) if cargo_tons is None else float(cargo_tons)
+        usd_per_ton = flat * float(ws) / 100.0
+        return {"distance_nm": float(self.distance[i, j]), "flat_rate": flat, "usd_per_ton": usd_per_ton, "lump_sum": usd_per_ton * cargo}
+
+    def knows(self, origin, destination):
+        codes = resolve_port(origin), resolve_port(destination)
+        if None in codes or codes[0] not in self._index or codes[1] not in self._index:
+            return False
+        return not np.isnan(self.flat_rate[self._index[codes[0]], self._index[codes[1]]])
+
+def to_frame(priced):
+    # Long table (one row per route x class x WS point) for display or CSV export
+    routes, classes, ws = len(priced["routes"]), len(priced["vessel_classes"]), len(priced["ws_points"])
+    r, c, w = (axis.ravel() for axis in np.meshgrid(np.arange(routes), np.arange(classes), np.arange(ws), indexing="ij"))
+    return pd.DataFrame({
+        "Origin": [priced["routes"][i][0] for i in r],
+        "Destination": [priced["routes"][i][1] for i in r],
+        "Vessel Class": np.array(priced["vessel_classes"], dtype=object)[c],
+        "WS": priced["ws_points"][w],
+        "Distance (nm)": priced["distance_nm"][r],
+        "Flat Rate (USD/t)": priced["flat_rate"][r],
+        "USD/t": priced["usd_per_ton"][r, w],
+        "Lump Sum (USD)": priced["lump_sum"].ravel(),
+        "In Class Range": priced["in_range"][c, w],
+    })
+
+def build_default_matrix(csv_path=None):
+    matrix = FreightMatrix()
+    for label in PORTS:
+        matrix.add_port(port_code(label))
+    for origin, destination, distance_nm in LEGS:
+        matrix.add_leg(origin, destination, distance_nm)
+    csv_path = DISTANCES_CSV if csv_path is None else csv_path
+    if csv_path:
+        matrix.load_csv(csv_path)
+    return matrix
+
+default_matrix = build_default_matrix()